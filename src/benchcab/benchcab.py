@@ -3,28 +3,44 @@
 
 """Contains the benchcab application class."""
 
+import functools
+import getpass
 import grp
 import logging
+import multiprocessing
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.pool import Pool
 from pathlib import Path
 from subprocess import CalledProcessError
-from typing import Optional
+from typing import Callable, Optional
 
 import benchcab.utils.meorg as bm
-from benchcab import fluxsite, internal, spatial
+from benchcab import fluxsite, internal, scaling, spatial
 from benchcab.comparison import run_comparisons, run_comparisons_in_parallel
-from benchcab.config import read_config
+from benchcab.config import get_config_hash, read_config
 from benchcab.coverage import (
+    CoverageMerger,
+    get_coverage_delta,
     get_coverage_tasks_default,
     run_coverage_tasks,
     run_coverages_in_parallel,
+    save_coverage_delta,
 )
+from benchcab.ensemble import write_member_namelists
 from benchcab.environment_modules import EnvironmentModules, EnvironmentModulesInterface
-from benchcab.internal import get_met_forcing_file_names
 from benchcab.model import Model
 from benchcab.utils import is_verbose, task_summary
+from benchcab.utils.cache import (
+    get_cache_path,
+    invalidate_cache,
+    load_cache,
+    save_cache,
+)
 from benchcab.utils.fs import mkdir, next_path
+from benchcab.utils.met import MetForcingError, get_met_forcing_file_names
 from benchcab.utils.pbs import render_job_script
 from benchcab.utils.repo import create_repo
 from benchcab.utils.subprocess import SubprocessWrapper, SubprocessWrapperInterface
@@ -36,6 +52,10 @@ from benchcab.workdir import (
 )
 
 
+class PreflightError(Exception):
+    """Exception class for signalling failed environment checks."""
+
+
 class Benchcab:
     """A class that represents the `benchcab` application."""
 
@@ -61,9 +81,13 @@ class Benchcab:
         self.validate_env = validate_env
 
         self._config: Optional[dict] = None
+        self._config_hash: Optional[str] = None
         self._models: list[Model] = []
         self._fluxsite_tasks: list[fluxsite.FluxsiteTask] = []
         self._spatial_tasks: list[spatial.SpatialTask] = []
+        self._env_validated = False
+        # Pool of worker processes shared between stages of `fluxsite-job`
+        self._pool: Optional[Pool] = None
 
         # Get the logger object
         self._logger: Optional[logging.Logger] = None
@@ -84,44 +108,41 @@ class Benchcab:
         # Prioritize system binaries over externally set $PATHs (#220)
         os.environ["PATH"] = f"{':'.join(internal.SYSTEM_PATHS)}:{os.environ['PATH']}"
 
-    def _validate_environment(self, project: str, modules: list):
-        """Performs checks on current user environment."""
-        logger = self._get_logger()
-        if not self.validate_env:
-            return
-
+    def _check_node(self):
         if "gadi.nci" not in internal.NODENAME:
-            logger.error("benchcab is currently implemented only on Gadi")
-            sys.exit(1)
+            msg = "benchcab is currently implemented only on Gadi"
+            raise PreflightError(msg)
 
+    def _check_namelists(self):
         namelist_dir = Path(internal.NAMELIST_DIR)
         if not namelist_dir.exists():
-            logger.error(
-                "Cannot find 'namelists' directory in current working directory"
-            )
-            sys.exit(1)
+            msg = "Cannot find 'namelists' directory in current working directory"
+            raise PreflightError(msg)
 
+    def _check_project(self, project: Optional[str]):
         if project is None:
             msg = """Couldn't resolve project: check 'project' in config.yaml
                 and/or $PROJECT set in ~/.config/gadi-login.conf
                 """
             raise AttributeError(msg)
 
+    def _check_groups(self, project: Optional[str]):
         required_groups = set([project, "ks32", "xp65"])
         groups = [grp.getgrgid(gid).gr_name for gid in os.getgroups()]
         if not required_groups.issubset(groups):
             msg = (
                 f"""Error: user does not have the required group permissions.,
                 The required groups are:,
-                {", ".join(required_groups)}""",
+                {", ".join(map(str, required_groups))}""",
             )
             raise PermissionError(msg)
 
-        for modname in modules:
-            if not self.modules_handler.module_is_avail(modname):
-                logger.error(f"Module ({modname}) is not available.")
-                sys.exit(1)
+    def _check_module(self, modname: str):
+        if not self.modules_handler.module_is_avail(modname):
+            msg = f"Module ({modname}) is not available."
+            raise PreflightError(msg)
 
+    def _check_system_paths(self):
         system_paths = os.getenv("PATH").split(":")[: len(internal.SYSTEM_PATHS)]
         if set(system_paths) != set(internal.SYSTEM_PATHS):
             msg = f"""Error: System paths are not prioritized over user-defined paths
@@ -130,56 +151,150 @@ class Benchcab:
             """
             raise EnvironmentError(msg)
 
-        all_site_ids = set(
-            internal.MEORG_EXPERIMENTS["five-site-test"]
-            + internal.MEORG_EXPERIMENTS["forty-two-site-test"]
+    def _check_met_forcing(self):
+        fluxsite_config = self._config["fluxsite"]
+        try:
+            get_met_forcing_file_names(
+                fluxsite_config["experiment"],
+                met_dir=Path(fluxsite_config["met_dir"]),
+                sites=fluxsite_config["sites"],
+            )
+        except FileNotFoundError as exc:
+            msg = f"Met forcing directory {fluxsite_config['met_dir']} does not exist."
+            raise PreflightError(msg) from exc
+        except MetForcingError as exc:
+            raise PreflightError(str(exc)) from exc
+
+    def _get_preflight_checks(
+        self, project: Optional[str], modules: list
+    ) -> dict[str, Callable[[], None]]:
+        """Returns the environment checks to run, in order, keyed by name."""
+        return {
+            "node": self._check_node,
+            "namelists": self._check_namelists,
+            "project": functools.partial(self._check_project, project),
+            "groups": functools.partial(self._check_groups, project),
+            **{
+                f"module {modname}": functools.partial(self._check_module, modname)
+                for modname in modules
+            },
+            "system paths": self._check_system_paths,
+            "met forcing": self._check_met_forcing,
+        }
+
+    def _get_preflight_cache_path(self) -> Optional[Path]:
+        """Returns the path of the cached result of the environment checks.
+
+        Results are cached per user, node, work directory and configuration.
+        Inside a PBS job the node on which the job was submitted is used so
+        that the checks which passed on submission are not repeated.
+        """
+        if self._config_hash is None:
+            return None
+        node = os.environ.get("PBS_O_HOST", internal.NODENAME)
+        return get_cache_path(
+            internal.PREFLIGHT_CACHE_DIR,
+            getpass.getuser(),
+            node,
+            str(Path.cwd()),
+            self._config_hash,
         )
-        for site_id in all_site_ids:
-            paths = list(internal.MET_DIR.glob(f"{site_id}*"))
-            if not paths:
-                logger.error(f"Failed to infer met file for site id '{site_id}' in ")
-                logger.error(f"{internal.MET_DIR}.")
 
+    def _validate_environment(self, project: str, modules: list):
+        """Performs checks on current user environment."""
+        logger = self._get_logger()
+        if not self.validate_env or self._env_validated:
+            return
+
+        cache_path = self._get_preflight_cache_path()
+        if cache_path:
+            # Checks that passed on submission do not expire inside the job
+            ttl = None if "PBS_JOBID" in os.environ else internal.PREFLIGHT_CACHE_TTL
+            if load_cache(cache_path, ttl=ttl) is not None:
+                logger.debug(f"Using cached environment checks from {cache_path}")
+                self._env_validated = True
+                return
+
+        for check in self._get_preflight_checks(project, modules).values():
+            try:
+                check()
+            except PreflightError as exc:
+                logger.error(str(exc))
                 sys.exit(1)
-            if len(paths) > 1:
-                logger.error(
-                    f"Multiple paths infered for site id: '{site_id}' in {internal.MET_DIR}."
-                )
-                sys.exit(1)
+
+        if cache_path:
+            save_cache(cache_path, {"project": project, "modules": modules})
+        self._env_validated = True
 
     def _get_config(self, config_path: str) -> dict:
         if not self._config:
             self._config = read_config(config_path)
+            # Note: the hash is computed before the config is modified by
+            # `_get_models`
+            self._config_hash = get_config_hash(self._config)
         return self._config
 
     def _get_models(self, config: dict) -> list[Model]:
         if not self._models:
+            mirror_dir = config.get("mirror_dir")
             for id, sub_config in enumerate(config["realisations"]):
+                spec = sub_config.pop("repo")
+                if sub_config.get("build_script") and spec.get("git", {}).get("slim"):
+                    # Custom build scripts may require files outside of the
+                    # offline build sources so fall back to a full clone
+                    self._get_logger().warning(
+                        "Ignoring 'slim' checkout for realisation with custom "
+                        f"build script {sub_config['build_script']}"
+                    )
+                    spec["git"]["slim"] = False
                 repo = create_repo(
-                    spec=sub_config.pop("repo"),
+                    spec=spec,
                     path=internal.SRC_DIR
                     / (sub_config["name"] if sub_config["name"] else Path()),
+                    mirror_dir=Path(mirror_dir).expanduser() if mirror_dir else None,
                 )
                 self._models.append(Model(repo=repo, model_id=id, **sub_config))
         return self._models
 
     def _fluxsite_show_task_composition(self, config: dict) -> str:
-        n_models = len(self._get_models(config))
-        n_sites = len(get_met_forcing_file_names(config["fluxsite"]["experiment"]))
-        n_science_configurations = len(config["science_configurations"])
-        return (
+        tasks = self._get_fluxsite_tasks(config)
+        n_models = len({task.model.model_id for task in tasks})
+        n_sites = len({task.met_forcing_file for task in tasks})
+        n_science_configurations = len({task.sci_conf_id for task in tasks})
+        composition = (
             f"models: {n_models}, "
             f"sites: {n_sites}, "
             f"science configurations: {n_science_configurations}"
         )
-
-    def _get_fluxsite_tasks(self, config: dict) -> list[fluxsite.FluxsiteTask]:
+        if config["fluxsite"]["ensemble"]:
+            n_members = len({task.ensemble_member for task in tasks})
+            composition += f", ensemble members: {n_members}"
+        return composition
+
+    def _get_fluxsite_tasks(
+        self, config: dict, use_manifest: bool = True
+    ) -> list[fluxsite.FluxsiteTask]:
+        if not self._fluxsite_tasks and use_manifest:
+            # Models only wrap the repository specs of the realisations: the
+            # repositories are not queried and the met directory is not read
+            tasks = fluxsite.load_task_manifest(
+                models=self._get_models(config), config_hash=self._config_hash
+            )
+            self._fluxsite_tasks = tasks if tasks else []
         if not self._fluxsite_tasks:
             self._fluxsite_tasks = fluxsite.get_fluxsite_tasks(
                 models=self._get_models(config),
                 science_configurations=config["science_configurations"],
                 fluxsite_forcing_file_names=get_met_forcing_file_names(
-                    config["fluxsite"]["experiment"]
+                    config["fluxsite"]["experiment"],
+                    met_dir=Path(config["fluxsite"]["met_dir"]),
+                    sites=config["fluxsite"]["sites"],
+                ),
+                met_dir=Path(config["fluxsite"]["met_dir"]),
+                ensemble_size=(
+                    config["fluxsite"]["ensemble"]["size"]
+                    if config["fluxsite"]["ensemble"]
+                    else None
                 ),
             )
         return self._fluxsite_tasks
@@ -190,7 +305,12 @@ class Benchcab:
                 models=self._get_models(config),
                 met_forcings=config["spatial"]["met_forcings"],
                 science_configurations=config["science_configurations"],
-                payu_args=config["spatial"]["payu"]["args"],
+                payu_args=(
+                    # Packed tasks run each payu experiment once
+                    None
+                    if config["spatial"]["pack"]
+                    else config["spatial"]["payu"]["args"]
+                ),
             )
         return self._spatial_tasks
 
@@ -198,6 +318,47 @@ class Benchcab:
         """Endpoint for `benchcab validate_config`."""
         _ = self._get_config(config_path)
 
+    def doctor(self, config_path: str):
+        """Endpoint for `benchcab doctor`.
+
+        Runs all environment checks in parallel, bypassing and refreshing the
+        cached result, and reports the time taken by each check. Snapshots of
+        module environments are also discarded.
+        """
+        logger = self._get_logger()
+        config = self._get_config(config_path)
+        cache_path = self._get_preflight_cache_path()
+        invalidate_cache(cache_path)
+        self.modules_handler.invalidate_snapshots()
+
+        def timed(check: Callable[[], None]) -> tuple[float, Optional[Exception]]:
+            start = time.perf_counter()
+            try:
+                check()
+            except Exception as exc:
+                return time.perf_counter() - start, exc
+            return time.perf_counter() - start, None
+
+        checks = self._get_preflight_checks(config["project"], config["modules"])
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            results = dict(zip(checks, executor.map(timed, checks.values())))
+
+        failed = False
+        for name, (elapsed, exc) in results.items():
+            status = "FAIL" if exc else "PASS"
+            logger.info(f"{status} {name} ({elapsed:.2f}s)")
+            if exc:
+                failed = True
+                logger.error(str(exc))
+
+        if failed:
+            sys.exit(1)
+        save_cache(
+            cache_path, {"project": config["project"], "modules": config["modules"]}
+        )
+        self._env_validated = True
+        logger.info("All environment checks passed")
+
     def fluxsite_submit_job(self, config_path: str, skip: list[str]) -> None:
         """Submits the PBS job script step in the fluxsite test workflow."""
         logger = self._get_logger()
@@ -249,7 +410,8 @@ class Benchcab:
         if config.get("meorg_output_name") is not None:
             bm.do_meorg(
                 config,
-                upload_dir=internal.FLUXSITE_DIRS["OUTPUT"],
+                config_path,
+                upload_dir=internal.FLUXSITE_DIRS["MEORG"],
                 benchcab_bin=str(self.benchcab_exe_path),
                 benchcab_job_id=job_id,
             )
@@ -260,24 +422,48 @@ class Benchcab:
         config = self._get_config(config_path)
         self._validate_environment(project=config["project"], modules=config["modules"])
 
-        coverage_tasks = get_coverage_tasks_default(
-            models=self._get_models(config=config)
-        )
+        models = self._get_models(config=config)
+        coverage_tasks = get_coverage_tasks_default(models=models)
 
         if not config["codecov"]:
             msg = """`config.yaml` should have set `codecov: true` before building and
             running `gen_codecov`."""
             raise ValueError(msg)
 
+        # Resolve the compiler environment once before it is used by the workers.
+        # The coverage tasks load the snapshot persisted by this handler.
+        self.modules_handler.get_snapshot([internal.DEFAULT_MODULES["intel-compiler"]])
+
         logger.info("Running coverage tasks...")
         if config["fluxsite"]["multiprocess"]:
             ncpus = config["fluxsite"]["pbs"]["ncpus"]
-            run_coverages_in_parallel(coverage_tasks, n_processes=ncpus)
+            run_coverages_in_parallel(
+                coverage_tasks, n_processes=ncpus, pool=self._pool
+            )
         else:
             run_coverage_tasks(coverage_tasks)
         logger.info("Successfully ran coverage tasks")
 
-    def checkout(self, config_path: str):
+        if len(models) > 1:
+            logger.info("Comparing coverage between realisations...")
+            results = [task.load_results() for task in coverage_tasks]
+            for model, result in zip(models[1:], results[1:]):
+                delta = get_coverage_delta(results[0], result)
+                path = (
+                    internal.CODECOV_DIR
+                    / f"delta_R{models[0].model_id}_R{model.model_id}.json"
+                )
+                save_coverage_delta(
+                    {"base": models[0].name, "realisation": model.name, **delta},
+                    path,
+                )
+                logger.info(
+                    f"{model.name}: {delta['n_added']} routine(s) newly exercised, "
+                    f"{delta['n_removed']} no longer exercised relative to "
+                    f"{models[0].name} (see {path})"
+                )
+
+    def checkout(self, config_path: str, update: bool = False):
         """Endpoint for `benchcab checkout`."""
         logger = self._get_logger()
         config = self._get_config(config_path)
@@ -286,24 +472,70 @@ class Benchcab:
         mkdir(internal.SRC_DIR, exist_ok=True)
 
         logger.info("Checking out repositories...")
-        rev_number_log = ""
+        models = self._get_models(config)
+
+        # Checkouts are network bound so we run them concurrently, but collect
+        # the results in realisation order so that the revision log is stable.
+        with ThreadPoolExecutor(
+            max_workers=min(internal.CHECKOUT_MAX_WORKERS, len(models) or 1)
+        ) as executor:
+            futures = [
+                executor.submit(self._checkout_model, model, update)
+                for model in models
+            ]
 
-        for model in self._get_models(config):
+        rev_number_log = ""
+        failed: list[tuple[Model, Exception]] = []
+        for model, future in zip(models, futures):
             try:
-                model.repo.checkout()
-            except Exception:
-                msg = "Try using `benchcab clean realisations` first"
+                revision = future.result()
+            except Exception as exc:
                 logger.error(
-                    "Model checkout failed, probably due to existing realisation name"
+                    f"Model checkout failed for realisation {model.name}: "
+                    f"{type(exc).__name__}: {exc}"
                 )
-                raise FileExistsError(msg)
-            rev_number_log += f"{model.name}: {model.repo.get_revision()}\n"
+                failed.append((model, exc))
+                continue
+            rev_number_log += f"{model.name}: {revision}\n"
+
+        if failed:
+            existing = [
+                model.name
+                for model, _ in failed
+                if Path(model.repo.realisation_path).exists()
+            ]
+            msg = (
+                "Failed to check out realisations "
+                f"{', '.join(model.name for model, _ in failed)}."
+            )
+            if existing:
+                msg += (
+                    f" Realisations {', '.join(existing)} already exist: try using "
+                    "`benchcab clean realisations` or `--update` to update existing "
+                    "realisations."
+                )
+                raise FileExistsError(msg) from failed[0][1]
+            raise RuntimeError(msg) from failed[0][1]
 
         rev_number_log_path = next_path("rev_number-*.log")
         logger.info(f"Writing revision number info to {rev_number_log_path}")
         with rev_number_log_path.open("w", encoding="utf-8") as file:
             file.write(rev_number_log)
 
+    def _checkout_model(self, model: Model, update: bool = False) -> str:
+        """Checkout (or update) a single realisation and return its revision."""
+        logger = self._get_logger()
+        if update and Path(model.repo.realisation_path).exists():
+            logger.info(f"Updating realisation {model.name}...")
+            if not model.repo.update():
+                logger.info(f"Realisation {model.name} is unchanged")
+        else:
+            logger.info(f"Checking out realisation {model.name}...")
+            model.repo.checkout()
+        provenance = model.save_provenance()
+        logger.info(f"Successfully checked out realisation {model.name}")
+        return provenance["revision"]
+
     def build(self, config_path: str, mpi=False):
         """Endpoint for `benchcab build`."""
         logger = self._get_logger()
@@ -337,9 +569,20 @@ class Benchcab:
 
         logger.info("Setting up run directory tree for fluxsite tests...")
         setup_fluxsite_directory_tree()
+        if config["fluxsite"]["ensemble"]:
+            logger.info("Writing perturbed namelists for ensemble members...")
+            write_member_namelists(config["fluxsite"]["ensemble"])
         logger.info("Setting up tasks...")
-        for task in self._get_fluxsite_tasks(config):
+        tasks = self._get_fluxsite_tasks(config, use_manifest=False)
+        for task in tasks:
             task.setup_task()
+        if config["fluxsite"]["deduplicate"]:
+            n_aliases = fluxsite.deduplicate_tasks(tasks)
+            logger.info(
+                f"{n_aliases} tasks are identical to other tasks and are linked to "
+                "their outputs instead of being run"
+            )
+        fluxsite.save_task_manifest(tasks, config_hash=self._config_hash)
         logger.info("Successfully setup fluxsite tasks")
 
     def fluxsite_run_tasks(self, config_path: str):
@@ -353,11 +596,28 @@ class Benchcab:
         logger.info(
             f"tasks: {len(tasks)} ({self._fluxsite_show_task_composition(config)})"
         )
-        if config["fluxsite"]["multiprocess"]:
-            ncpus = config["fluxsite"]["pbs"]["ncpus"]
-            fluxsite.run_tasks_in_parallel(tasks, n_processes=ncpus)
-        else:
-            fluxsite.run_tasks(tasks)
+        merger = None
+        if config["codecov"]:
+            # Merge coverage data in the background as tasks complete. The
+            # coverage tasks load the snapshot persisted by this handler.
+            self.modules_handler.get_snapshot(
+                [internal.DEFAULT_MODULES["intel-compiler"]]
+            )
+            merger = CoverageMerger(
+                get_coverage_tasks_default(self._get_models(config))
+            )
+        on_complete = merger.notify if merger is not None else None
+        try:
+            if config["fluxsite"]["multiprocess"]:
+                ncpus = config["fluxsite"]["pbs"]["ncpus"]
+                fluxsite.run_tasks_in_parallel(
+                    tasks, n_processes=ncpus, pool=self._pool, on_complete=on_complete
+                )
+            else:
+                fluxsite.run_tasks(tasks, on_complete=on_complete)
+        finally:
+            if merger is not None:
+                merger.close()
 
         _, n_success, n_failed, _ = task_summary(tasks)
         logger.info(f"{n_failed} failed, {n_success} passed")
@@ -368,14 +628,14 @@ class Benchcab:
         config = self._get_config(config_path)
         self._validate_environment(project=config["project"], modules=config["modules"])
 
-        if not self.modules_handler.module_is_loaded("nccmp/1.8.5.0"):
-            self.modules_handler.module_load(
-                "nccmp/1.8.5.0"
-            )  # use `nccmp -df` for bitwise comparisons
+        # use `nccmp -df` for bitwise comparisons
+        env = self.modules_handler.get_environment(["nccmp/1.8.5.0"])
 
         comparisons = fluxsite.get_fluxsite_comparisons(
             self._get_fluxsite_tasks(config)
         )
+        for comparison in comparisons:
+            comparison.env = env
 
         logger.info("Running comparison tasks...")
         logger.info(
@@ -383,26 +643,52 @@ class Benchcab:
         )
         if config["fluxsite"]["multiprocess"]:
             ncpus = config["fluxsite"]["pbs"]["ncpus"]
-            run_comparisons_in_parallel(comparisons, n_processes=ncpus)
+            run_comparisons_in_parallel(
+                comparisons, n_processes=ncpus, pool=self._pool
+            )
         else:
             run_comparisons(comparisons)
 
         _, n_success, n_failed, _ = task_summary(comparisons)
         logger.info(f"{n_failed} failed, {n_success} passed")
 
-    def fluxsite(self, config_path: str, no_submit: bool, skip: list[str]):
+    def fluxsite(
+        self, config_path: str, no_submit: bool, skip: list[str], update: bool = False
+    ):
         """Endpoint for `benchcab fluxsite`."""
-        self.checkout(config_path)
+        self.checkout(config_path, update=update)
         self.build(config_path)
         self.fluxsite_setup_work_directory(config_path)
         if no_submit:
+            self.fluxsite_job(config_path, skip)
+        else:
+            self.fluxsite_submit_job(config_path, skip)
+
+    def fluxsite_job(self, config_path: str, skip: list[str]):
+        """Endpoint for `benchcab fluxsite-job`.
+
+        Runs the fluxsite tasks, bitwise comparisons and code coverage stages in
+        a single process so that the config, models, tasks and worker pool are
+        shared between stages.
+        """
+        config = self._get_config(config_path)
+        self._validate_environment(project=config["project"], modules=config["modules"])
+
+        try:
+            if config["fluxsite"]["multiprocess"]:
+                self._pool = multiprocessing.Pool(config["fluxsite"]["pbs"]["ncpus"])
             self.fluxsite_run_tasks(config_path)
             if "fluxsite-bitwise-cmp" not in skip:
                 self.fluxsite_bitwise_cmp(config_path)
-            if "codecov" not in skip:
+            if "gen_codecov" not in skip and config["codecov"]:
                 self.gen_codecov(config_path)
-        else:
-            self.fluxsite_submit_job(config_path, skip)
+            if config.get("meorg_output_name") is not None:
+                self.meorg_slim_outputs(config_path)
+        finally:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
 
     def clean(self, config_path: str, clean_option: str):
         """Endpoint for `benchcab clean`."""
@@ -424,36 +710,274 @@ class Benchcab:
             payu_config = config["spatial"]["payu"]["config"]
         except KeyError:
             payu_config = None
-        for task in self._get_spatial_tasks(config):
-            task.setup_task(payu_config=payu_config)
+        if (
+            config["spatial"]["scaling"]
+            and config["spatial"]["scaling"]["apply"]
+            and "ncpus" not in (payu_config or {})
+        ):
+            ncpus = scaling.load_recommended_ncpus()
+            if ncpus is not None:
+                logger.info(f"Using {ncpus} CPUs recommended by the scaling study")
+                payu_config = {**(payu_config or {}), "ncpus": ncpus}
+        pack = config["spatial"]["pack"]
+        if pack:
+            ncpus, remainder = divmod(pack["pbs"]["ncpus"], pack["size"])
+            if ncpus == 0 or remainder:
+                logger.error(
+                    f"Unable to split {pack['pbs']['ncpus']} CPUs evenly between "
+                    f"{pack['size']} tasks: `spatial.pack.pbs.ncpus` must be a "
+                    "multiple of `spatial.pack.size`"
+                )
+                sys.exit(1)
+            logger.info(
+                f"Packing {pack['size']} tasks per PBS job with {ncpus} CPUs each"
+            )
+            payu_config = {**(payu_config or {}), "ncpus": ncpus}
+        spatial.setup_tasks(self._get_spatial_tasks(config), payu_config=payu_config)
         logger.info("Successfully setup spatial tasks")
 
-    def spatial_run_tasks(self, config_path: str):
+    def spatial_run_tasks(self, config_path: str, resume: bool = False):
         """Endpoint for `benchcab spatial-run-tasks`."""
         logger = self._get_logger()
         config = self._get_config(config_path)
         self._validate_environment(project=config["project"], modules=config["modules"])
 
+        tasks = self._get_spatial_tasks(config)
+        if resume:
+            states = spatial.update_states(tasks)
+            summary = ", ".join(
+                f"{state}: {states.count(state)}" for state in sorted(set(states))
+            )
+            logger.info(f"Spatial task states ({summary})")
+            tasks = [
+                task
+                for task, state in zip(tasks, states)
+                if state in ["pending", "failed"]
+            ]
+
         logger.info("Running spatial tasks...")
-        spatial.run_tasks(tasks=self._get_spatial_tasks(config))
+        dispatch = config["spatial"]["dispatch"]
+        if config["spatial"]["pack"]:
+            spatial.run_packed_tasks(
+                tasks=tasks,
+                project=config["project"],
+                size=config["spatial"]["pack"]["size"],
+                pbs_config=config["spatial"]["pack"]["pbs"],
+                modules=config["modules"],
+                max_queued_jobs=dispatch["max_queued_jobs"],
+            )
+            logger.info("The payu output of each task is written to:")
+            logger.info(
+                f"{internal.SPATIAL_TASKS_DIR}/<task_name>/"
+                f"{internal.SPATIAL_PACK_STDOUT_FNAME}"
+            )
+        else:
+            spatial.run_tasks(
+                tasks=tasks,
+                max_workers=dispatch["max_workers"],
+                max_queued_jobs=dispatch["max_queued_jobs"],
+            )
         logger.info("Successfully dispatched payu jobs")
 
-    def spatial(self, config_path: str, skip: list):
+    def _get_scaling_tasks(self, config: dict) -> list[spatial.SpatialTask]:
+        if not config["spatial"]["scaling"]:
+            self._get_logger().error(
+                "No MPI scaling study configured: specify `spatial.scaling.ncpus` "
+                "in the config file"
+            )
+            sys.exit(1)
+        return scaling.get_scaling_tasks(
+            models=self._get_models(config),
+            met_forcings=config["spatial"]["met_forcings"],
+            science_configurations=config["science_configurations"],
+            ncpus=config["spatial"]["scaling"]["ncpus"],
+        )
+
+    def spatial_scaling_run(self, config_path: str):
+        """Endpoint for `benchcab spatial-scaling-run`."""
+        logger = self._get_logger()
+        config = self._get_config(config_path)
+        self._validate_environment(project=config["project"], modules=config["modules"])
+        tasks = self._get_scaling_tasks(config)
+
+        logger.info("Setting up MPI scaling study...")
+        setup_spatial_directory_tree()
+        spatial.setup_tasks(tasks, payu_config=config["spatial"]["payu"]["config"])
+        logger.info(
+            f"Running spatial task {tasks[0].get_task_name().rsplit('_N', 1)[0]} with "
+            f"ncpus: {', '.join(str(task.ncpus) for task in tasks)}"
+        )
+        dispatch = config["spatial"]["dispatch"]
+        spatial.run_tasks(
+            tasks=tasks,
+            max_workers=dispatch["max_workers"],
+            max_queued_jobs=dispatch["max_queued_jobs"],
+        )
+        logger.info(
+            "Successfully dispatched payu jobs. Run `benchcab spatial-scaling-report` "
+            "once the jobs have finished."
+        )
+
+    def spatial_scaling_report(self, config_path: str):
+        """Endpoint for `benchcab spatial-scaling-report`."""
+        logger = self._get_logger()
+        config = self._get_config(config_path)
+        tasks = self._get_scaling_tasks(config)
+
+        states = spatial.update_states(tasks)
+        incomplete = [
+            f"{task.get_task_name()} ({state})"
+            for task, state in zip(tasks, states)
+            if state != "completed"
+        ]
+        if incomplete:
+            logger.warning(f"Skipping incomplete tasks: {', '.join(incomplete)}")
+
+        report = scaling.get_scaling_report(
+            tasks, config["spatial"]["scaling"]["min_efficiency"]
+        )
+        if not report["results"]:
+            logger.error("No completed scaling runs to report on")
+            sys.exit(1)
+        scaling.save_scaling_report(report)
+        for result in report["results"]:
+            su = f"{result['su']:.2f}" if result["su"] is not None else "unknown"
+            logger.info(
+                f"ncpus: {result['ncpus']}, walltime: {result['walltime']:.0f} s, "
+                f"SU: {su}, speedup: {result['speedup']:.2f}, "
+                f"efficiency: {result['efficiency']:.2f}"
+            )
+        logger.info(
+            f"Recommended ncpus: {report['recommended_ncpus']} (see "
+            f"{internal.SPATIAL_SCALING_REPORT})"
+        )
+
+    def spatial(self, config_path: str, skip: list, update: bool = False):
         """Endpoint for `benchcab spatial`."""
-        self.checkout(config_path)
+        self.checkout(config_path, update=update)
         self.build(config_path, mpi=True)
         self.spatial_setup_work_directory(config_path)
         self.spatial_run_tasks(config_path)
 
-    def run(self, config_path: str, skip: list[str]):
+    def run(self, config_path: str, skip: list[str], update: bool = False):
         """Endpoint for `benchcab run`."""
-        self.checkout(config_path)
+        self.checkout(config_path, update=update)
         self.build(config_path, mpi=True)
         self.fluxsite_setup_work_directory(config_path)
         self.spatial_setup_work_directory(config_path)
         self.fluxsite_submit_job(config_path, skip)
         self.spatial_run_tasks(config_path)
 
+    def _meorg_sync(
+        self, client, model_output_id: str, data_dir: str, max_workers: int
+    ) -> set[str]:
+        """Synchronises `data_dir` with a model output.
+
+        Returns the ids of the files uploaded by the synchronisation.
+        """
+        logger = self._get_logger()
+        files = sorted(Path(data_dir).glob("*.nc"))
+        manifest_path = internal.MEORG_MANIFEST_DIR / f"{model_output_id}.json"
+        previous_ids = {
+            entry["file_id"] for entry in bm.load_upload_manifest(manifest_path).values()
+        }
+        logger.info(
+            f"Synchronising {len(files)} files in {data_dir} with model output "
+            f"{model_output_id}"
+        )
+        summary = bm.sync_files(
+            client, model_output_id, files, manifest_path, max_workers=max_workers
+        )
+        logger.info(
+            f"{summary['uploaded']} uploaded, {summary['deleted']} deleted, "
+            f"{summary['unchanged']} unchanged"
+        )
+        return {
+            entry["file_id"] for entry in bm.load_upload_manifest(manifest_path).values()
+        } - previous_ids
+
+    def meorg_upload(self, config_path: str, model_output_id: str, data_dir: str):
+        """Endpoint for `benchcab meorg-upload`."""
+        config = self._get_config(config_path)
+        self._meorg_sync(
+            bm.get_client(),
+            model_output_id,
+            data_dir,
+            max_workers=config["meorg_upload_workers"],
+        )
+
+    def meorg_job(self, config_path: str, model_output_id: str, data_dir: str):
+        """Endpoint for `benchcab meorg-job`.
+
+        Uploads the model outputs, waits until the uploaded files are
+        transferred to the object store and starts the analysis of the
+        fluxsite experiment. The analysis is started after `meorg_max_wait`
+        seconds even if some files are not transferred yet.
+        """
+        logger = self._get_logger()
+        config = self._get_config(config_path)
+        experiment = internal.MEORG_EXPERIMENT_ID_MAP[config["fluxsite"]["experiment"]]
+
+        client = bm.get_client()
+        file_ids = self._meorg_sync(
+            client,
+            model_output_id,
+            data_dir,
+            max_workers=config["meorg_upload_workers"],
+        )
+
+        logger.info(f"Waiting for {len(file_ids)} files to reach the object store")
+        start = time.monotonic()
+        pending = bm.wait_for_files(client, file_ids, config["meorg_max_wait"])
+        if pending:
+            logger.warning(
+                f"{len(pending)} files are not in the object store after "
+                f"{config['meorg_max_wait']} sec, starting the analysis anyway"
+            )
+        else:
+            logger.info(f"Files ready after {time.monotonic() - start:.0f} sec")
+
+        analysis_ids = bm.start_analyses(
+            client,
+            model_output_id,
+            experiment_ids=[experiment["experiment"]],
+            benchmark_ids=experiment["benchmarks"],
+        )
+        logger.info(f"Started analyses: {', '.join(analysis_ids)}")
+
+    def meorg_slim_outputs(self, config_path: str):
+        """Writes the slimmed copies of the fluxsite outputs uploaded to modelevaluation.org.
+
+        Only outputs of completed tasks which changed since their copy was last
+        written are slimmed. Outputs of failed tasks and of aliased tasks are
+        not uploaded. Outputs are slimmed in parallel when
+        `fluxsite.multiprocess` is enabled.
+        """
+        logger = self._get_logger()
+        config = self._get_config(config_path)
+
+        tasks = [
+            task for task in self._get_fluxsite_tasks(config) if task.alias_of is None
+        ]
+        filenames = [task.get_output_filename() for task in tasks if task.is_done()]
+        if len(filenames) < len(tasks):
+            logger.warning(
+                f"{len(tasks) - len(filenames)} tasks have failed, their outputs "
+                "are not uploaded to modelevaluation.org"
+            )
+        files = bm.get_slim_output_files(
+            internal.FLUXSITE_DIRS["OUTPUT"], internal.FLUXSITE_DIRS["MEORG"], filenames
+        )
+        logger.info(
+            f"Slimming {len(files)} output files for upload to modelevaluation.org"
+        )
+        if files and config["fluxsite"]["multiprocess"]:
+            ncpus = config["fluxsite"]["pbs"]["ncpus"]
+            bm.slim_output_files_in_parallel(files, n_processes=ncpus, pool=self._pool)
+        else:
+            bm.slim_output_files(files)
+        logger.info(f"Slimmed outputs are written to {internal.FLUXSITE_DIRS['MEORG']}")
+
     def meorg_transfer(self, config_path: str):
         """Endpoint for `benchcab meorg-transfer`"""
 
@@ -477,11 +1001,14 @@ class Benchcab:
             logger.error("meorg_output_name is not defined in config, unable to transfer files.")
             sys.exit(1)
 
+        self.meorg_slim_outputs(config_path)
+
         # Upload to meorg if meorg_output_name optional key is passed
         logger.info("Submitting job for meorg transfer")
         bm.do_meorg(
             config,
-            upload_dir=internal.FLUXSITE_DIRS["OUTPUT"],
+            config_path,
+            upload_dir=internal.FLUXSITE_DIRS["MEORG"],
             benchcab_bin=str(self.benchcab_exe_path),
             benchcab_job_id=None,
         )
\ No newline at end of file
@@ -46,6 +46,15 @@ def generate_parser(app: Benchcab) -> argparse.ArgumentParser:
         help="Force benchcab to execute tasks on the current compute node.",
     )
 
+    # parent parser that contains the argument for --update
+    args_update = argparse.ArgumentParser(add_help=False)
+    args_update.add_argument(
+        "--update",
+        action="store_true",
+        help="""Update existing realisations in place instead of checking them out
+        again. Build directories are kept so that CABLE can be rebuilt incrementally.""",
+    )
+
     # parent parser that contains arguments common to all composite subcommands
     args_composite_subcommand = argparse.ArgumentParser(add_help=False)
     args_composite_subcommand.add_argument(
@@ -80,6 +89,7 @@ def generate_parser(app: Benchcab) -> argparse.ArgumentParser:
         parents=[
             args_help,
             args_subcommand,
+            args_update,
             args_composite_subcommand,
         ],
         help="Run all test suites for CABLE.",
@@ -102,6 +112,19 @@ def generate_parser(app: Benchcab) -> argparse.ArgumentParser:
     )
     parser_validate_config.set_defaults(func=app.validate_config)
 
+    # subcommand: 'benchcab doctor'
+    parser_doctor = subparsers.add_parser(
+        "doctor",
+        parents=[args_help, args_subcommand],
+        help="Run all environment checks and report their timings.",
+        description="""Runs all environment checks performed before each command in
+        parallel and reports the time taken by each check. The cached result of the
+        checks is discarded and refreshed if all checks pass. Cached snapshots of the
+        environment set by modules are also discarded.""",
+        add_help=False,
+    )
+    parser_doctor.set_defaults(func=app.doctor)
+
     # subcommand: 'benchcab fluxsite'
     parser_fluxsite = subparsers.add_parser(
         "fluxsite",
@@ -109,6 +132,7 @@ def generate_parser(app: Benchcab) -> argparse.ArgumentParser:
             args_help,
             args_subcommand,
             args_no_submit,
+            args_update,
             args_composite_subcommand,
         ],
         help="Run the fluxsite test suite for CABLE.",
@@ -122,7 +146,7 @@ def generate_parser(app: Benchcab) -> argparse.ArgumentParser:
     # subcommand: 'benchcab checkout'
     parser_checkout = subparsers.add_parser(
         "checkout",
-        parents=[args_help, args_subcommand],
+        parents=[args_help, args_subcommand, args_update],
         help="Run the checkout step in the benchmarking workflow.",
         description="""Checkout CABLE repositories specified in the config file and the CABLE-AUX
         repository.""",
@@ -193,10 +217,24 @@ def generate_parser(app: Benchcab) -> argparse.ArgumentParser:
     )
     parser_fluxsite_bitwise_cmp.set_defaults(func=app.fluxsite_bitwise_cmp)
 
+    # subcommand: 'benchcab fluxsite-job'
+    parser_fluxsite_job = subparsers.add_parser(
+        "fluxsite-job",
+        parents=[args_help, args_subcommand, args_composite_subcommand],
+        help="Run all compute stages of the fluxsite command in a single process.",
+        description="""Runs the fluxsite tasks, bitwise comparisons and code coverage
+        analysis (if enabled) for the fluxsite test suite in a single process so that
+        the configuration, tasks and worker pool are shared between stages. Note, this
+        command should ideally be run inside a PBS job. This command is invoked by the
+        PBS job script generated by `benchcab run`.""",
+        add_help=False,
+    )
+    parser_fluxsite_job.set_defaults(func=app.fluxsite_job)
+
     # subcommand: 'benchcab spatial'
     parser_spatial = subparsers.add_parser(
         "spatial",
-        parents=[args_help, args_subcommand, args_composite_subcommand],
+        parents=[args_help, args_subcommand, args_update, args_composite_subcommand],
         help="Run the spatial tests only.",
         description="""Runs the default spatial test suite for CABLE.""",
         add_help=False,
@@ -222,8 +260,37 @@ def generate_parser(app: Benchcab) -> argparse.ArgumentParser:
         description="Runs the spatial tasks for the spatial test suite.",
         add_help=False,
     )
+    parser_spatial_run_tasks.add_argument(
+        "--resume",
+        action="store_true",
+        help="""Only submit spatial tasks which have not been submitted yet or have
+        failed. Task states are derived from the PBS jobs submitted by payu and
+        the payu archive.""",
+    )
     parser_spatial_run_tasks.set_defaults(func=app.spatial_run_tasks)
 
+    # subcommand 'benchcab spatial-scaling-run'
+    parser_spatial_scaling_run = subparsers.add_parser(
+        "spatial-scaling-run",
+        parents=[args_help, args_subcommand],
+        help="Run an MPI scaling study of the spatial tasks.",
+        description="""Runs a single spatial task once for each number of CPUs
+        specified in `spatial.scaling.ncpus`.""",
+        add_help=False,
+    )
+    parser_spatial_scaling_run.set_defaults(func=app.spatial_scaling_run)
+
+    # subcommand 'benchcab spatial-scaling-report'
+    parser_spatial_scaling_report = subparsers.add_parser(
+        "spatial-scaling-report",
+        parents=[args_help, args_subcommand],
+        help="Report the results of the MPI scaling study.",
+        description="""Reports the wall time, service units and parallel efficiency
+        of each run of the MPI scaling study, and the recommended number of CPUs.""",
+        add_help=False,
+    )
+    parser_spatial_scaling_report.set_defaults(func=app.spatial_scaling_report)
+
     # subcommand: 'benchcab clean'
     parser_clean = subparsers.add_parser(
         "clean",
@@ -267,4 +334,41 @@ def generate_parser(app: Benchcab) -> argparse.ArgumentParser:
     )
     parser_meorg_transfer.set_defaults(func=app.meorg_transfer)
 
+    # subcommand: 'benchcab meorg-upload'
+    parser_meorg_upload = subparsers.add_parser(
+        "meorg-upload",
+        parents=[args_help, args_subcommand],
+        help="Upload new and changed model outputs to modelevaluation.org.",
+        description="""Synchronises the NetCDF files in a directory with the files
+        attached to a model output on modelevaluation.org. Only new or changed files
+        are uploaded and only removed files are deleted.""",
+        add_help=False,
+    )
+    parser_meorg_upload.add_argument(
+        "model_output_id", help="Id of the model output on modelevaluation.org."
+    )
+    parser_meorg_upload.add_argument(
+        "data_dir", help="Directory containing the NetCDF files to upload."
+    )
+    parser_meorg_upload.set_defaults(func=app.meorg_upload)
+
+    # subcommand: 'benchcab meorg-job'
+    parser_meorg_job = subparsers.add_parser(
+        "meorg-job",
+        parents=[args_help, args_subcommand],
+        help="Upload model outputs and start their analysis on modelevaluation.org.",
+        description="""Synchronises the NetCDF files in a directory with a model output
+        on modelevaluation.org, waits until the uploaded files are transferred to the
+        object store and starts the analysis of the fluxsite experiment. This command
+        is run by the PBS job submitted by `benchcab meorg-transfer`.""",
+        add_help=False,
+    )
+    parser_meorg_job.add_argument(
+        "model_output_id", help="Id of the model output on modelevaluation.org."
+    )
+    parser_meorg_job.add_argument(
+        "data_dir", help="Directory containing the NetCDF files to upload."
+    )
+    parser_meorg_job.set_defaults(func=app.meorg_job)
+
     return main_parser
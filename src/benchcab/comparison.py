@@ -3,14 +3,15 @@
 
 """A module containing functions and data structures for running comparison tasks."""
 
-import multiprocessing
 import operator
 import sys
+from multiprocessing.pool import Pool
 from pathlib import Path
 from subprocess import CalledProcessError
+from typing import Optional
 
 from benchcab import internal
-from benchcab.utils import get_logger
+from benchcab.utils import get_logger, worker_pool
 from benchcab.utils.state import State
 from benchcab.utils.subprocess import SubprocessWrapper, SubprocessWrapperInterface
 
@@ -37,6 +38,8 @@ class ComparisonTask:
         """
         self.files = files
         self.task_name = task_name
+        # Environment used to run `nccmp`, defaults to the current environment
+        self.env: Optional[dict] = None
         self.logger = get_logger()
         self.state = State(
             state_dir=internal.STATE_DIR / "fluxsite" / "comparisons" / self.task_name
@@ -69,6 +72,7 @@ class ComparisonTask:
             self.subprocess_handler.run_cmd(
                 f"nccmp -df {file_a} {file_b}",
                 capture_output=True,
+                env=self.env,
             )
             self.logger.info(
                 f"Success: files {file_a.name} {file_b.name} are identical"
@@ -95,8 +99,12 @@ def run_comparisons(comparison_tasks: list[ComparisonTask]) -> None:
 def run_comparisons_in_parallel(
     comparison_tasks: list[ComparisonTask],
     n_processes=internal.FLUXSITE_DEFAULT_PBS["ncpus"],
+    pool: Optional[Pool] = None,
 ) -> None:
-    """Runs bitwise comparison tasks in parallel across multiple processes."""
+    """Runs bitwise comparison tasks in parallel across multiple processes.
+
+    An existing `pool` of worker processes is used if specified.
+    """
     run_task = operator.methodcaller("run")
-    with multiprocessing.Pool(n_processes) as pool:
-        pool.map(run_task, comparison_tasks, chunksize=1)
+    with worker_pool(n_processes, pool) as workers:
+        workers.map(run_task, comparison_tasks, chunksize=1)
@@ -5,23 +5,25 @@
 import os
 from pathlib import Path
 
-import yaml
 import copy
-from cerberus import Validator
 import base64
 import hashlib
+import json
 import benchcab.utils as bu
 from benchcab.internal import MEORG_PROFILE
 from benchcab import internal
 from benchcab.utils.repo import create_repo
 from benchcab.model import Model
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from cerberus import Validator
 
 
 class ConfigValidationError(Exception):
     """When config doesn't match with the defined schema."""
 
-    def __init__(self, validator: Validator):
+    def __init__(self, validator: "Validator"):
         """.
 
         Parameters
@@ -60,6 +62,8 @@ def validate_config(config: dict) -> bool:
         Raised when the configuration file fails validation.
 
     """
+    from cerberus import Validator
+
     # Load the schema
     schema = bu.load_package_data("config-schema.yml")
 
@@ -112,6 +116,19 @@ def read_optional_key(config: dict):
     config["spatial"]["payu"] = config["spatial"].get("payu", {})
     config["spatial"]["payu"]["config"] = config["spatial"]["payu"].get("config", {})
     config["spatial"]["payu"]["args"] = config["spatial"]["payu"].get("args")
+    config["spatial"]["dispatch"] = internal.SPATIAL_DEFAULT_DISPATCH | config[
+        "spatial"
+    ].get("dispatch", {})
+    config["spatial"]["scaling"] = config["spatial"].get("scaling")
+    if config["spatial"]["scaling"]:
+        config["spatial"]["scaling"] = (
+            internal.SPATIAL_DEFAULT_SCALING | config["spatial"]["scaling"]
+        )
+    config["spatial"]["pack"] = config["spatial"].get("pack")
+    if config["spatial"]["pack"]:
+        config["spatial"]["pack"]["pbs"] = internal.SPATIAL_DEFAULT_PACK_PBS | config[
+            "spatial"
+        ]["pack"].get("pbs", {})
 
     # Default values for fluxsite
     config["fluxsite"] = config.get("fluxsite", {})
@@ -119,15 +136,36 @@ def read_optional_key(config: dict):
     config["fluxsite"]["multiprocess"] = config["fluxsite"].get(
         "multiprocess", internal.FLUXSITE_DEFAULT_MULTIPROCESS
     )
+    config["fluxsite"]["deduplicate"] = config["fluxsite"].get(
+        "deduplicate", internal.FLUXSITE_DEFAULT_DEDUPLICATE
+    )
     config["fluxsite"]["experiment"] = config["fluxsite"].get(
         "experiment", internal.FLUXSITE_DEFAULT_EXPERIMENT
     )
+    config["fluxsite"]["met_dir"] = config["fluxsite"].get(
+        "met_dir", str(internal.MET_DIR)
+    )
+    config["fluxsite"]["sites"] = config["fluxsite"].get("sites")
+    config["fluxsite"]["ensemble"] = config["fluxsite"].get("ensemble")
+    if config["fluxsite"]["ensemble"]:
+        config["fluxsite"]["ensemble"] = (
+            internal.FLUXSITE_DEFAULT_ENSEMBLE | config["fluxsite"]["ensemble"]
+        )
     config["fluxsite"]["pbs"] = internal.FLUXSITE_DEFAULT_PBS | config["fluxsite"].get(
         "pbs", {}
     )
 
     config["codecov"] = config.get("codecov", False)
 
+    config["mirror_dir"] = config.get("mirror_dir")
+
+    config["meorg_max_wait"] = config.get(
+        "meorg_max_wait", internal.MEORG_DEFAULT_MAX_WAIT
+    )
+    config["meorg_upload_workers"] = config.get(
+        "meorg_upload_workers", internal.MEORG_DEFAULT_UPLOAD_WORKERS
+    )
+
     return config
 
 
@@ -190,6 +228,13 @@ def add_meorg_output_name(config: dict):
         msg = "More than 1 value set as true"
         raise AssertionError(msg)
 
+    if not mo_names:
+        # The names of the realisations are only needed for the model output
+        # name, so avoid creating their repositories
+        for r in config["realisations"]:
+            r.pop("meorg_output_name", None)
+        return config
+
     mo_names = ""
     for r in config["realisations"]:
         # `meorg_output_name` decided either via `name` parameter in a realisation,
@@ -220,6 +265,25 @@ def add_meorg_output_name(config: dict):
     return config
 
 
+def get_config_hash(config: dict) -> str:
+    """Return a hash which uniquely identifies the contents of `config`.
+
+    Parameters
+    ----------
+    config : dict
+        The configuration dictionary.
+
+    Returns
+    -------
+    str
+        Hex digest of the configuration.
+
+    """
+    return hashlib.sha1(
+        json.dumps(config, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
 def read_config_file(config_path: str) -> dict:
     """Load the config file in a dict.
 
@@ -234,6 +298,8 @@ def read_config_file(config_path: str) -> dict:
         Configuration dict
 
     """
+    import yaml
+
     # Load the configuration file.
     with Path.open(Path(config_path), "r", encoding="utf-8") as file:
         config = yaml.safe_load(file)
@@ -3,17 +3,21 @@
 
 """A module containing functions and data structures for running coverage tasks."""
 
-import multiprocessing
+import json
 import operator
-from contextlib import nullcontext
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.pool import Pool
 from pathlib import Path
 from typing import Optional
 
 from benchcab import internal
 from benchcab.environment_modules import EnvironmentModules, EnvironmentModulesInterface
 from benchcab.model import Model
-from benchcab.utils import get_logger
-from benchcab.utils.fs import chdir
+from benchcab.utils import get_logger, interpolate_file_template, worker_pool
+from benchcab.utils.fs import chdir, file_digest, mkdir
 from benchcab.utils.subprocess import SubprocessWrapper, SubprocessWrapperInterface
 
 
@@ -29,6 +33,7 @@ class CoverageTask:
         project_name: Optional[str] = "CABLE",
         dpi_file: Optional[str] = "pgopti.dpi",
         spi_file: Optional[str] = "pgopti.spi",
+        src_dir: Optional[Path] = None,
     ) -> None:
         """Constructor.
 
@@ -43,6 +48,9 @@ class CoverageTask:
             name of DPI file created after merging .dyn files created after all runs
         spi_file:
             Static profile information on compilation
+        src_dir:
+            Source directory of the realisation, relative to which source
+            files are identified in the coverage results
 
         """
         self.logger = get_logger()
@@ -50,9 +58,82 @@ class CoverageTask:
         self.project_name = project_name
         self.dpi_file = dpi_file
         self.spi_file = spi_file
+        self.src_dir = src_dir
+
+    def _get_environment(self) -> dict[str, str]:
+        # Load intel-compiler in case we run from CLI, otherwise assuming
+        # PBS jobscript loads
+        return self.modules_handler.get_environment(
+            [internal.DEFAULT_MODULES["intel-compiler"]]
+        )
+
+    def get_batch_dir(self) -> Path:
+        """Returns the directory of the intermediate DPI files of this task."""
+        return Path(self.coverage_dir) / internal.CODECOV_BATCH_DIRNAME
+
+    def get_batch_dpi_files(self) -> list[Path]:
+        """Returns the intermediate DPI files of this task in the order they were merged."""
+        return sorted(
+            self.get_batch_dir().glob("*.dpi"), key=lambda path: int(path.stem)
+        )
+
+    def merge_batch(
+        self,
+        min_age: float = internal.CODECOV_DYN_MIN_AGE,
+        env: Optional[dict[str, str]] = None,
+    ) -> Optional[Path]:
+        """Merges `.dyn` files in the coverage directory into an intermediate DPI file.
+
+        The `.dyn` files are moved into a staging directory before they are
+        merged so that they are merged exactly once, and the staging directory
+        is removed after a successful merge.
+
+        Parameters
+        ----------
+        min_age : float, optional
+            Only merge `.dyn` files which were last modified at least `min_age`
+            seconds ago, as files of running tasks may still be written.
+        env : dict[str, str], optional
+            Environment in which `profmerge` is run.
+
+        Returns
+        -------
+        Path, optional
+            The intermediate DPI file, or None if there were no `.dyn` files
+            to merge.
+
+        """
+        now = time.time()
+        dyn_files = [
+            path
+            for path in Path(self.coverage_dir).glob("*.dyn")
+            if now - path.stat().st_mtime >= min_age
+        ]
+        batch_dir = self.get_batch_dir()
+        index = len(self.get_batch_dpi_files())
+        # The staging directory exists if the previous merge failed
+        staging_dir = batch_dir / str(index)
+        if not dyn_files and not staging_dir.exists():
+            return None
+        mkdir(staging_dir, parents=True, exist_ok=True)
+        for path in dyn_files:
+            path.rename(staging_dir / path.name)
+        dpi_path = batch_dir / f"{index}.dpi"
+        self.logger.debug(f"Merging .dyn files into {dpi_path.absolute()}")
+        self.subprocess_handler.run_cmd(
+            f"profmerge -prof-dir {staging_dir.absolute()} "
+            f"-prof-dpi {dpi_path.absolute()}",
+            env=self._get_environment() if env is None else env,
+        )
+        shutil.rmtree(staging_dir)
+        return dpi_path
 
     def run(self) -> None:
-        """Executes `profmerge` and `codecov` to run codecov analysis for a given realisation."""
+        """Executes `profmerge` and `codecov` to run codecov analysis for a given realisation.
+
+        The remaining `.dyn` files are merged with the intermediate DPI files
+        merged while the fluxsite tasks were running.
+        """
         if not Path(self.coverage_dir).is_dir():
             msg = f"""The coverage directory: {self.coverage_dir}
             does not exist. Did you run the jobs and/or set `coverage: true` in `config.yaml`
@@ -61,18 +142,243 @@ class CoverageTask:
 
         self.logger.info(f"Generating coverage report in {self.coverage_dir}")
 
-        # Load intel-compiler in case we run from CLI, otherwise assuming
-        # PBS jobscript loads
-        with chdir(self.coverage_dir), (
-            nullcontext()
-            if self.modules_handler.module_is_loaded("intel-compiler")
-            else self.modules_handler.load([internal.DEFAULT_MODULES["intel-compiler"]])
-        ):
-            self.subprocess_handler.run_cmd(f"profmerge -prof-dpi {self.dpi_file}")
+        env = self._get_environment()
+        self.merge_batch(min_age=0, env=env)
+        batch_dpi_files = self.get_batch_dpi_files()
+        with chdir(self.coverage_dir):
+            if batch_dpi_files:
+                self.subprocess_handler.run_cmd(
+                    f"profmerge -prof-dpi {self.dpi_file} -a "
+                    + " ".join(
+                        str(path.relative_to(self.coverage_dir))
+                        for path in batch_dpi_files
+                    ),
+                    env=env,
+                )
+            else:
+                self.subprocess_handler.run_cmd(
+                    f"profmerge -prof-dpi {self.dpi_file}", env=env
+                )
             self.subprocess_handler.run_cmd(
                 f"codecov -prj {self.project_name} -dpi {self.dpi_file} -spi {self.spi_file}"
+                f" -xmlfcvrg {internal.CODECOV_XML_FNAME}",
+                env=env,
+            )
+
+    def _get_src_key(self, path: Path) -> str:
+        """Returns the key of the source file `path` in the coverage results."""
+        if self.src_dir is not None and path.is_relative_to(
+            Path(self.src_dir).absolute()
+        ):
+            return str(path.relative_to(Path(self.src_dir).absolute()))
+        return str(path)
+
+    def _get_src_path(self, key: str) -> Path:
+        """Returns the path of the source file with `key` in the coverage results."""
+        if self.src_dir is None:
+            return Path(key)
+        return Path(self.src_dir).absolute() / key
+
+    def load_results(self) -> dict[str, dict]:
+        """Returns the routines exercised in each source file.
+
+        The results are parsed from the function coverage exported by
+        `codecov` and cached in the coverage directory. The exercised routines
+        depend on the runs merged into the DPI file as well as on the source,
+        so the cached routines of a source file are only reused while both
+        the DPI file and the hash of the source file match the previous run.
+
+        Returns
+        -------
+        dict[str, dict]
+            The `hash` of each source file and the execution count of each of
+            its exercised `routines`, keyed by the path of the source file
+            relative to the source directory of the realisation.
+
+        """
+        coverage_dir = Path(self.coverage_dir)
+        dpi_digest = file_digest(coverage_dir / self.dpi_file)
+        store_path = coverage_dir / internal.CODECOV_RESULTS_FNAME
+        cached_files = {}
+        if store_path.exists():
+            with store_path.open("r", encoding="utf-8") as file:
+                store = json.load(file)
+            if store.get("dpi_digest") == dpi_digest:
+                cached_files = store["files"]
+        digests = {}
+        cached = {}
+        for key, cached_file in cached_files.items():
+            src_path = self._get_src_path(key)
+            digests[key] = file_digest(src_path) if src_path.is_file() else None
+            if digests[key] is not None and digests[key] == cached_file["hash"]:
+                cached[str(src_path)] = cached_file["routines"]
+        self.logger.debug(f"Parsing coverage results in {coverage_dir}")
+        files = {}
+        for path, routines in parse_function_coverage(
+            coverage_dir / internal.CODECOV_XML_FNAME, cached=cached
+        ).items():
+            src_path = Path(path)
+            key = self._get_src_key(src_path)
+            if key not in digests:
+                digests[key] = file_digest(src_path) if src_path.is_file() else None
+            files[key] = {"hash": digests[key], "routines": routines}
+        with store_path.open("w", encoding="utf-8") as file:
+            json.dump({"dpi_digest": dpi_digest, "files": files}, file, indent=2)
+        return files
+
+
+class CoverageMerger:
+    """Merges `.dyn` files into intermediate DPI files while fluxsite tasks run.
+
+    `notify()` is called each time a fluxsite task completes. Once
+    `batch_size` tasks of a realisation have completed, the `.dyn` files of
+    the realisation are merged in a background thread so that only a small
+    final merge remains when the coverage report is generated.
+    """
+
+    def __init__(
+        self,
+        coverage_tasks: list[CoverageTask],
+        batch_size: int = internal.CODECOV_MERGE_BATCH_SIZE,
+        min_age: float = internal.CODECOV_DYN_MIN_AGE,
+    ) -> None:
+        """Constructor.
+
+        Parameters
+        ----------
+        coverage_tasks : list[CoverageTask]
+            Coverage tasks of each realisation.
+        batch_size : int, optional
+            Number of completed tasks of a realisation between merges.
+        min_age : float, optional
+            See `CoverageTask.merge_batch()`.
+
+        """
+        self.coverage_tasks = {str(task.coverage_dir): task for task in coverage_tasks}
+        self.batch_size = batch_size
+        self.min_age = min_age
+        self.logger = get_logger()
+        self._n_completed = dict.fromkeys(self.coverage_tasks, 0)
+        self._futures: list[Future] = []
+        self._lock = threading.Lock()
+        # Merges are run one at a time so that batches of the same realisation
+        # do not interleave
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def notify(self, task):
+        """Records the completion of a fluxsite `task`."""
+        key = str(task.model.get_coverage_dir())
+        with self._lock:
+            if key not in self._n_completed:
+                return
+            self._n_completed[key] += 1
+            if self._n_completed[key] < self.batch_size:
+                return
+            self._n_completed[key] = 0
+            self._futures.append(
+                self._executor.submit(
+                    self.coverage_tasks[key].merge_batch, self.min_age
+                )
             )
 
+    def close(self):
+        """Waits for pending merges to finish.
+
+        Failed merges are logged: their `.dyn` files are left in a staging
+        directory and merged by `CoverageTask.run()`.
+        """
+        self._executor.shutdown(wait=True)
+        for future in self._futures:
+            exc = future.exception()
+            if exc is not None:
+                self.logger.error(f"Failed to merge coverage data: {exc}")
+        self._futures = []
+
+
+def parse_function_coverage(
+    xml_path: Path, cached: Optional[dict[str, dict[str, int]]] = None
+) -> dict[str, dict[str, int]]:
+    """Returns the exercised routines in the function coverage exported by `codecov`.
+
+    Parameters
+    ----------
+    xml_path : Path
+        Function coverage written by `codecov -xmlfcvrg`, which lists each
+        source file (`MODULE`) and its exercised routines (`FUNCTION`).
+    cached : dict[str, dict[str, int]], optional
+        Exercised routines keyed by source file which are returned instead of
+        being parsed, e.g. the routines of unmodified source files.
+
+    Returns
+    -------
+    dict[str, dict[str, int]]
+        The execution count of each exercised routine, keyed by source file.
+
+    """
+    import xml.etree.ElementTree as ET
+
+    cached = cached or {}
+    files: dict[str, dict[str, int]] = {}
+    for module in ET.parse(xml_path).getroot().iter():
+        if module.tag.upper() != "MODULE":
+            continue
+        path = module.get("name", "").strip()
+        if path in cached:
+            files[path] = cached[path]
+            continue
+        routines = files.setdefault(path, {})
+        for function in module:
+            if function.tag.upper() != "FUNCTION":
+                continue
+            freq = int(function.get("freq", "1"))
+            if freq > 0:
+                routines[function.get("name", "").strip()] = freq
+    return files
+
+
+def get_coverage_delta(base: dict[str, dict], other: dict[str, dict]) -> dict:
+    """Returns the routines exercised by only one of two realisations.
+
+    Parameters
+    ----------
+    base, other : dict[str, dict]
+        Coverage results of each realisation, see `CoverageTask.load_results()`.
+
+    Returns
+    -------
+    dict
+        The routines of each source file which are `added` (only exercised
+        by `other`) and `removed` (only exercised by `base`), and whether the
+        source file is `modified`. Source files exercising the same routines
+        in both realisations are omitted.
+
+    """
+    files = {}
+    for path in sorted(set(base) | set(other)):
+        base_file = base.get(path, {"hash": None, "routines": {}})
+        other_file = other.get(path, {"hash": None, "routines": {}})
+        base_routines = base_file["routines"].keys()
+        other_routines = other_file["routines"].keys()
+        modified = base_file["hash"] != other_file["hash"]
+        added = sorted(other_routines - base_routines)
+        removed = sorted(base_routines - other_routines)
+        if added or removed:
+            files[path] = {"modified": modified, "added": added, "removed": removed}
+    return {
+        "n_added": sum(len(file["added"]) for file in files.values()),
+        "n_removed": sum(len(file["removed"]) for file in files.values()),
+        "files": files,
+    }
+
+
+def save_coverage_delta(delta: dict, path: Path):
+    """Writes the coverage `delta` to `path` as JSON and next to it as HTML."""
+    get_logger().debug(f"Writing coverage delta to {path}")
+    with path.open("w", encoding="utf-8") as file:
+        json.dump(delta, file, indent=2)
+    with path.with_suffix(".html").open("w", encoding="utf-8") as file:
+        file.write(interpolate_file_template("coverage_delta.html.j2", **delta))
+
 
 def run_coverage_tasks(coverage_tasks: list[CoverageTask]) -> None:
     """Runs coverage tasks serially."""
@@ -82,14 +388,21 @@ def run_coverage_tasks(coverage_tasks: list[CoverageTask]) -> None:
 
 def get_coverage_tasks_default(models: list[Model]) -> list[CoverageTask]:
     """Returns list of Coveragee Tasks setting default values for optional parameters."""
-    return [CoverageTask(model.get_coverage_dir()) for model in models]
+    return [
+        CoverageTask(model.get_coverage_dir(), src_dir=internal.SRC_DIR / model.name)
+        for model in models
+    ]
 
 
 def run_coverages_in_parallel(
     coverage_tasks: list[CoverageTask],
     n_processes=internal.FLUXSITE_DEFAULT_PBS["ncpus"],
+    pool: Optional[Pool] = None,
 ) -> None:
-    """Runs coverage tasks in parallel across multiple processes."""
+    """Runs coverage tasks in parallel across multiple processes.
+
+    An existing `pool` of worker processes is used if specified.
+    """
     run_task = operator.methodcaller("run")
-    with multiprocessing.Pool(n_processes) as pool:
-        pool.map(run_task, coverage_tasks, chunksize=1)
+    with worker_pool(n_processes, pool) as workers:
+        workers.map(run_task, coverage_tasks, chunksize=1)
@@ -11,5 +11,4 @@
 
 set -ev
 
-/absolute/path/to/benchcab fluxsite-run-tasks --config=/path/to/config.yaml
-/absolute/path/to/benchcab fluxsite-bitwise-cmp --config=/path/to/config.yaml
\ No newline at end of file
+/absolute/path/to/benchcab fluxsite-job --config=/path/to/config.yaml --skip=gen_codecov
\ No newline at end of file
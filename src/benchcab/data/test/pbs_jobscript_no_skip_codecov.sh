@@ -11,6 +11,4 @@
 
 set -ev
 
-/absolute/path/to/benchcab fluxsite-run-tasks --config=/path/to/config.yaml
-/absolute/path/to/benchcab fluxsite-bitwise-cmp --config=/path/to/config.yaml
-/absolute/path/to/benchcab gen_codecov --config=/path/to/config.yaml
\ No newline at end of file
+/absolute/path/to/benchcab fluxsite-job --config=/path/to/config.yaml
\ No newline at end of file
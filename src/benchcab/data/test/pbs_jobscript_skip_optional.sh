@@ -11,4 +11,4 @@
 
 set -ev
 
-/absolute/path/to/benchcab fluxsite-run-tasks --config=/path/to/config.yaml
\ No newline at end of file
+/absolute/path/to/benchcab fluxsite-job --config=/path/to/config.yaml --skip=fluxsite-bitwise-cmp --skip=gen_codecov
\ No newline at end of file
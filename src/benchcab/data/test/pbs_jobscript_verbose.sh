@@ -11,5 +11,4 @@
 
 set -ev
 
-/absolute/path/to/benchcab fluxsite-run-tasks --config=/path/to/config.yaml -v
-/absolute/path/to/benchcab fluxsite-bitwise-cmp --config=/path/to/config.yaml -v
\ No newline at end of file
+/absolute/path/to/benchcab fluxsite-job --config=/path/to/config.yaml --skip=gen_codecov -v
\ No newline at end of file
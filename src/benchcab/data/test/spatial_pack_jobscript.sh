@@ -0,0 +1,44 @@
+#!/bin/bash
+#PBS -l wd
+#PBS -l ncpus=96
+#PBS -l mem=760GB
+#PBS -l walltime=6:00:00
+#PBS -q normalsr
+#PBS -P tm70
+#PBS -j oe
+#PBS -m e
+#PBS -l storage=gdata/ks32+gdata/xp65+gdata/wd9
+
+module load intel-compiler/2021.1.1
+module load openmpi/4.1.0
+
+set -v
+
+export PAYU_PATH=/path/to/bin
+export PAYU_N_RUNS=1
+
+pids=()
+
+sed -n '1,48p' $PBS_NODEFILE > /path/to/tasks/task_a/hostfile
+(
+  cd /path/to/tasks/task_a &&
+  OMPI_MCA_orte_default_hostfile=/path/to/tasks/task_a/hostfile \
+  OMPI_MCA_hwloc_base_binding_policy=none \
+  /path/to/bin/payu-run
+) > /path/to/tasks/task_a/payu-run.out 2>&1 &
+pids+=($!)
+
+sed -n '49,96p' $PBS_NODEFILE > /path/to/tasks/task_b/hostfile
+(
+  cd /path/to/tasks/task_b &&
+  OMPI_MCA_orte_default_hostfile=/path/to/tasks/task_b/hostfile \
+  OMPI_MCA_hwloc_base_binding_policy=none \
+  /path/to/bin/payu-run
+) > /path/to/tasks/task_b/payu-run.out 2>&1 &
+pids+=($!)
+
+status=0
+for pid in "${pids[@]}"; do
+  wait $pid || status=1
+done
+exit $status
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""A module containing functions for generating perturbed parameter ensembles.
+
+An ensemble perturbs parameters in the vegetation (`pft_params.nml`) and soil
+(`cable_soilparm.nml`) namelist files. Each parameter is perturbed by a factor
+(`scale`) or an increment (`offset`) drawn from a range, with one draw per
+parameter and ensemble member applied to all vegetation or soil types.
+"""
+
+import csv
+import shutil
+from pathlib import Path
+from typing import Optional
+
+from benchcab import internal
+from benchcab.utils import get_logger
+from benchcab.utils.fs import mkdir
+
+
+def get_member_name(member: int) -> str:
+    """Returns the naming convention used for an ensemble member."""
+    return f"E{member}"
+
+
+def get_member_dir(member: int) -> Path:
+    """Returns the directory containing the perturbed namelists of `member`."""
+    return internal.FLUXSITE_DIRS["ENSEMBLE"] / get_member_name(member)
+
+
+def sample_unit_hypercube(
+    size: int, n_dims: int, sampling: str, seed: Optional[int] = None
+):
+    """Returns `size` samples from the unit hypercube of dimension `n_dims`.
+
+    Parameters
+    ----------
+    size : int
+        Number of samples.
+    n_dims : int
+        Number of dimensions.
+    sampling : str
+        Either `latin_hypercube`, where each dimension is divided into `size`
+        equally sized intervals which are each sampled exactly once, or
+        `random` for independent uniform samples.
+    seed : int, optional
+        Seed of the random number generator.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape `(size, n_dims)`.
+
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    if sampling == "random":
+        return rng.random((size, n_dims))
+    strata = rng.permuted(np.tile(np.arange(size), (n_dims, 1)), axis=1).T
+    return (strata + rng.random((size, n_dims))) / size
+
+
+def get_parameters(ensemble: dict) -> list[tuple[str, str, str, float, float]]:
+    """Returns the perturbed parameters of `ensemble`.
+
+    Each parameter is described by its namelist file, its dot separated path
+    in the namelist, the type of perturbation (`scale` or `offset`) and the
+    bounds of the perturbation.
+    """
+    return [
+        (nml_file, path, kind, *bounds)
+        for nml_file, parameters in ensemble["parameters"].items()
+        for path, perturbation in parameters.items()
+        for kind, bounds in perturbation.items()
+    ]
+
+
+def write_member_namelists(
+    ensemble: dict, namelist_dir: Path = internal.NAMELIST_DIR
+) -> None:
+    """Writes the perturbed namelist files of each ensemble member.
+
+    The perturbations of all members are computed at once from the base
+    namelists in `namelist_dir`. Only namelist files containing perturbed
+    parameters are written for each member, so that tasks can link to them
+    while all other namelist files are copied from `namelist_dir`. Perturbed
+    values of integer parameters are rounded to the nearest integer. Member
+    directories and namelist files left over from a larger ensemble or other
+    perturbed namelists are deleted. A table of the parameter values of each
+    member is written for later analysis.
+
+    Parameters
+    ----------
+    ensemble : dict
+        The `fluxsite.ensemble` settings of the config.
+    namelist_dir : Path, optional
+        Directory containing the base namelist files.
+
+    """
+    import f90nml
+    import numpy as np
+
+    logger = get_logger()
+    size = ensemble["size"]
+    parameters = get_parameters(ensemble)
+    samples = sample_unit_hypercube(
+        size, len(parameters), ensemble["sampling"], ensemble["seed"]
+    )
+    lower = np.array([low for *_, low, _ in parameters])
+    upper = np.array([high for *_, high in parameters])
+    draws = lower + samples * (upper - lower)
+
+    for nml_file in ensemble["parameters"]:
+        logger.debug(f"Writing perturbed {nml_file} for {size} ensemble members")
+        nml = f90nml.read(namelist_dir / nml_file)
+        columns = [j for j, param in enumerate(parameters) if param[0] == nml_file]
+        perturbed = []
+        for j in columns:
+            _, path, kind, *_ = parameters[j]
+            *groups, name = path.lower().split(".")
+            parent = nml
+            for group in groups:
+                parent = parent[group]
+            base = np.asarray(parent[name])
+            # Perturb the parameter for all members at once: shape (size, *base)
+            draw = draws[:, j].reshape((size,) + (1,) * base.ndim)
+            values = base * draw if kind == "scale" else base + draw
+            if np.issubdtype(base.dtype, np.integer):
+                values = np.rint(values).astype(base.dtype)
+            perturbed.append((parent, name, values))
+
+        for member in range(size):
+            for parent, name, values in perturbed:
+                parent[name] = values[member].tolist()
+            path = get_member_dir(member) / nml_file
+            mkdir(path.parent, parents=True, exist_ok=True)
+            nml.write(path, force=True)
+
+    member_dirs = {get_member_dir(member) for member in range(size)}
+    for path in internal.FLUXSITE_DIRS["ENSEMBLE"].iterdir():
+        if path.is_dir() and path not in member_dirs:
+            logger.debug(f"Deleting stale ensemble member directory {path}")
+            shutil.rmtree(path)
+    for member_dir in member_dirs:
+        for path in member_dir.iterdir():
+            if path.name not in ensemble["parameters"]:
+                logger.debug(f"Deleting stale perturbed namelist {path}")
+                path.unlink()
+
+    table_path = internal.FLUXSITE_DIRS["ENSEMBLE"] / internal.ENSEMBLE_PARAMETERS_FNAME
+    with table_path.open("w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(
+            [
+                "member",
+                *(
+                    f"{nml_file}:{path}:{kind}"
+                    for nml_file, path, kind, *_ in parameters
+                ),
+            ]
+        )
+        for member in range(size):
+            writer.writerow([get_member_name(member), *draws[member].tolist()])
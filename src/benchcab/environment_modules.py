@@ -4,28 +4,116 @@
 """Contains a wrapper around the environment modules API."""
 
 import contextlib
+import functools
+import os
+import shutil
 import sys
 from abc import ABC as AbstractBaseClass  # noqa: N811
 from abc import abstractmethod
+from collections.abc import Mapping, MutableMapping
+from pathlib import Path
+from typing import Optional, Union
 
+from benchcab import internal
 from benchcab.utils import get_logger
+from benchcab.utils.cache import get_cache_path, load_cache, save_cache
 
-sys.path.append("/opt/Modules/v4.3.0/init")
-try:
-    from python import module
-except ImportError:
-    get_logger().error(
-        "Environment modules error: unable to import "
-        "initialization script for python."
-    )
-    # Note: cannot re-raise exception here as this will break pytest
-    # when running pytest locally (outside of Gadi)
+# Path to the environment modules initialization scripts
+MODULES_INIT_DIR = "/opt/Modules/v4.3.0/init"
+
+
+@functools.cache
+def _get_module_function():
+    """Return the `module` function from the environment modules python init script.
+
+    The initialization script is imported on first use (and only once) as it
+    is only required by the subcommands that interact with environment modules.
+    """
+    sys.path.append(MODULES_INIT_DIR)
+    try:
+        from python import module
+    except ImportError:
+        get_logger().error(
+            "Environment modules error: unable to import "
+            "initialization script for python."
+        )
+        # The script is no longer imported with this module, so re-raising
+        # does not break importing benchcab outside of Gadi. Callers cannot
+        # continue without `module` either way.
+        raise
+    return module
+
+
+def module(*args: str) -> bool:
+    """Wrapper around `module` from the environment modules python init script."""
+    return _get_module_function()(*args)
 
 
 class EnvironmentModulesError(Exception):
     """Custom exception class for environment modules errors."""
 
 
+EnvironmentDiff = dict[str, Union[None, str, dict[str, list[str]]]]
+
+
+def _get_path_edit(old: list[str], new: list[str]) -> Optional[dict[str, list[str]]]:
+    """Return the entries prepended, appended and removed from a path variable.
+
+    None is returned if the change cannot be expressed as such an edit.
+    """
+    kept = [entry for entry in old if entry in new]
+    if not kept:
+        return None
+    start = new.index(kept[0])
+    if new[start : start + len(kept)] != kept:
+        return None
+    return {
+        "prepend": new[:start],
+        "append": new[start + len(kept) :],
+        "remove": [entry for entry in old if entry not in new],
+    }
+
+
+def get_environment_diff(before: Mapping, after: Mapping) -> EnvironmentDiff:
+    """Return the changes required to turn environment `before` into `after`.
+
+    Variables that are removed map to None. Path-like variables (e.g. `PATH` or
+    `LD_LIBRARY_PATH`) map to the entries that are prepended, appended and
+    removed so that the diff can be applied on top of a different environment.
+    All other variables map to their new value.
+    """
+    diff: EnvironmentDiff = {}
+    for key in sorted(set(before) | set(after)):
+        old, new = before.get(key), after.get(key)
+        if old == new:
+            continue
+        if new is None:
+            diff[key] = None
+        elif old:
+            edit = _get_path_edit(old.split(":"), new.split(":"))
+            diff[key] = edit if edit else new
+        else:
+            diff[key] = new
+    return diff
+
+
+def apply_environment_diff(diff: EnvironmentDiff, env: MutableMapping):
+    """Apply the changes in `diff` to the environment `env` in place."""
+    for key, value in diff.items():
+        if value is None:
+            env.pop(key, None)
+        elif isinstance(value, str):
+            env[key] = value
+        else:
+            edited = {*value["prepend"], *value["append"], *value["remove"]}
+            current = [
+                entry
+                for entry in env.get(key, "").split(":")
+                if entry and entry not in edited
+            ]
+            env[key] = ":".join([*value["prepend"], *current, *value["append"]])
+
+
 class EnvironmentModulesInterface(AbstractBaseClass):
     """An abstract class (interface) that defines abstract methods for interacting with the environment modules API.
 
@@ -33,6 +121,16 @@ class EnvironmentModulesInterface(AbstractBaseClass):
     in our unit tests.
     """
 
+    # Directory in which snapshots of module environments are persisted. Snapshots
+    # are only kept in memory if not specified. Snapshots in memory belong to a
+    # single handler: separate handlers (e.g. of `Benchcab` and `CoverageTask`)
+    # and worker processes share snapshots through this directory.
+    snapshot_dir: Optional[Path] = None
+
+    def __init__(self) -> None:
+        """Constructor."""
+        self._snapshots: dict[tuple, EnvironmentDiff] = {}
+
     @abstractmethod
     def module_is_avail(self, *args: str) -> bool:
         """Wrapper around `module is-avail modulefile...`."""
@@ -49,22 +147,89 @@ class EnvironmentModulesInterface(AbstractBaseClass):
     def module_unload(self, *args: str) -> None:
         """Wrapper around `module unload modulefile...`."""
 
+    def get_snapshot(self, modules: list[str]) -> EnvironmentDiff:
+        """Return the changes made to the environment by loading `modules`.
+
+        The modules are loaded and unloaded once to resolve the snapshot. The
+        snapshot is then reused from memory, or from `snapshot_dir` if set,
+        until it expires or is invalidated.
+        """
+        logger = get_logger()
+        key = (
+            tuple(modules),
+            os.environ.get("MODULEPATH"),
+            os.environ.get("LOADEDMODULES"),
+        )
+        if key in self._snapshots:
+            return self._snapshots[key]
+
+        path = get_cache_path(self.snapshot_dir, *key) if self.snapshot_dir else None
+        snapshot = load_cache(path, ttl=internal.MODULE_SNAPSHOT_TTL) if path else None
+        if snapshot is None:
+            logger.debug("Resolving environment of modules: " + " ".join(modules))
+            before = dict(os.environ)
+            self.module_load(*modules)
+            try:
+                snapshot = get_environment_diff(before, os.environ)
+            finally:
+                self.module_unload(*modules)
+                # Restore the environment in case unloading does not fully
+                # revert the changes made by loading
+                for name in set(os.environ) - set(before):
+                    del os.environ[name]
+                os.environ.update(before)
+            if path:
+                save_cache(path, snapshot)
+
+        self._snapshots[key] = snapshot
+        return snapshot
+
+    def get_environment(
+        self, modules: list[str], env: Optional[Mapping] = None
+    ) -> dict[str, str]:
+        """Return a copy of `env` with the environment of `modules` applied.
+
+        The current environment is used if `env` is not specified. The returned
+        dictionary can be passed as the environment of a subprocess.
+        """
+        env = dict(os.environ if env is None else env)
+        apply_environment_diff(self.get_snapshot(modules), env)
+        return env
+
+    def invalidate_snapshots(self):
+        """Discard all snapshots of module environments."""
+        self._snapshots.clear()
+        if self.snapshot_dir:
+            shutil.rmtree(self.snapshot_dir, ignore_errors=True)
+
     @contextlib.contextmanager
     def load(self, modules: list[str]):
-        """Context manager for loading and unloading modules."""
+        """Context manager for loading and unloading modules.
+
+        The environment of `modules` is applied from its snapshot so that the
+        modules command is only invoked when the snapshot is first resolved.
+        """
         logger = get_logger()
         logger.debug("Loading modules: " + " ".join(modules))
-        self.module_load(*modules)
+        snapshot = self.get_snapshot(modules)
+        saved = {key: os.environ.get(key) for key in snapshot}
+        apply_environment_diff(snapshot, os.environ)
         try:
             yield
         finally:
             logger.debug("Unloading modules: " + " ".join(modules))
-            self.module_unload(*modules)
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
 
 
 class EnvironmentModules(EnvironmentModulesInterface):
     """A concrete implementation of the `EnvironmentModulesInterface` abstract class."""
 
+    snapshot_dir = internal.MODULE_SNAPSHOT_DIR
+
     def module_is_avail(self, *args: str) -> bool:
         """Check if module is available.
 
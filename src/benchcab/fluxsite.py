@@ -3,24 +3,28 @@
 
 """A module containing functions and data structures for running fluxsite tasks."""
 
-import multiprocessing
+import hashlib
+import itertools
+import json
 import operator
 import shutil
 import sys
+from collections.abc import Callable
+from multiprocessing.pool import Pool
+from pathlib import Path
 from subprocess import CalledProcessError
-
-import f90nml
-import flatdict
-import netCDF4
+from typing import Optional
 
 from benchcab import __version__, internal
 from benchcab.comparison import ComparisonTask
+from benchcab.ensemble import get_member_dir, get_member_name
 from benchcab.model import Model
-from benchcab.utils import get_logger
-from benchcab.utils.fs import chdir, mkdir
+from benchcab.utils import get_logger, worker_pool
+from benchcab.utils.fs import chdir, file_digest, mkdir
 from benchcab.utils.namelist import patch_namelist, patch_remove_namelist
 from benchcab.utils.state import State
 from benchcab.utils.subprocess import SubprocessWrapper, SubprocessWrapperInterface
+from benchcab.utils.sweep import SciConfId, iter_science_configurations
 
 f90_logical_repr = {True: ".true.", False: ".false."}
 
@@ -38,8 +42,10 @@ class FluxsiteTask:
         self,
         model: Model,
         met_forcing_file: str,
-        sci_conf_id: int,
+        sci_conf_id: SciConfId,
         sci_config: dict,
+        met_dir: Path = internal.MET_DIR,
+        ensemble_member: Optional[int] = None,
     ) -> None:
         """Constructor.
 
@@ -49,29 +55,46 @@ class FluxsiteTask:
             Model.
         met_forcing_file : str
             Met forcing file.
-        sci_conf_id : int
+        sci_conf_id : SciConfId
             Science configuration ID.
         sci_config : dict
             Science configuration.
+        met_dir : Path
+            Directory containing the met forcing file.
+        ensemble_member : int, optional
+            Member of the perturbed parameter ensemble, if any.
 
         """
         self.model = model
         self.met_forcing_file = met_forcing_file
+        self.met_dir = met_dir
+        self.ensemble_member = ensemble_member
         self.sci_conf_id = sci_conf_id
         self.sci_config = sci_config
+        self.alias_of: Optional[FluxsiteTask] = None
         self.logger = get_logger()
         self.state = State(
             state_dir=internal.STATE_DIR / "fluxsite" / "runs" / self.get_task_name()
         )
 
     def is_done(self) -> bool:
-        """Return status of current task."""
+        """Return status of current task.
+
+        An alias is done when the task it aliases is done.
+        """
+        if self.alias_of is not None:
+            return self.alias_of.is_done()
         return self.state.is_set("done")
 
     def get_task_name(self) -> str:
         """Returns the file name convention used for this task."""
         met_forcing_base_filename = self.met_forcing_file.split(".")[0]
-        return f"{met_forcing_base_filename}_R{self.model.model_id}_S{self.sci_conf_id}"
+        task_name = (
+            f"{met_forcing_base_filename}_R{self.model.model_id}_S{self.sci_conf_id}"
+        )
+        if self.ensemble_member is not None:
+            task_name += f"_{get_member_name(self.ensemble_member)}"
+        return task_name
 
     def get_output_filename(self) -> str:
         """Returns the file name convention used for the netcdf output file."""
@@ -81,6 +104,99 @@ class FluxsiteTask:
         """Returns the file name convention used for the log file."""
         return f"{self.get_task_name()}_log.txt"
 
+    def get_fingerprint(self) -> str:
+        """Returns a hash of the inputs which determine the output of this task."""
+        provenance = self.model.get_provenance()
+        inputs = {
+            "met_forcing_file": self.met_forcing_file,
+            "met_dir": self.met_dir,
+            "sci_config": self.sci_config,
+            "ensemble_member": self.ensemble_member,
+            "patch": self.model.patch,
+            "patch_remove": self.model.patch_remove,
+            "source": {
+                key: provenance.get(key) for key in ["url", "branch", "revision"]
+            },
+        }
+        return hashlib.sha1(
+            json.dumps(inputs, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def get_effective_hash(self, exe_digests: Optional[dict[Path, str]] = None) -> str:
+        """Returns a hash of the executable and namelists in the task directory.
+
+        Tasks with the same effective hash run the same executable with the
+        same inputs and therefore produce the same output. The task specific
+        output and log file paths are excluded from the CABLE namelist. The
+        task must be set up beforehand.
+
+        Parameters
+        ----------
+        exe_digests : dict[Path, str], optional
+            Digests of executables, used to hash executables shared between
+            tasks only once.
+
+        """
+        import f90nml
+
+        task_dir = internal.FLUXSITE_DIRS["TASKS"] / self.get_task_name()
+        exe_digests = {} if exe_digests is None else exe_digests
+        exe_path = self.model.get_exe_path()
+        if exe_path not in exe_digests:
+            exe_digests[exe_path] = file_digest(exe_path)
+
+        nml = f90nml.read(task_dir / internal.CABLE_NML)
+        filenames = nml.get("cable", {}).get("filename", {})
+        for key in ["out", "log"]:
+            filenames.pop(key, None)
+
+        inputs = {
+            "exe": exe_digests[exe_path],
+            "cable_nml": nml,
+            "files": {
+                path.name: file_digest(path)
+                for path in sorted(task_dir.iterdir())
+                if path.is_file()
+                and path.name
+                not in [
+                    internal.CABLE_EXE,
+                    internal.CABLE_NML,
+                    internal.CABLE_STDOUT_FILENAME,
+                ]
+            },
+        }
+        return hashlib.sha1(
+            json.dumps(inputs, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def set_alias_of(self, task: "FluxsiteTask"):
+        """Makes this task an alias of `task`.
+
+        An alias is not run. Instead, its output and log files are linked to
+        the output and log files of `task`.
+        """
+        self.logger.debug(
+            f"  Linking task {self.get_task_name()} to {task.get_task_name()}"
+        )
+        self.alias_of = task
+        for directory, file_name, target in [
+            (
+                internal.FLUXSITE_DIRS["OUTPUT"],
+                self.get_output_filename(),
+                task.get_output_filename(),
+            ),
+            (
+                internal.FLUXSITE_DIRS["LOG"],
+                self.get_log_filename(),
+                task.get_log_filename(),
+            ),
+        ]:
+            link = directory / file_name
+            link.unlink(missing_ok=True)
+            link.symlink_to(target)
+
+        return self
+
     def setup_task(self):
         """Does all file manipulations to run cable in the task directory.
 
@@ -116,7 +232,7 @@ class FluxsiteTask:
             {
                 "cable": {
                     "filename": {
-                        "met": str(internal.MET_DIR / self.met_forcing_file),
+                        "met": str(self.met_dir / self.met_forcing_file),
                         "out": str(
                             (
                                 internal.FLUXSITE_DIRS["OUTPUT"]
@@ -179,14 +295,17 @@ class FluxsiteTask:
         if cable_soil_nml.exists():
             cable_soil_nml.unlink()
 
+        # Output and log files of aliases are links which may be dangling
         output_file = internal.FLUXSITE_DIRS["OUTPUT"] / self.get_output_filename()
-        if output_file.exists():
+        if output_file.exists() or output_file.is_symlink():
             output_file.unlink()
 
         log_file = internal.FLUXSITE_DIRS["LOG"] / self.get_log_filename()
-        if log_file.exists():
+        if log_file.exists() or log_file.is_symlink():
             log_file.unlink()
 
+        self.alias_of = None
+
         self.state.reset()
 
         return self
@@ -196,6 +315,7 @@ class FluxsiteTask:
 
         Namely:
         - copies contents of 'namelists' directory to 'runs/fluxsite/tasks/<task_name>' directory.
+        - links perturbed namelist files of the ensemble member (if any) into 'runs/fluxsite/tasks/<task_name>' directory.
         - copies cable executable from source to 'runs/fluxsite/tasks/<task_name>' directory.
         """
         task_dir = internal.FLUXSITE_DIRS["TASKS"] / self.get_task_name()
@@ -206,6 +326,15 @@ class FluxsiteTask:
 
         shutil.copytree(internal.NAMELIST_DIR, task_dir, dirs_exist_ok=True)
 
+        if self.ensemble_member is not None:
+            # Perturbed namelists are shared between all tasks of the member
+            member_dir = get_member_dir(self.ensemble_member)
+            self.logger.debug(f"  Linking perturbed namelist files from {member_dir}")
+            for nml_path in member_dir.iterdir():
+                dest = task_dir / nml_path.name
+                dest.unlink(missing_ok=True)
+                dest.symlink_to(nml_path.absolute())
+
         exe_src = self.model.get_exe_path()
         exe_dest = task_dir / internal.CABLE_EXE
 
@@ -218,6 +347,12 @@ class FluxsiteTask:
     def run(self):
         """Runs a single fluxsite task."""
         task_name = self.get_task_name()
+        if self.alias_of is not None:
+            self.logger.debug(
+                f"Skipping task {task_name}: identical to task "
+                f"{self.alias_of.get_task_name()}"
+            )
+            return
         task_dir = internal.FLUXSITE_DIRS["TASKS"] / task_name
         self.logger.debug(f"Running task {task_name}... CABLE standard output ")
         self.logger.debug(f"saved in {task_dir / internal.CABLE_STDOUT_FILENAME}")
@@ -259,7 +394,12 @@ class FluxsiteTask:
         Attributes include branch url, branch revision number and key value pairs in
         the namelist file used to run cable.
         """
+        import f90nml
+        import flatdict
+        import netCDF4
+
         nc_output_path = internal.FLUXSITE_DIRS["OUTPUT"] / self.get_output_filename()
+        provenance = self.model.get_provenance()
         nml = f90nml.read(
             internal.FLUXSITE_DIRS["TASKS"] / self.get_task_name() / internal.CABLE_NML
         )
@@ -274,10 +414,15 @@ class FluxsiteTask:
                         ).items()
                     },
                     **{
-                        "cable_branch": self.model.repo.get_branch_name(),
-                        "svn_revision_number": self.model.repo.get_revision(),
+                        "cable_branch": provenance["branch"],
+                        "svn_revision_number": provenance["revision"],
                         "benchcab_version": __version__,
                     },
+                    **{
+                        f"cable_repo_{key}": str(provenance[key])
+                        for key in ["url", "dirty"]
+                        if provenance.get(key) is not None
+                    },
                 }
             )
 
@@ -286,36 +431,210 @@ def get_fluxsite_tasks(
     models: list[Model],
     science_configurations: list[dict],
     fluxsite_forcing_file_names: list[str],
+    met_dir: Path = internal.MET_DIR,
+    ensemble_size: Optional[int] = None,
 ) -> list[FluxsiteTask]:
-    """Returns a list of fluxsite tasks to run."""
-    tasks = [
+    """Returns a list of fluxsite tasks to run.
+
+    If `ensemble_size` is specified, a task is created for each member of the
+    perturbed parameter ensemble.
+    """
+    members = range(ensemble_size) if ensemble_size else [None]
+    return [
         FluxsiteTask(
             model=model,
             met_forcing_file=file_name,
             sci_conf_id=sci_conf_id,
             sci_config=sci_config,
+            met_dir=met_dir,
+            ensemble_member=member,
         )
         for model in models
         for file_name in fluxsite_forcing_file_names
-        for sci_conf_id, sci_config in enumerate(science_configurations)
+        for sci_conf_id, sci_config in iter_science_configurations(
+            science_configurations
+        )
+        for member in members
     ]
+
+
+def deduplicate_tasks(tasks: list[FluxsiteTask]) -> int:
+    """Makes tasks with identical effective inputs aliases of a single task.
+
+    Tasks are identical when they run byte identical executables with the same
+    namelists, for example realisations which only differ in a namelist patch
+    that has no effect. Only the first task of identical tasks is run, the
+    output files of the remaining tasks are linked to its output files. Tasks
+    must be set up beforehand.
+
+    Parameters
+    ----------
+    tasks : list[FluxsiteTask]
+        Fluxsite tasks.
+
+    Returns
+    -------
+    int
+        The number of tasks which are aliases of another task.
+
+    """
+    exe_digests: dict[Path, str] = {}
+    unique_tasks: dict[str, FluxsiteTask] = {}
+    n_aliases = 0
+    for task in tasks:
+        unique_task = unique_tasks.setdefault(
+            task.get_effective_hash(exe_digests), task
+        )
+        if unique_task is not task:
+            task.set_alias_of(unique_task)
+            n_aliases += 1
+    return n_aliases
+
+
+def save_task_manifest(
+    tasks: list[FluxsiteTask],
+    config_hash: str,
+    manifest_path=internal.FLUXSITE_MANIFEST_PATH,
+):
+    """Writes a manifest of `tasks` so that they can be loaded without the config.
+
+    Parameters
+    ----------
+    tasks : list[FluxsiteTask]
+        Fluxsite tasks.
+    config_hash : str
+        Hash of the configuration used to generate `tasks`.
+    manifest_path : Path, optional
+        Path to the manifest file.
+
+    """
+    manifest = {
+        "config_hash": config_hash,
+        "tasks": [
+            {
+                "name": task.get_task_name(),
+                "model_id": task.model.model_id,
+                "met_forcing_file": task.met_forcing_file,
+                "met_dir": str(task.met_dir),
+                "sci_conf_id": task.sci_conf_id,
+                "sci_config": task.sci_config,
+                "ensemble_member": task.ensemble_member,
+                "task_dir": str(internal.FLUXSITE_DIRS["TASKS"] / task.get_task_name()),
+                "output_file": str(
+                    internal.FLUXSITE_DIRS["OUTPUT"] / task.get_output_filename()
+                ),
+                "fingerprint": task.get_fingerprint(),
+                "alias_of": task.alias_of.get_task_name() if task.alias_of else None,
+            }
+            for task in tasks
+        ],
+    }
+    get_logger().debug(f"Writing task manifest to {manifest_path}")
+    mkdir(manifest_path.parent, parents=True, exist_ok=True)
+    with manifest_path.open("w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+
+
+def load_task_manifest(
+    models: list[Model],
+    config_hash: str,
+    manifest_path=internal.FLUXSITE_MANIFEST_PATH,
+) -> Optional[list[FluxsiteTask]]:
+    """Returns the list of tasks saved in the task manifest.
+
+    Parameters
+    ----------
+    models : list[Model]
+        Models referenced by the tasks in the manifest.
+    config_hash : str
+        Hash of the current configuration.
+    manifest_path : Path, optional
+        Path to the manifest file.
+
+    Returns
+    -------
+    Optional[list[FluxsiteTask]]
+        The list of tasks, or None if the manifest does not exist, was
+        generated from a different configuration or the fingerprint of a
+        task no longer matches, e.g. after the source code was updated.
+
+    """
+    logger = get_logger()
+    if not manifest_path.exists():
+        return None
+    with manifest_path.open("r", encoding="utf-8") as file:
+        manifest = json.load(file)
+    if manifest["config_hash"] != config_hash:
+        logger.warning(
+            f"Ignoring task manifest {manifest_path}: the config has changed since "
+            "the work directory was set up"
+        )
+        return None
+    models_by_id = {model.model_id: model for model in models}
+    logger.debug(f"Loading tasks from manifest {manifest_path}")
+    tasks = [
+        FluxsiteTask(
+            model=models_by_id[entry["model_id"]],
+            met_forcing_file=entry["met_forcing_file"],
+            sci_conf_id=entry["sci_conf_id"],
+            sci_config=entry["sci_config"],
+            met_dir=Path(entry["met_dir"]),
+            ensemble_member=entry["ensemble_member"],
+        )
+        for entry in manifest["tasks"]
+    ]
+    tasks_by_name = {task.get_task_name(): task for task in tasks}
+    for task, entry in zip(tasks, manifest["tasks"]):
+        if entry["fingerprint"] != task.get_fingerprint():
+            logger.warning(
+                f"Ignoring task manifest {manifest_path}: the inputs of task "
+                f"{entry['name']} have changed since the work directory was set up"
+            )
+            return None
+        if entry.get("alias_of") is not None:
+            task.alias_of = tasks_by_name[entry["alias_of"]]
     return tasks
 
 
-def run_tasks(tasks: list[FluxsiteTask]):
-    """Runs tasks in `tasks` serially."""
+def run_tasks(
+    tasks: list[FluxsiteTask],
+    on_complete: Optional[Callable[[FluxsiteTask], None]] = None,
+):
+    """Runs tasks in `tasks` serially.
+
+    `on_complete` is called with each task once it has run, if specified.
+    """
     for task in tasks:
         task.run()
+        if on_complete is not None:
+            on_complete(task)
 
 
 def run_tasks_in_parallel(
     tasks: list[FluxsiteTask],
     n_processes=internal.FLUXSITE_DEFAULT_PBS["ncpus"],
+    pool: Optional[Pool] = None,
+    on_complete: Optional[Callable[[FluxsiteTask], None]] = None,
 ):
-    """Runs tasks in `tasks` in parallel across multiple processes."""
+    """Runs tasks in `tasks` in parallel across multiple processes.
+
+    An existing `pool` of worker processes is used if specified. `on_complete`
+    is called in the parent process with each task once it has run, if
+    specified.
+    """
     run_task = operator.methodcaller("run")
-    with multiprocessing.Pool(n_processes) as pool:
-        pool.map(run_task, tasks, chunksize=1)
+    with worker_pool(n_processes, pool) as workers:
+        if on_complete is None:
+            workers.map(run_task, tasks, chunksize=1)
+            return
+        results = [
+            workers.apply_async(
+                run_task, (task,), callback=lambda _, task=task: on_complete(task)
+            )
+            for task in tasks
+        ]
+        for result in results:
+            result.get()
 
 
 def get_fluxsite_comparisons(tasks: list[FluxsiteTask]) -> list[ComparisonTask]:
@@ -324,7 +643,14 @@ def get_fluxsite_comparisons(tasks: list[FluxsiteTask]) -> list[ComparisonTask]:
     Pairs should be matching in science configurations and meteorological
     forcing, but differ in realisations. When multiple realisations are
     specified, return all pair wise combinations between all realisations.
+    Tasks are grouped by met forcing, science configuration and ensemble
+    member in a single pass, and pairs are only formed within each group.
     """
+    groups: dict[tuple, list[FluxsiteTask]] = {}
+    for task in tasks:
+        key = (task.met_forcing_file, task.sci_conf_id, task.ensemble_member)
+        groups.setdefault(key, []).append(task)
+
     output_dir = internal.FLUXSITE_DIRS["OUTPUT"]
     return [
         ComparisonTask(
@@ -333,24 +659,17 @@ def get_fluxsite_comparisons(tasks: list[FluxsiteTask]) -> list[ComparisonTask]:
                 output_dir / task_b.get_output_filename(),
             ),
             task_name=get_comparison_name(
-                task_a.model, task_b.model, task_a.met_forcing_file, task_a.sci_conf_id
+                task_a.model,
+                task_b.model,
+                task_a.met_forcing_file,
+                task_a.sci_conf_id,
+                task_a.ensemble_member,
             ),
         )
-        for task_a in tasks
-        for task_b in tasks
-        if task_a.met_forcing_file == task_b.met_forcing_file
-        and task_a.sci_conf_id == task_b.sci_conf_id
-        and task_a.model.model_id < task_b.model.model_id
-        # TODO(Sean): Review later - the following code avoids using a double
-        # for loop to generate pair wise combinations, however we would have
-        # to re-initialize task instances to get access to the output file path
-        # for each task. There is probably a better way but should be fine for
-        # now...
-        # for file_name in fluxsite_forcing_file_names
-        # for sci_conf_id in range(len(science_configurations))
-        # for branch_id_first, branch_id_second in itertools.combinations(
-        #     range(len(realisations)), 2
-        # )
+        for group in groups.values()
+        for task_a, task_b in itertools.combinations(
+            sorted(group, key=lambda task: task.model.model_id), 2
+        )
     ]
 
 
@@ -358,11 +677,15 @@ def get_comparison_name(
     model_a: Model,
     model_b: Model,
     met_forcing_file: str,
-    sci_conf_id: int,
+    sci_conf_id: SciConfId,
+    ensemble_member: Optional[int] = None,
 ) -> str:
     """Returns the naming convention used for bitwise comparisons."""
     met_forcing_base_filename = met_forcing_file.split(".")[0]
+    member = (
+        f"_{get_member_name(ensemble_member)}" if ensemble_member is not None else ""
+    )
     return (
-        f"{met_forcing_base_filename}_S{sci_conf_id}"
+        f"{met_forcing_base_filename}_S{sci_conf_id}{member}"
         f"_R{model_a.model_id}_R{model_b.model_id}"
     )
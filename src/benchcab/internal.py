@@ -6,7 +6,7 @@
 import os
 from pathlib import Path
 
-from benchcab.utils.pbs import PBSConfig
+from benchcab.utils.pbs import PackPBSConfig, PBSConfig
 
 _, NODENAME, _, _, _ = os.uname()
 
@@ -21,6 +21,9 @@ DEFAULT_MODULES = {
 # Number of parallel jobs used when compiling with CMake:
 CMAKE_BUILD_PARALLEL_LEVEL = 4
 
+# Maximum number of realisations checked out concurrently:
+CHECKOUT_MAX_WORKERS = 4
+
 # Parameters for job script:
 QSUB_FNAME = "benchmark_cable_qsub.sh"
 FLUXSITE_DEFAULT_PBS: PBSConfig = {
@@ -31,18 +34,54 @@ FLUXSITE_DEFAULT_PBS: PBSConfig = {
 }
 FLUXSITE_DEFAULT_MULTIPROCESS = True
 
+# Run tasks with identical executables and namelists only once
+FLUXSITE_DEFAULT_DEDUPLICATE = True
+
+# Default settings for perturbed parameter ensembles
+FLUXSITE_DEFAULT_ENSEMBLE = {"seed": 0, "sampling": "latin_hypercube"}
+
+# File name of the table of parameter values of each ensemble member
+ENSEMBLE_PARAMETERS_FNAME = "parameters.csv"
+
 # DIRECTORY PATHS/STRUCTURE:
 
 # Path to hidden state directory:
 STATE_DIR = Path(".state")
 STATE_PREFIX = ".state_attr_"
 
+# Path to the manifest of fluxsite tasks written on work directory setup:
+FLUXSITE_MANIFEST_PATH = STATE_DIR / "fluxsite" / "manifest.json"
+
+# Relative path to directory storing provenance snapshots of each realisation:
+PROVENANCE_STATE_DIR = STATE_DIR / "realisations"
+PROVENANCE_FNAME = "provenance.json"
+
 # Default system paths in Unix
 SYSTEM_PATHS = ["/bin", "/usr/bin", "/usr/local/bin"]
 
 # Path to the user's home directory
 HOME_DIR = Path(os.environ["HOME"])
 
+# Path to the user's cache directory shared across work directories
+USER_CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME", HOME_DIR / ".cache")) / "benchcab"
+)
+
+# Path to the directory storing cached catalogs of met forcing directories
+MET_CATALOG_CACHE_DIR = USER_CACHE_DIR / "met"
+
+# Path to the directory storing cached results of the environment checks
+PREFLIGHT_CACHE_DIR = USER_CACHE_DIR / "preflight"
+
+# Time in seconds for which passing environment checks are reused
+PREFLIGHT_CACHE_TTL = 12 * 60 * 60
+
+# Path to the directory storing snapshots of the environment set by modules
+MODULE_SNAPSHOT_DIR = USER_CACHE_DIR / "modules"
+
+# Time in seconds for which snapshots of module environments are reused
+MODULE_SNAPSHOT_TTL = 7 * 24 * 60 * 60
+
 # Relative path to directory containing CABLE source codes
 SRC_DIR = Path("src")
 
@@ -61,6 +100,24 @@ GRID_FILE = CABLE_AUX_DIR / "offline" / "gridinfo_CSIRO_1x1.nc"
 # Relative path to directory that stores codecov files
 CODECOV_DIR = RUN_DIR / "coverage"
 
+# File name of the function coverage exported by codecov for each realisation
+CODECOV_XML_FNAME = "coverage.xml"
+
+# File name of the cached coverage results of each realisation
+CODECOV_RESULTS_FNAME = "coverage.json"
+
+# Name of the directory (in the coverage directory of each realisation) of the
+# intermediate DPI files merged from `.dyn` files while fluxsite tasks run
+CODECOV_BATCH_DIRNAME = "batches"
+
+# Number of completed fluxsite tasks of a realisation between merges of its
+# `.dyn` files into an intermediate DPI file
+CODECOV_MERGE_BATCH_SIZE = 50
+
+# Seconds since a `.dyn` file was last modified before it is merged while
+# fluxsite tasks are running (other tasks may still be writing their files)
+CODECOV_DYN_MIN_AGE = 10
+
 # Fluxsite directory tree
 FLUXSITE_DIRS: dict[str, Path] = {}
 
@@ -76,12 +133,20 @@ FLUXSITE_DIRS["OUTPUT"] = FLUXSITE_DIRS["RUN"] / "outputs"
 # Relative path to tasks directory where cable executables are run from
 FLUXSITE_DIRS["TASKS"] = FLUXSITE_DIRS["RUN"] / "tasks"
 
+# Relative path to directory that stores the perturbed namelist files of each
+# ensemble member
+FLUXSITE_DIRS["ENSEMBLE"] = FLUXSITE_DIRS["RUN"] / "ensemble"
+
 # Relative path to directory that stores results of analysis on model output
 FLUXSITE_DIRS["ANALYSIS"] = FLUXSITE_DIRS["RUN"] / "analysis"
 
 # Relative path to directory that stores bitwise comparison results
 FLUXSITE_DIRS["BITWISE_CMP"] = FLUXSITE_DIRS["ANALYSIS"] / "bitwise-comparisons"
 
+# Relative path to directory that stores the slimmed and compressed copies of
+# CABLE output files uploaded to modelevaluation.org
+FLUXSITE_DIRS["MEORG"] = FLUXSITE_DIRS["RUN"] / "meorg"
+
 # Relative path to root directory for CABLE spatial runs
 SPATIAL_RUN_DIR = RUN_DIR / "spatial"
 
@@ -89,12 +154,67 @@ SPATIAL_RUN_DIR = RUN_DIR / "spatial"
 # for each spatial task)
 SPATIAL_TASKS_DIR = SPATIAL_RUN_DIR / "tasks"
 
+# Relative path to directory of payu experiment templates (one clone of each
+# payu experiment which is copied into the task directories)
+SPATIAL_TEMPLATES_DIR = SPATIAL_RUN_DIR / "templates"
+
 # A custom payu laboratory directory for payu runs
 PAYU_LABORATORY_DIR = RUN_DIR / "payu-laboratory"
 
 # Path to PLUMBER2 site forcing data directory (doi: 10.25914/5fdb0902607e1):
 MET_DIR = Path("/g/data/ks32/CLEX_Data/PLUMBER2/v1-0/Met/")
 
+# Conversion factors from CF time units to seconds:
+TIME_UNITS_IN_SECONDS = {"seconds": 1, "minutes": 60, "hours": 3600, "days": 86400}
+
+# Default settings for dispatching spatial tasks: the number of payu
+# experiments submitted at the same time and the maximum number of spatial
+# PBS jobs queued or running at once (no cap if None)
+SPATIAL_DEFAULT_DISPATCH = {"max_workers": 4, "max_queued_jobs": 50}
+
+# File name of the list of PBS jobs submitted for a spatial task
+SPATIAL_JOBS_FNAME = "jobs.json"
+
+# Seconds between polls of the state of PBS jobs
+PBS_POLL_INTERVAL = 30
+
+# Relative path to directory of cached polls of the state of PBS jobs
+PBS_JOBS_CACHE_DIR = STATE_DIR / "pbs"
+
+# Default settings for MPI scaling studies of spatial tasks
+SPATIAL_DEFAULT_SCALING = {"min_efficiency": 0.75, "apply": False}
+
+# Relative path to the report of the MPI scaling study
+SPATIAL_SCALING_REPORT = SPATIAL_RUN_DIR / "scaling.json"
+
+# Default PBS resources of the jobs running several spatial tasks at once
+SPATIAL_DEFAULT_PACK_PBS: PackPBSConfig = {
+    "queue": "normal",
+    "ncpus": 192,
+    "mem": "760GB",
+    "walltime": "6:00:00",
+    "storage": [],
+}
+
+# Relative path to directory of PBS job scripts running several spatial tasks
+SPATIAL_PACK_DIR = SPATIAL_RUN_DIR / "pack"
+
+# File name of the standard output of `payu-run` in a packed spatial task
+SPATIAL_PACK_STDOUT_FNAME = "payu-run.out"
+
+# Service units charged per CPU hour for each queue on Gadi
+PBS_QUEUE_CHARGE_RATES = {
+    "normal": 2.0,
+    "express": 6.0,
+    "hugemem": 3.0,
+    "megamem": 5.0,
+    "normalbw": 1.25,
+    "expressbw": 3.75,
+    "normalsl": 1.5,
+    "normalsr": 2.0,
+    "expresssr": 6.0,
+}
+
 # Default met forcings to use in the spatial test suite. Each met
 # forcing has a corresponding payu experiment that is configured to run CABLE
 # with that forcing.
@@ -152,6 +272,16 @@ OFFLINE_SOURCE_FILES = [
     "science/pop/*90",
 ]
 
+# Directories (relative to the root of a git repository) that are required to
+# build the offline executable. Used to restrict slim (sparse) checkouts. Note,
+# files at the root of the repository are always included in a sparse checkout.
+SPARSE_CHECKOUT_DIRS = [
+    "cmake",
+    *dict.fromkeys(
+        str(Path("src") / Path(pattern).parent) for pattern in OFFLINE_SOURCE_FILES
+    ),
+]
+
 # Contains the default science configurations used to run the CABLE test suite
 # (when a science config file is not provided by the user)
 DEFAULT_SCIENCE_CONFIGURATIONS = [
@@ -291,31 +421,55 @@ FLUXSITE_DEFAULT_EXPERIMENT = "forty-two-site-test"
 OPTIONAL_COMMANDS = ["fluxsite-bitwise-cmp", "gen_codecov"]
 
 
-def get_met_forcing_file_names(experiment: str) -> list[str]:
-    """Get a list of meteorological forcing file basenames specified by an experiment.
-
-    The `experiment` argument either specifies a key in `MEORG_EXPERIMENTS` or a site id
-    within the five-site-test experiment.
-
-    Assume all site ids map uniquely to a met file in MET_DIR.
-    """
-    if experiment in MEORG_EXPERIMENTS["five-site-test"]:
-        # the user is specifying a single met site
-        return [next(MET_DIR.glob(f"{experiment}*")).name]
-
-    file_names = [
-        next(MET_DIR.glob(f"{site_id}*")).name
-        for site_id in MEORG_EXPERIMENTS[experiment]
-    ]
-
-    return file_names
-
-
 # Configuration for the client upload
 MEORG_CLIENT = dict(
-    num_threads=1,  # Parallel uploads over 4 cores
-    cache_delay=60 * 5,  # 5mins between upload and analysis triggering
-    mem="8G",
+    ncpus=1,  # copyq jobs are limited to a single CPU, uploads run in threads
+    poll_interval=5,  # Initial delay between polls of the uploaded file status
+    max_poll_interval=60,  # Upper bound of the exponential backoff
+    upload_retries=3,  # Retries of each failed upload
+    retry_delay=10,  # Delay before the first retry, doubled for each retry
+    mem_gb=4,  # Memory of the upload job excluding concurrent uploads
+    mem_per_upload_gb=1,  # Memory of each concurrent upload (files are buffered)
     walltime="01:00:00",
     storage=["gdata/ks32", "gdata/xp65", "gdata/wd9", "gdata/rp23"],
 )
+
+# Default maximum number of concurrent uploads to modelevaluation.org
+MEORG_DEFAULT_UPLOAD_WORKERS = 8
+
+# Relative decrease in upload throughput tolerated when the number of
+# concurrent uploads is increased
+MEORG_UPLOAD_THROUGHPUT_TOLERANCE = 0.1
+
+# Default maximum number of seconds to wait for uploaded files to be transferred
+# to the object store before the analysis is triggered
+MEORG_DEFAULT_MAX_WAIT = 60 * 30
+
+# Relative path to directory of the manifests of files uploaded to each model
+# output on modelevaluation.org
+MEORG_MANIFEST_DIR = STATE_DIR / "meorg"
+
+# Variables of the fluxsite outputs analysed by the experiments on
+# modelevaluation.org. Only these variables (and the coordinate variables they
+# depend on) are kept in the files uploaded to modelevaluation.org.
+MEORG_OUTPUT_VARIABLES = [
+    "Qle",
+    "Qh",
+    "Qg",
+    "Rnet",
+    "SWnet",
+    "LWnet",
+    "NEE",
+    "GPP",
+    "Qtau",
+]
+
+# Coordinate variables kept in the files uploaded to modelevaluation.org
+MEORG_OUTPUT_COORDINATES = ["time", "x", "y", "latitude", "longitude"]
+
+# zlib compression level of the files uploaded to modelevaluation.org
+MEORG_OUTPUT_COMPLEVEL = 4
+
+# Number of time steps per chunk of the files uploaded to modelevaluation.org
+# (a year of half-hourly time steps)
+MEORG_OUTPUT_TIME_CHUNK = 17520
@@ -3,6 +3,7 @@
 
 """Contains functions and data structures relating to CABLE models."""
 
+import json
 import os
 import shlex
 import shutil
@@ -62,6 +63,7 @@ class Model:
         self.build_script = build_script
         self.install_dir = install_dir
         self._model_id = model_id
+        self._provenance: Optional[dict] = None
         self.src_dir = Path()
         self.logger = get_logger()
         # TODO(Sean) we should not have to know whether `repo` is a `GitRepo` or
@@ -82,6 +84,39 @@ class Model:
     def model_id(self, value: int):
         self._model_id = value
 
+    def get_provenance_path(self) -> Path:
+        """Get path to the provenance snapshot of this realisation."""
+        return internal.PROVENANCE_STATE_DIR / self.name / internal.PROVENANCE_FNAME
+
+    def save_provenance(self) -> dict:
+        """Query and persist provenance information of the checked out repository.
+
+        This should be called once after checkout so that subsequent calls to
+        `get_provenance()` do not need to query the repository.
+        """
+        self._provenance = self.repo.get_provenance()
+        path = self.get_provenance_path()
+        self.logger.debug(f"Writing provenance snapshot to {path}")
+        mkdir(path.parent, parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as file:
+            json.dump(self._provenance, file, indent=2)
+        return self._provenance
+
+    def get_provenance(self) -> dict:
+        """Return provenance information of the checked out repository.
+
+        The snapshot written by `save_provenance()` is used if it exists,
+        otherwise the repository is queried directly.
+        """
+        if self._provenance is None:
+            path = self.get_provenance_path()
+            if path.exists():
+                with path.open("r", encoding="utf-8") as file:
+                    self._provenance = json.load(file)
+            else:
+                self._provenance = self.repo.get_provenance()
+        return self._provenance
+
     def get_coverage_dir(self) -> Path:
         """Get absolute path for code coverage analysis."""
         return (internal.CODECOV_DIR / f"R{self.model_id}").absolute()
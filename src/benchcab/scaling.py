@@ -0,0 +1,187 @@
+"""A module containing functions for MPI scaling studies of spatial tasks.
+
+A scaling study runs a single spatial task (the first realisation, met forcing
+and science configuration) once for each MPI rank count in
+`spatial.scaling.ncpus`. The wall time and service units (SU) of each run are
+read from the PBS jobs submitted by payu, and the largest rank count whose
+parallel efficiency relative to the smallest rank count stays above
+`spatial.scaling.min_efficiency` is recommended.
+"""
+
+import json
+from pathlib import Path
+from typing import Optional
+
+from benchcab import internal
+from benchcab.model import Model
+from benchcab.spatial import SpatialTask
+from benchcab.utils import get_logger
+from benchcab.utils.fs import mkdir
+from benchcab.utils.pbs import get_jobs
+from benchcab.utils.sweep import iter_science_configurations
+
+
+def get_scaling_tasks(
+    models: list[Model],
+    met_forcings: dict[str, str],
+    science_configurations: list[dict],
+    ncpus: list[int],
+) -> list[SpatialTask]:
+    """Returns a spatial task for each rank count in `ncpus`.
+
+    The tasks run the first model, met forcing and science configuration. Each
+    task runs the payu experiment once, irrespective of `spatial.payu.args`.
+    """
+    met_forcing_name, met_forcing_payu_experiment = next(iter(met_forcings.items()))
+    sci_conf_id, sci_config = next(iter_science_configurations(science_configurations))
+    return [
+        SpatialTask(
+            model=models[0],
+            met_forcing_name=met_forcing_name,
+            met_forcing_payu_experiment=met_forcing_payu_experiment,
+            sci_conf_id=sci_conf_id,
+            sci_config=sci_config,
+            ncpus=n,
+        )
+        for n in sorted(set(ncpus))
+    ]
+
+
+def parse_walltime(walltime: str) -> int:
+    """Returns the number of seconds in a PBS walltime string (`[[h:]m:]s`)."""
+    seconds = 0
+    for field in walltime.split(":"):
+        seconds = 60 * seconds + int(field)
+    return seconds
+
+
+def get_scaling_results(tasks: list[SpatialTask], jobs: dict[str, dict]) -> list[dict]:
+    """Returns the wall time and SU of each completed scaling task.
+
+    Parameters
+    ----------
+    tasks : list[SpatialTask]
+        Scaling tasks.
+    jobs : dict[str, dict]
+        Attributes reported by `qstat` of the PBS jobs of the tasks, see
+        `benchcab.utils.pbs.get_jobs()`.
+
+    Returns
+    -------
+    list[dict]
+        The `ncpus`, `walltime` (seconds) and `su` of each task whose PBS jobs
+        are known and report a positive wall time, ordered by `ncpus`. Jobs
+        which report no resources used are ignored. The SU are computed from
+        the charge rate of the queue and the number of CPUs, ignoring memory
+        requests.
+
+    """
+    results = []
+    for task in tasks:
+        task_jobs = [
+            (record["job_id"], jobs[record["job_id"]])
+            for record in task.get_jobs()
+            if record["job_id"] in jobs
+        ]
+        if not task_jobs:
+            continue
+        walltime = su = 0.0
+        for job_id, job in task_jobs:
+            used = job.get("resources_used", {}).get("walltime")
+            if used is None:
+                # Jobs deleted, held or killed before they started
+                get_logger().warning(
+                    f"Skipping PBS job {job_id} of scaling task with {task.ncpus} "
+                    "CPUs: the job reports no resources used"
+                )
+                continue
+            seconds = parse_walltime(used)
+            rate = internal.PBS_QUEUE_CHARGE_RATES.get(job.get("queue"))
+            ncpus = job.get("Resource_List", {}).get("ncpus")
+            walltime += seconds
+            if su is not None and rate is not None and ncpus is not None:
+                su += rate * ncpus * seconds / 3600
+            else:
+                su = None
+        if walltime <= 0:
+            get_logger().warning(
+                f"Skipping scaling task with {task.ncpus} CPUs: its PBS jobs "
+                "report no wall time"
+            )
+            continue
+        results.append({"ncpus": task.ncpus, "walltime": walltime, "su": su})
+    return sorted(results, key=lambda result: result["ncpus"])
+
+
+def get_efficient_ncpus(results: list[dict], min_efficiency: float) -> Optional[int]:
+    """Adds the speedup and efficiency of each result and returns the efficient rank count.
+
+    Speedup and parallel efficiency are relative to the smallest rank count.
+    The efficient rank count is the largest rank count with an efficiency of
+    at least `min_efficiency`, or None if there are no results.
+
+    Raises
+    ------
+    ValueError
+        If the wall time of a result is not positive.
+
+    """
+    if not results:
+        return None
+    if any(result["walltime"] <= 0 for result in results):
+        msg = "The wall time of each scaling result must be positive."
+        raise ValueError(msg)
+    base = results[0]
+    efficient_ncpus = base["ncpus"]
+    for result in results:
+        result["speedup"] = base["walltime"] / result["walltime"]
+        result["efficiency"] = result["speedup"] * base["ncpus"] / result["ncpus"]
+        if result["efficiency"] >= min_efficiency:
+            efficient_ncpus = max(efficient_ncpus, result["ncpus"])
+    return efficient_ncpus
+
+
+def get_scaling_report(tasks: list[SpatialTask], min_efficiency: float) -> dict:
+    """Returns the report of the scaling study run by `tasks`.
+
+    Only completed tasks are included. The PBS jobs of the tasks are polled
+    with a single (cached) call to `qstat`.
+    """
+    jobs = get_jobs(
+        [record["job_id"] for task in tasks for record in task.get_jobs()],
+        SpatialTask.subprocess_handler,
+        cache_dir=internal.PBS_JOBS_CACHE_DIR,
+        ttl=internal.PBS_POLL_INTERVAL,
+    )
+    results = get_scaling_results(
+        [task for task in tasks if task.get_state() == "completed"], jobs
+    )
+    return {
+        "realisation": tasks[0].model.name,
+        "met_forcing": tasks[0].met_forcing_name,
+        "sci_conf_id": tasks[0].sci_conf_id,
+        "min_efficiency": min_efficiency,
+        "recommended_ncpus": get_efficient_ncpus(results, min_efficiency),
+        "results": results,
+    }
+
+
+def save_scaling_report(report: dict, path: Path = internal.SPATIAL_SCALING_REPORT):
+    """Writes the scaling study `report` to `path`."""
+    get_logger().debug(f"Writing scaling report to {path}")
+    mkdir(path.parent, parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+
+def load_recommended_ncpus(
+    path: Path = internal.SPATIAL_SCALING_REPORT,
+) -> Optional[int]:
+    """Returns the efficient rank count of the scaling report at `path`.
+
+    Returns None if there is no report.
+    """
+    if not path.exists():
+        return None
+    with path.open("r", encoding="utf-8") as file:
+        return json.load(file)["recommended_ncpus"]
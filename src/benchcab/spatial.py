@@ -3,22 +3,83 @@
 
 """A module containing functions and data structures for running spatial tasks."""
 
+import copy
+import json
+import shlex
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
 from typing import Optional
 
-import git
-import yaml
-
 from benchcab import internal
 from benchcab.model import Model
 from benchcab.utils import get_logger
 from benchcab.utils.dict import deep_update
-from benchcab.utils.fs import chdir
+from benchcab.utils.fs import mkdir
 from benchcab.utils.namelist import patch_namelist, patch_remove_namelist
+from benchcab.utils.pbs import (
+    FINISHED_JOB_STATES,
+    JobThrottle,
+    PackPBSConfig,
+    get_job_number,
+    get_jobs,
+    parse_job_ids,
+    render_pack_job_script,
+    select_jobs,
+)
+from benchcab.utils.repo import get_mirror_name
+from benchcab.utils.state import State, StateAttributeError
 from benchcab.utils.subprocess import SubprocessWrapper, SubprocessWrapperInterface
+from benchcab.utils.sweep import SciConfId, iter_science_configurations
+
+
+def get_template_dir(url: str) -> Path:
+    """Returns the path to the template of the payu experiment at `url`."""
+    return internal.SPATIAL_TEMPLATES_DIR / get_mirror_name(url)
+
+
+def update_experiment_template(url: str) -> Path:
+    """Clone the payu experiment at `url` into its template, or fetch updates.
+
+    Returns
+    -------
+    Path
+        Path to the template directory.
+
+    """
+    import git
+
+    logger = get_logger()
+    path = get_template_dir(url)
+    if (path / ".git").exists():
+        logger.debug(f"Updating payu experiment template {path}")
+        repo = git.Repo(path)
+        repo.remotes.origin.fetch()
+        tracking_branch = repo.active_branch.tracking_branch()
+        if tracking_branch is not None:
+            repo.head.reset(tracking_branch.commit, index=True, working_tree=True)
+    else:
+        logger.debug(f"git clone {url} {path}")
+        _ = git.Repo.clone_from(url, path)
+    return path
+
+
+def read_experiment_config(experiment_dir: Path) -> dict:
+    """Returns the payu configuration (`config.yaml`) of a payu experiment."""
+    import yaml
+
+    with (experiment_dir / "config.yaml").open("r", encoding="utf-8") as file:
+        config = yaml.safe_load(file)
+    return config if config is not None else {}
 
 
 class SpatialTask:
-    """A class used to represent a single spatial task."""
+    """A class used to represent a single spatial task.
+
+    The state of a task is one of `pending` (not submitted), `submitted`,
+    `running`, `completed` or `failed`.
+    """
 
     subprocess_handler: SubprocessWrapperInterface = SubprocessWrapper()
 
@@ -27,9 +88,10 @@ class SpatialTask:
         model: Model,
         met_forcing_name: str,
         met_forcing_payu_experiment: str,
-        sci_conf_id: int,
+        sci_conf_id: SciConfId,
         sci_config: dict,
         payu_args: Optional[str] = None,
+        ncpus: Optional[int] = None,
     ) -> None:
         self.model = model
         self.met_forcing_name = met_forcing_name
@@ -37,35 +99,73 @@ class SpatialTask:
         self.sci_conf_id = sci_conf_id
         self.sci_config = sci_config
         self.payu_args = payu_args
+        self.ncpus = ncpus
         self.logger = get_logger()
+        self.state = State(
+            state_dir=internal.STATE_DIR / "spatial" / "runs" / self.get_task_name()
+        )
 
     def get_task_name(self) -> str:
         """Returns the file name convention used for this task."""
-        return f"{self.met_forcing_name}_R{self.model.model_id}_S{self.sci_conf_id}"
+        task_name = (
+            f"{self.met_forcing_name}_R{self.model.model_id}_S{self.sci_conf_id}"
+        )
+        if self.ncpus is not None:
+            task_name += f"_N{self.ncpus}"
+        return task_name
+
+    def setup_task(
+        self, payu_config: Optional[dict] = None, base_config: Optional[dict] = None
+    ):
+        """Does all file manipulations to run cable with payu for this task.
 
-    def setup_task(self, payu_config: Optional[dict] = None):
-        """Does all file manipulations to run cable with payu for this task."""
+        Parameters
+        ----------
+        payu_config : dict, optional
+            Parameters overriding the payu configuration of the experiment.
+        base_config : dict, optional
+            The payu configuration of the experiment template. It is read from
+            the task directory if not specified.
+
+        """
         self.logger.debug(f"Setting up task: {self.get_task_name()}")
 
+        self.state.reset()
+        self.get_jobs_path().unlink(missing_ok=True)
         self.clone_experiment()
-        self.configure_experiment(payu_config)
+        self.configure_experiment(payu_config, base_config)
         self.update_namelist()
 
     def clone_experiment(self):
-        """Clone the payu experiment from GitHub."""
+        """Copy the payu experiment from its template into the task directory.
+
+        The experiment is cloned from GitHub into its template first if the
+        template does not exist. An existing task directory is replaced so
+        that no files of a previous setup are left behind.
+        """
         url = self.met_forcing_payu_experiment
+        template_dir = get_template_dir(url)
+        if not template_dir.exists():
+            update_experiment_template(url)
         path = internal.SPATIAL_TASKS_DIR / self.get_task_name()
-        self.logger.debug(f"git clone {url} {path}")
-        _ = git.Repo.clone_from(url, path)
+        if path.exists():
+            self.logger.debug(f"rm -r {path}")
+            shutil.rmtree(path)
+        self.logger.debug(f"cp -r {template_dir} {path}")
+        shutil.copytree(template_dir, path, symlinks=True)
 
-    def configure_experiment(self, payu_config: Optional[dict] = None):
+    def configure_experiment(
+        self, payu_config: Optional[dict] = None, base_config: Optional[dict] = None
+    ):
         """Configure the payu experiment for this task."""
+        import yaml
+
         task_dir = internal.SPATIAL_TASKS_DIR / self.get_task_name()
         exp_config_path = task_dir / "config.yaml"
-        with exp_config_path.open("r", encoding="utf-8") as file:
-            config = yaml.safe_load(file)
-            if config is None:
-                config = {}
+        if base_config is None:
+            config = read_experiment_config(task_dir)
+        else:
+            config = copy.deepcopy(base_config)
 
         self.logger.debug(
             f"  Updating experiment config parameters in {task_dir / 'config.yaml'}" ""
@@ -74,6 +174,9 @@ class SpatialTask:
         if payu_config:
             config = deep_update(config, payu_config)
 
+        if self.ncpus is not None:
+            config = deep_update(config, {"ncpus": self.ncpus})
+
         config["exe"] = str(self.model.get_exe_path(mpi=True).absolute())
 
         # Here we prepend inputs to the `input` list so that payu knows to use
@@ -107,19 +210,307 @@ class SpatialTask:
             )
             patch_remove_namelist(nml_path, self.model.patch_remove)
 
-    def run(self) -> None:
-        """Runs a single spatial task."""
+    def get_jobs_path(self) -> Path:
+        """Returns the path to the list of PBS jobs submitted for this task."""
+        return self.state.state_dir / internal.SPATIAL_JOBS_FNAME
+
+    def get_archive_dir(self) -> Path:
+        """Returns the payu archive directory of this task."""
+        return internal.PAYU_LABORATORY_DIR / "archive" / self.get_task_name()
+
+    def get_n_runs(self) -> int:
+        """Returns the number of runs requested with `payu run -n`."""
+        args = shlex.split(self.payu_args) if self.payu_args else []
+        for i, arg in enumerate(args):
+            if arg in ["-n", "--nruns"] and i + 1 < len(args):
+                return int(args[i + 1])
+            if arg.startswith("--nruns="):
+                return int(arg.split("=", 1)[1])
+        return 1
+
+    def get_state(self) -> str:
+        """Returns the last known state of this task."""
+        try:
+            return self.state.get()
+        except StateAttributeError:
+            return "pending"
+
+    def set_state(self, state: str):
+        """Sets the state of this task, replacing the previous state."""
+        self.state.reset()
+        self.state.set(state)
+
+    def count_archived_runs(self, since: datetime) -> int:
+        """Returns the number of runs archived by payu since `since`.
+
+        Archives left over from earlier runs of the experiment are not counted.
+        """
+        return sum(
+            1
+            for path in self.get_archive_dir().glob("output[0-9]*")
+            if path.stat().st_mtime >= since.timestamp()
+        )
+
+    def find_follow_up_jobs(self, job_name: str) -> list[str]:
+        """Returns the ids of jobs named `job_name` submitted after the last recorded job.
+
+        payu submits each subsequent run of an experiment as a new job with the
+        same job name.
+        """
+        last = get_job_number(self.get_jobs()[-1]["job_id"])
+        return sorted(
+            (
+                job_id
+                for job_id in select_jobs(job_name, self.subprocess_handler)
+                if get_job_number(job_id) > last
+            ),
+            key=get_job_number,
+        )
+
+    def update_state(self, jobs: dict[str, dict]) -> str:
+        """Derives the state of this task from its PBS jobs and payu archive.
+
+        Follow-up jobs submitted by payu for subsequent runs are discovered by
+        job name and recorded. A task whose latest job is no longer reported
+        by `qstat` keeps its state until the payu archive is complete.
+
+        Parameters
+        ----------
+        jobs : dict[str, dict]
+            Attributes reported by `qstat` of the PBS jobs of the tasks, see
+            `benchcab.utils.pbs.get_jobs()`.
+
+        Returns
+        -------
+        str
+            The updated state.
+
+        """
+        state = self.get_state()
+        records = self.get_jobs()
+        if state in ["pending", "completed"] or not records:
+            return state
+        first_submitted = datetime.fromisoformat(records[0]["submitted"])
+        is_archived = self.count_archived_runs(first_submitted) >= self.get_n_runs()
+        job = jobs.get(records[-1]["job_id"])
+        if job is None:
+            if is_archived:
+                state = "completed"
+        elif job["job_state"] in FINISHED_JOB_STATES:
+            if is_archived:
+                state = "completed"
+            elif job.get("Exit_status") == 0 and "Job_Name" in job:
+                follow_ups = self.find_follow_up_jobs(job["Job_Name"])
+                if follow_ups:
+                    self.add_jobs(follow_ups)
+                    state = "submitted"
+                else:
+                    state = "failed"
+            else:
+                state = "failed"
+        elif job["job_state"] in ["R", "E"]:
+            state = "running"
+        else:
+            state = "submitted"
+        self.set_state(state)
+        return state
+
+    def get_jobs(self) -> list[dict]:
+        """Returns the PBS jobs submitted for this task, oldest first.
+
+        Each job is described by its `job_id` and `submitted` time.
+        """
+        jobs_path = self.get_jobs_path()
+        if not jobs_path.exists():
+            return []
+        with jobs_path.open("r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def add_jobs(self, job_ids: list[str]):
+        """Appends `job_ids` to the PBS jobs submitted for this task."""
+        submitted = datetime.now().isoformat(timespec="seconds")
+        jobs = self.get_jobs() + [
+            {"job_id": job_id, "submitted": submitted} for job_id in job_ids
+        ]
+        jobs_path = self.get_jobs_path()
+        mkdir(jobs_path.parent, parents=True, exist_ok=True)
+        with jobs_path.open("w", encoding="utf-8") as file:
+            json.dump(jobs, file, indent=2)
+
+    def run(self) -> list[str]:
+        """Runs a single spatial task.
+
+        Returns
+        -------
+        list[str]
+            Ids of the PBS jobs submitted by payu, which are recorded in the
+            list of jobs of this task.
+
+        """
         task_dir = internal.SPATIAL_TASKS_DIR / self.get_task_name()
-        with chdir(task_dir):
-            self.subprocess_handler.run_cmd(
-                f"payu run {self.payu_args}" if self.payu_args else "payu run",
-            )
+        proc = self.subprocess_handler.run_cmd(
+            f"payu run {self.payu_args}" if self.payu_args else "payu run",
+            capture_output=True,
+            cwd=task_dir,
+        )
+        self.logger.debug(proc.stdout)
+        job_ids = parse_job_ids(proc.stdout)
+        self.add_jobs(job_ids)
+        self.set_state("submitted")
+        self.logger.info(
+            f"Submitted task {self.get_task_name()}: PBS job(s) {', '.join(job_ids)}"
+        )
+        return job_ids
+
 
+def setup_tasks(tasks: list[SpatialTask], payu_config: Optional[dict] = None):
+    """Sets up tasks in `tasks`.
 
-def run_tasks(tasks: list[SpatialTask]):
-    """Runs tasks in `tasks` sequentially."""
+    Each payu experiment is cloned (or updated) once into a template and its
+    configuration is read once. The task directories are then copied from the
+    templates.
+    """
+    base_configs: dict[str, dict] = {}
     for task in tasks:
-        task.run()
+        url = task.met_forcing_payu_experiment
+        if url not in base_configs:
+            base_configs[url] = read_experiment_config(update_experiment_template(url))
+        task.setup_task(payu_config=payu_config, base_config=base_configs[url])
+
+
+def run_tasks(
+    tasks: list[SpatialTask],
+    max_workers: int = 1,
+    max_queued_jobs: Optional[int] = None,
+    poll_interval: float = internal.PBS_POLL_INTERVAL,
+):
+    """Runs tasks in `tasks`.
+
+    Parameters
+    ----------
+    tasks : list[SpatialTask]
+        Spatial tasks.
+    max_workers : int, optional
+        Number of payu experiments submitted at the same time.
+    max_queued_jobs : int, optional
+        Maximum number of PBS jobs submitted by the tasks which are queued or
+        running at once. Submissions wait until earlier jobs finish once the
+        cap is reached. No cap is applied if not specified.
+    poll_interval : float, optional
+        Seconds between polls of the state of submitted jobs.
+
+    """
+    throttle = JobThrottle(max_queued_jobs, poll_interval)
+
+    def dispatch(task: SpatialTask):
+        with throttle.reserve() as job_ids:
+            job_ids.extend(task.run())
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(dispatch, tasks))
+
+
+def run_packed_tasks(
+    tasks: list[SpatialTask],
+    project: str,
+    size: int,
+    pbs_config: PackPBSConfig,
+    modules: list[str],
+    max_queued_jobs: Optional[int] = None,
+    poll_interval: float = internal.PBS_POLL_INTERVAL,
+):
+    """Runs tasks in `tasks` in batches of `size` tasks per PBS job.
+
+    Each batch is submitted as a single PBS job which runs one step of each
+    payu experiment with `payu-run` (the command payu runs in the jobs it
+    submits), splitting the CPUs of the job evenly between the experiments.
+    The payu configuration of the tasks should request the same number of
+    CPUs. Each experiment runs once, irrespective of `spatial.payu.args`.
+
+    Parameters
+    ----------
+    tasks : list[SpatialTask]
+        Spatial tasks.
+    project : str
+        NCI project to charge.
+    size : int
+        Number of tasks run by each PBS job.
+    pbs_config : PackPBSConfig
+        Queue and resources of each PBS job.
+    modules : list[str]
+        Environment modules loaded by each PBS job.
+    max_queued_jobs : int, optional
+        Maximum number of PBS jobs which are queued or running at once. No cap
+        is applied if not specified.
+    poll_interval : float, optional
+        Seconds between polls of the state of submitted jobs.
+
+    """
+    logger = get_logger()
+    payu_run = shutil.which("payu-run")
+    if payu_run is None:
+        msg = "Unable to find the payu-run executable, is payu installed?"
+        raise RuntimeError(msg)
+    mkdir(internal.SPATIAL_PACK_DIR, parents=True, exist_ok=True)
+    throttle = JobThrottle(max_queued_jobs, poll_interval)
+    for index, start in enumerate(range(0, len(tasks), size)):
+        batch = tasks[start : start + size]
+        job_script_path = internal.SPATIAL_PACK_DIR / f"pack_{index}.sh"
+        with job_script_path.open("w", encoding="utf-8") as file:
+            file.write(
+                render_pack_job_script(
+                    project=project,
+                    pbs_config=pbs_config,
+                    modules=modules,
+                    task_dirs=[
+                        (internal.SPATIAL_TASKS_DIR / task.get_task_name()).absolute()
+                        for task in batch
+                    ],
+                    payu_path=Path(payu_run).parent,
+                    stdout_fname=internal.SPATIAL_PACK_STDOUT_FNAME,
+                )
+            )
+        with throttle.reserve() as job_ids:
+            proc = SpatialTask.subprocess_handler.run_cmd(
+                f"qsub {job_script_path}", capture_output=True
+            )
+            job_ids.extend(parse_job_ids(proc.stdout))
+        for task in batch:
+            task.add_jobs(job_ids)
+            task.set_state("submitted")
+        logger.info(
+            f"Submitted tasks {', '.join(task.get_task_name() for task in batch)}: "
+            f"PBS job(s) {', '.join(job_ids)}"
+        )
+
+
+def update_states(tasks: list[SpatialTask], cache_dir=internal.PBS_JOBS_CACHE_DIR):
+    """Updates the state of each task in `tasks`.
+
+    The state of the latest PBS job of all submitted, running and failed tasks
+    is polled with a single call to `qstat`. The poll is cached for
+    `internal.PBS_POLL_INTERVAL` seconds.
+
+    Returns
+    -------
+    list[str]
+        The updated state of each task.
+
+    """
+    job_ids = [
+        records[-1]["job_id"]
+        for task in tasks
+        if task.get_state() in ["submitted", "running", "failed"]
+        for records in [task.get_jobs()]
+        if records
+    ]
+    jobs = get_jobs(
+        job_ids,
+        SpatialTask.subprocess_handler,
+        cache_dir=cache_dir,
+        ttl=internal.PBS_POLL_INTERVAL,
+    )
+    return [task.update_state(jobs) for task in tasks]
 
 
 def get_spatial_tasks(
@@ -129,7 +520,7 @@ def get_spatial_tasks(
     payu_args: Optional[str] = None,
 ):
     """Returns a list of spatial tasks to run."""
-    tasks = [
+    return [
         SpatialTask(
             model=model,
             met_forcing_name=met_forcing_name,
@@ -140,6 +531,7 @@ def get_spatial_tasks(
         )
         for model in models
         for met_forcing_name, met_forcing_payu_experiment in met_forcings.items()
-        for sci_conf_id, sci_config in enumerate(science_configurations)
+        for sci_conf_id, sci_config in iter_science_configurations(
+            science_configurations
+        )
     ]
-    return tasks
@@ -4,20 +4,28 @@
 # ruff: noqa: PTH118
 
 """Top-level utilities."""
+import contextlib
 import json
 import logging
+import multiprocessing
 import os
 import pkgutil
 import sys
 from importlib import resources
+from multiprocessing.pool import Pool
 from pathlib import Path
-from typing import Iterable, Union
+from typing import Iterable, Optional, Union
+
+
+def _yaml_safe_load(raw: str):
+    # Imported lazily to keep the start up time of the command line low
+    import yaml
+
+    return yaml.safe_load(raw)
 
-import yaml
-from jinja2 import BaseLoader, Environment
 
 # List of one-argument decoding functions.
-PACKAGE_DATA_DECODERS = dict(json=json.loads, yml=yaml.safe_load)
+PACKAGE_DATA_DECODERS = dict(json=json.loads, yml=_yaml_safe_load)
 
 
 def get_installed_root() -> Path:
@@ -79,6 +87,8 @@ def interpolate_string_template(template, **kwargs):
         Interpolated string.
 
     """
+    from jinja2 import BaseLoader, Environment
+
     _template = Environment(loader=BaseLoader()).from_string(template)
     return _template.render(**kwargs)
 
@@ -145,6 +155,26 @@ def get_logger(name="benchcab", level="debug"):
     return logger
 
 
+@contextlib.contextmanager
+def worker_pool(n_processes: int, pool: Optional[Pool] = None):
+    """Context manager yielding a pool of worker processes.
+
+    Parameters
+    ----------
+    n_processes : int
+        Number of worker processes used when creating a new pool.
+    pool : Optional[Pool], optional
+        An existing pool to reuse, by default None. An existing pool is not
+        terminated on exit so that it can be shared between stages.
+
+    """
+    if pool is not None:
+        yield pool
+        return
+    with multiprocessing.Pool(n_processes) as new_pool:
+        yield new_pool
+
+
 def is_verbose():
     """Return True if verbose output is enabled, False otherwise."""
     return get_logger().getEffectiveLevel() == logging.DEBUG
@@ -0,0 +1,66 @@
+"""Contains functions for persisting cached results on the file system."""
+
+import hashlib
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from benchcab.utils import get_logger
+
+
+def get_cache_path(cache_dir: Path, *key) -> Path:
+    """Return the path of the cache entry in `cache_dir` identified by `key`."""
+    digest = hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()
+    return cache_dir / f"{digest}.json"
+
+
+def save_cache(path: Path, data: Any):
+    """Save `data` to the cache entry at `path`.
+
+    The entry is written atomically so that concurrent readers never see a
+    partially written entry. Failures to write the cache are not fatal.
+    """
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=path.parent, delete=False, encoding="utf-8"
+        ) as file:
+            json.dump({"created": time.time(), "data": data}, file)
+        Path(file.name).replace(path)
+    except OSError as exc:
+        get_logger().debug(f"Failed to write cache entry {path}: {exc}")
+
+
+def load_cache(path: Path, ttl: Optional[float] = None) -> Optional[Any]:
+    """Return the data of the cache entry at `path`.
+
+    Parameters
+    ----------
+    path: Path
+        Path to the cache entry.
+    ttl: float, optional
+        Time in seconds after which the entry expires. Entries never expire if
+        not specified.
+
+    Returns
+    -------
+    Optional[Any]
+        The cached data, or None if the entry does not exist, is unreadable or
+        has expired.
+
+    """
+    try:
+        with path.open("r", encoding="utf-8") as file:
+            entry = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if ttl is not None and time.time() - entry["created"] > ttl:
+        return None
+    return entry["data"]
+
+
+def invalidate_cache(path: Path):
+    """Remove the cache entry at `path`."""
+    path.unlink(missing_ok=True)
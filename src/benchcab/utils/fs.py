@@ -4,6 +4,8 @@
 """Contains utility functions for interacting with the file system."""
 
 import contextlib
+import fcntl
+import hashlib
 import os
 import shutil
 from pathlib import Path
@@ -23,6 +25,25 @@ def chdir(newdir: Path):
         os.chdir(prevdir)
 
 
+@contextlib.contextmanager
+def file_lock(lock_path: Path, shared: bool = False):
+    """Context manager holding an advisory lock on `lock_path`.
+
+    The lock is shared between threads and processes, so it can be used to
+    serialise access to directories shared between work directories. A
+    `shared` lock can be held by multiple readers at once, but not while an
+    exclusive lock is held.
+    """
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("w", encoding="utf-8") as file:
+        get_logger().debug(f"Acquiring lock {lock_path}")
+        fcntl.flock(file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
 def rename(src: Path, dest: Path):
     """A wrapper around `pathlib.Path.rename` with optional loggging."""
     get_logger().debug(f"mv {src} {dest}")
@@ -35,6 +56,19 @@ def copy2(src: Path, dest: Path):
     shutil.copy2(src, dest)
 
 
+def file_digest(path: Path, chunk_size: int = 2**20) -> str:
+    """Return the SHA-1 hex digest of the contents of `path`.
+
+    The file is read in chunks of `chunk_size` bytes so that large files are
+    not read into memory at once.
+    """
+    digest = hashlib.sha1()
+    with path.open("rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def next_path(path_pattern: str, path: Path = Path(), sep: str = "-") -> Path:
     """Find the next free path.
 
@@ -1,18 +1,638 @@
 """Utility methods for interacting with the ME.org client."""
 
+import collections
+import json
 import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from multiprocessing.pool import Pool
+from pathlib import Path
+from typing import Callable, Optional
 
-from hpcpy import get_client
-from meorg_client.client import Client as MeorgClient
+import benchcab.utils as bu
+from benchcab.internal import (
+    MEORG_CLIENT,
+    MEORG_EXPERIMENT_ID_MAP,
+    MEORG_OUTPUT_COMPLEVEL,
+    MEORG_OUTPUT_COORDINATES,
+    MEORG_OUTPUT_TIME_CHUNK,
+    MEORG_OUTPUT_VARIABLES,
+    MEORG_PROFILE,
+    MEORG_UPLOAD_THROUGHPUT_TOLERANCE,
+)
+from benchcab.utils import interpolate_file_template, worker_pool
+from benchcab.utils.fs import file_digest, mkdir
 
 
-import benchcab.utils as bu
-from benchcab.internal import MEORG_CLIENT, MEORG_PROFILE, MEORG_EXPERIMENT_ID_MAP
-from benchcab.utils import interpolate_file_template
+def get_client():
+    """Returns a client logged in to modelevaluation.org.
+
+    Credentials are looked up in the same way as the `meorg` command line
+    client: from `~/.meorg/credentials.json`, or in development mode
+    (`MEORG_DEV_MODE=1`) from `~/.meorg/credentials-dev.json` or the
+    `MEORG_EMAIL` and `MEORG_PASSWORD` environment variables.
+    """
+    import meorg_client.utilities as mcu
+    from meorg_client.client import Client as MeorgClient
+
+    if (
+        mcu.is_dev_mode()
+        and not mcu.get_user_data_filepath("credentials-dev.json").is_file()
+    ):
+        credentials = dict(
+            email=os.getenv("MEORG_EMAIL"), password=os.getenv("MEORG_PASSWORD")
+        )
+    else:
+        credentials = mcu.load_user_data(
+            "credentials-dev.json" if mcu.is_dev_mode() else "credentials.json"
+        )
+    return MeorgClient(
+        email=credentials["email"],
+        password=credentials["password"],
+        dev_mode=mcu.is_dev_mode(),
+    )
+
+
+def load_upload_manifest(path: Path) -> dict[str, dict]:
+    """Returns the manifest of uploaded files at `path`, or an empty manifest."""
+    if not path.exists():
+        return {}
+    with path.open("r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_upload_manifest(manifest: dict[str, dict], path: Path):
+    """Writes the manifest of uploaded files to `path`."""
+    with path.open("w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+
+
+def get_remote_file_ids(client, model_output_id: str) -> set[str]:
+    """Returns the ids of the files attached to a model output."""
+    response = client.list_files(model_output_id)
+    return {file.get("id") for file in response["data"]["files"]}
+
+
+def sync_files(
+    client,
+    model_output_id: str,
+    files: list[Path],
+    manifest_path: Path,
+    max_workers: int = 1,
+    retries: int = MEORG_CLIENT["upload_retries"],
+    retry_delay: float = MEORG_CLIENT["retry_delay"],
+) -> dict[str, int]:
+    """Synchronises the files attached to a model output with `files`.
+
+    A manifest of the SHA-1 checksum and remote file id of each uploaded file
+    is kept at `manifest_path` and written after each upload or deletion, so
+    that an interrupted synchronisation resumes where it stopped. Only files
+    which are new or whose checksum changed are uploaded, and only remote
+    files which are no longer in `files` (or are not in the manifest) are
+    deleted. Checksums are only computed again when the size or modification
+    time of a file changes.
+
+    Parameters
+    ----------
+    client : meorg_client.client.Client
+        Client logged in to modelevaluation.org.
+    model_output_id : str
+        Id of the model output.
+    files : list[Path]
+        Files to attach to the model output. Files are identified by name.
+    manifest_path : Path
+        Path to the manifest of the files uploaded to the model output.
+    max_workers : int, optional
+        Maximum number of concurrent uploads, see `upload_files_in_parallel()`.
+    retries : int, optional
+        Number of retries of each failed upload.
+    retry_delay : float, optional
+        Seconds before the first retry of an upload, doubled for each retry.
+
+    Returns
+    -------
+    dict[str, int]
+        The number of files `uploaded`, `deleted` and `unchanged`.
+
+    Raises
+    ------
+    RuntimeError
+        Raised when files fail to upload or uploaded files are not attached to
+        the model output. The files are uploaded again by the next
+        synchronisation.
+
+    """
+    logger = bu.get_logger()
+    mkdir(manifest_path.parent, parents=True, exist_ok=True)
+    manifest = load_upload_manifest(manifest_path)
+    remote_ids = get_remote_file_ids(client, model_output_id)
+    summary = {"uploaded": 0, "deleted": 0, "unchanged": 0}
+
+    def delete(file_id: str):
+        logger.debug(f"Deleting file {file_id} from {model_output_id}")
+        client.delete_file_from_model_output(id=model_output_id, file_id=file_id)
+        remote_ids.discard(file_id)
+        summary["deleted"] += 1
+
+    # Forget uploads which are no longer attached to the model output
+    manifest = {
+        name: entry
+        for name, entry in manifest.items()
+        if entry["file_id"] in remote_ids
+    }
+    local_files = {path.name: path for path in files}
+    for name in sorted(manifest.keys() - local_files.keys()):
+        delete(manifest.pop(name)["file_id"])
+        save_upload_manifest(manifest, manifest_path)
+    tracked_ids = {entry["file_id"] for entry in manifest.values()}
+    for file_id in sorted(remote_ids - tracked_ids):
+        delete(file_id)
+    save_upload_manifest(manifest, manifest_path)
+
+    uploads = {}
+    for name, path in sorted(local_files.items()):
+        stat = path.stat()
+        entry = manifest.get(name)
+        if (
+            entry is not None
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+        ):
+            sha1 = entry["sha1"]
+        else:
+            sha1 = file_digest(path)
+        if entry is not None and entry["sha1"] == sha1:
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            summary["unchanged"] += 1
+            continue
+        uploads[path] = {
+            "sha1": sha1,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    def on_upload(path: Path, file_id: str):
+        entry = manifest.get(path.name)
+        manifest[path.name] = uploads[path] | {"file_id": file_id}
+        summary["uploaded"] += 1
+        if entry is not None:
+            # Replace the previous version of the file
+            delete(entry["file_id"])
+        save_upload_manifest(manifest, manifest_path)
+
+    failed = upload_files_in_parallel(
+        client,
+        model_output_id,
+        list(uploads),
+        max_workers=max_workers,
+        on_upload=on_upload,
+        retries=retries,
+        retry_delay=retry_delay,
+    )
+
+    # Verify that all files are attached to the model output
+    remote_ids = get_remote_file_ids(client, model_output_id)
+    missing = [
+        name for name, entry in manifest.items() if entry["file_id"] not in remote_ids
+    ]
+    for name in missing:
+        del manifest[name]
+    save_upload_manifest(manifest, manifest_path)
+    if failed:
+        msg = (
+            f"Failed to upload files {', '.join(path.name for path in failed)} to "
+            f"model output {model_output_id}. Run the upload again to retry."
+        )
+        raise RuntimeError(msg)
+    if missing:
+        msg = (
+            f"Files {', '.join(missing)} are not attached to model output "
+            f"{model_output_id} after upload. Run the upload again to retry."
+        )
+        raise RuntimeError(msg)
+    return summary
+
+
+class UploadConcurrency:
+    """Adapts the number of concurrent uploads to the observed throughput and errors.
+
+    The number of concurrent uploads (`limit`) starts at one. The throughput
+    (bytes per second) is measured over windows of `limit` completed uploads.
+    At the end of each window, `limit` is increased by one (up to
+    `max_workers`) unless the throughput dropped by more than `tolerance`
+    relative to the best throughput observed so far, in which case it is
+    decreased by one. `limit` is halved after each failed upload. Methods are
+    called from the upload threads.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        tolerance: float = MEORG_UPLOAD_THROUGHPUT_TOLERANCE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Constructor.
+
+        Parameters
+        ----------
+        max_workers : int
+            Upper bound of `limit`.
+        tolerance : float, optional
+            Relative drop in throughput tolerated before `limit` is decreased.
+        clock : Callable[[], float], optional
+            Returns the current time in seconds.
+
+        """
+        self.max_workers = max_workers
+        self.tolerance = tolerance
+        self.limit = 1
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._best_throughput = 0.0
+        self._reset_window()
+
+    def _reset_window(self):
+        self._window_start = self._clock()
+        self._window_bytes = 0
+        self._window_uploads = 0
+
+    def record_success(self, nbytes: int):
+        """Records an upload of `nbytes` bytes."""
+        with self._lock:
+            self._window_bytes += nbytes
+            self._window_uploads += 1
+            if self._window_uploads < self.limit:
+                return
+            elapsed = max(self._clock() - self._window_start, 1e-6)
+            throughput = self._window_bytes / elapsed
+            if throughput >= (1 - self.tolerance) * self._best_throughput:
+                self.limit = min(self.limit + 1, self.max_workers)
+            else:
+                self.limit = max(self.limit - 1, 1)
+            self._best_throughput = max(self._best_throughput, throughput)
+            self._reset_window()
+
+    def record_failure(self):
+        """Records a failed upload."""
+        with self._lock:
+            self.limit = max(self.limit // 2, 1)
+            self._reset_window()
+
+
+def upload_file_with_retries(
+    client,
+    model_output_id: str,
+    path: Path,
+    concurrency: UploadConcurrency,
+    retries: int,
+    retry_delay: float,
+) -> str:
+    """Uploads a file to a model output and returns the id of the uploaded file.
+
+    A failed upload is retried up to `retries` times, waiting `retry_delay`
+    seconds before the first retry and doubling the delay for each retry.
+    """
+    from meorg_client.exceptions import RequestException
+
+    logger = bu.get_logger()
+    for attempt in range(retries + 1):
+        logger.debug(f"Uploading {path} to {model_output_id}")
+        try:
+            responses = client.upload_files(path, id=model_output_id, progress=False)
+        except (RequestException, OSError) as exc:
+            concurrency.record_failure()
+            if attempt == retries:
+                raise
+            delay = retry_delay * 2**attempt
+            logger.warning(f"Upload of {path} failed, retrying in {delay} sec: {exc}")
+            time.sleep(delay)
+            continue
+        concurrency.record_success(path.stat().st_size)
+        return responses[0]["data"]["files"][0]["id"]
+
+
+def upload_files_in_parallel(
+    client,
+    model_output_id: str,
+    files: list[Path],
+    max_workers: int,
+    on_upload: Callable[[Path, str], None],
+    retries: int = MEORG_CLIENT["upload_retries"],
+    retry_delay: float = MEORG_CLIENT["retry_delay"],
+) -> list[Path]:
+    """Uploads files to a model output concurrently.
+
+    Files are uploaded by a pool of `max_workers` threads. The number of
+    uploads in flight is adapted to the throughput and errors, see
+    `UploadConcurrency`. Each failed upload is retried, see
+    `upload_file_with_retries()`.
+
+    Parameters
+    ----------
+    client : meorg_client.client.Client
+        Client logged in to modelevaluation.org.
+    model_output_id : str
+        Id of the model output.
+    files : list[Path]
+        Files to upload.
+    max_workers : int
+        Maximum number of concurrent uploads.
+    on_upload : Callable[[Path, str], None]
+        Called with the path and remote id of each uploaded file, from the
+        calling thread.
+    retries : int, optional
+        Number of retries of each failed upload.
+    retry_delay : float, optional
+        Seconds before the first retry of an upload, doubled for each retry.
+
+    Returns
+    -------
+    list[Path]
+        Files which failed to upload after all retries.
+
+    """
+    from meorg_client.exceptions import RequestException
+
+    logger = bu.get_logger()
+    concurrency = UploadConcurrency(max_workers)
+    pending = collections.deque(files)
+    running: dict[Future, Path] = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers) as executor:
+        while pending or running:
+            while pending and len(running) < concurrency.limit:
+                path = pending.popleft()
+                future = executor.submit(
+                    upload_file_with_retries,
+                    client,
+                    model_output_id,
+                    path,
+                    concurrency,
+                    retries,
+                    retry_delay,
+                )
+                running[future] = path
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = running.pop(future)
+                try:
+                    file_id = future.result()
+                except (RequestException, OSError) as exc:
+                    logger.error(f"Failed to upload {path}: {exc}")
+                    failed.append(path)
+                    continue
+                on_upload(path, file_id)
+    logger.debug(f"Upload concurrency at completion: {concurrency.limit}")
+    return failed
+
+
+def get_file_status(client, file_id: str) -> str:
+    """Returns the transfer status of an uploaded file, e.g. `complete`."""
+    from meorg_client import endpoints
+
+    # meorg_client (pinned to 0.6) has no public method for the file status
+    # endpoint, so the request is made with the private `_make_request()`
+    # which every public method of the client is implemented with
+    response = client._make_request(  # noqa: SLF001
+        method="GET", endpoint=endpoints.FILE_STATUS, url_path_fields={"id": file_id}
+    )
+    return response["data"]["status"]
+
+
+def wait_for_files(
+    client,
+    file_ids: set[str],
+    max_wait: float,
+    interval: float = MEORG_CLIENT["poll_interval"],
+    max_interval: float = MEORG_CLIENT["max_poll_interval"],
+) -> set[str]:
+    """Waits until uploaded files are transferred to the object store.
+
+    The status of each file which is not yet `complete` is polled with
+    exponential backoff: the delay between polls starts at `interval` and is
+    doubled after each poll up to `max_interval`. Failed status requests are
+    treated as pending files.
+
+    Parameters
+    ----------
+    client : meorg_client.client.Client
+        Client logged in to modelevaluation.org.
+    file_ids : set[str]
+        Ids of the uploaded files.
+    max_wait : float
+        Maximum number of seconds to wait for.
+    interval : float, optional
+        Seconds between the first and second poll.
+    max_interval : float, optional
+        Upper bound of the seconds between polls.
+
+    Returns
+    -------
+    set[str]
+        Ids of the files which are not complete after `max_wait` seconds.
+
+    """
+    from meorg_client.exceptions import RequestException
+
+    logger = bu.get_logger()
+    pending = set(file_ids)
+    deadline = time.monotonic() + max_wait
+    while True:
+        for file_id in sorted(pending):
+            try:
+                status = get_file_status(client, file_id)
+            except RequestException as exc:
+                logger.debug(f"Status of file {file_id} unavailable: {exc}")
+                continue
+            if status.lower() == "complete":
+                pending.discard(file_id)
+        remaining = deadline - time.monotonic()
+        if not pending or remaining <= 0:
+            return pending
+        delay = min(interval, remaining)
+        logger.debug(f"Waiting {delay:.0f} sec for {len(pending)} files")
+        time.sleep(delay)
+        interval = min(2 * interval, max_interval)
+
+
+def start_analyses(
+    client,
+    model_output_id: str,
+    experiment_ids: list[str],
+    benchmark_ids: list[str],
+) -> list[str]:
+    """Sets the benchmarks of each experiment and starts the analyses.
+
+    Returns
+    -------
+    list[str]
+        Id of the analysis of each experiment.
+
+    """
+    analysis_ids = []
+    for experiment_id in experiment_ids:
+        client.model_output_benchmarks_replace(
+            model_output_id, experiment_id, benchmark_ids
+        )
+        response = client.start_analysis(model_output_id, experiment_id)
+        analysis_ids.append(response["data"]["analysisId"])
+    return analysis_ids
+
+
+def slim_output_file(
+    src: Path,
+    dst: Path,
+    variables: list[str] = MEORG_OUTPUT_VARIABLES,
+    complevel: int = MEORG_OUTPUT_COMPLEVEL,
+    time_chunk: int = MEORG_OUTPUT_TIME_CHUNK,
+):
+    """Writes a compressed copy of the NetCDF file `src` keeping only `variables`.
+
+    The coordinate variables of the kept variables (variables named after a
+    dimension, the variables in `MEORG_OUTPUT_COORDINATES` and the variables
+    listed in the `coordinates` attribute) are kept as well. Variables are
+    written in NetCDF4 format with zlib compression and the shuffle filter,
+    chunked by `time_chunk` steps along the unlimited (time) dimension and
+    unchunked along all other dimensions. Values are copied unscaled and
+    unmasked, so the data is identical to `src`.
+
+    The copy is written to a temporary file which is renamed to `dst`, so
+    `dst` is never left partially written.
+    """
+    import netCDF4
+    import numpy as np
+
+    tmp = dst.with_name(f".{dst.name}.tmp")
+    with netCDF4.Dataset(src, "r") as nc_src:
+        nc_src.set_auto_maskandscale(False)
+        keep = {
+            name
+            for name in nc_src.variables
+            if name in variables
+            or name in nc_src.dimensions
+            or name in MEORG_OUTPUT_COORDINATES
+        }
+        for name in list(keep):
+            var = nc_src.variables[name]
+            if "coordinates" in var.ncattrs():
+                keep.update(
+                    coord
+                    for coord in var.getncattr("coordinates").split()
+                    if coord in nc_src.variables
+                )
+        dims = {dim for name in keep for dim in nc_src.variables[name].dimensions}
+
+        with netCDF4.Dataset(tmp, "w", format="NETCDF4") as nc_dst:
+            nc_dst.setncatts(
+                {attr: nc_src.getncattr(attr) for attr in nc_src.ncattrs()}
+            )
+            for name, dim in nc_src.dimensions.items():
+                if name in dims:
+                    nc_dst.createDimension(
+                        name, None if dim.isunlimited() else len(dim)
+                    )
+            # Preserve the order of the variables in `src`
+            for name, var in nc_src.variables.items():
+                if name not in keep:
+                    continue
+                attrs = {attr: var.getncattr(attr) for attr in var.ncattrs()}
+                fill_value = attrs.pop("_FillValue", None)
+                compress = bool(var.dimensions) and isinstance(var.datatype, np.dtype)
+                chunksizes = None
+                if compress:
+                    chunksizes = []
+                    for dim in var.dimensions:
+                        size = len(nc_src.dimensions[dim])
+                        if nc_src.dimensions[dim].isunlimited():
+                            size = min(size, time_chunk)
+                        chunksizes.append(max(size, 1))
+                out = nc_dst.createVariable(
+                    name,
+                    var.datatype,
+                    var.dimensions,
+                    zlib=compress,
+                    complevel=complevel,
+                    shuffle=compress,
+                    chunksizes=chunksizes,
+                    fill_value=fill_value,
+                )
+                out.set_auto_maskandscale(False)
+                out.setncatts(attrs)
+                out[...] = var[...]
+    tmp.replace(dst)
+
+
+def get_slim_output_files(
+    src_dir: Path, dst_dir: Path, filenames: list[str]
+) -> list[tuple[Path, Path]]:
+    """Returns the outputs in `src_dir` whose slimmed copy in `dst_dir` is out of date.
+
+    Only the outputs listed in `filenames` are slimmed. Outputs which do not
+    exist or are links (i.e. the outputs of aliased tasks, which carry the
+    provenance of the task they alias) are skipped. Copies which are newer
+    than their source are up to date and are not written again, so that
+    unchanged outputs keep the modification time recorded by `sync_files()`.
+    Copies of outputs which are not slimmed are deleted.
+
+    Returns
+    -------
+    list[tuple[Path, Path]]
+        Pairs of source and destination paths for `slim_output_file()`.
+
+    """
+    mkdir(dst_dir, parents=True, exist_ok=True)
+    sources = []
+    for name in sorted(filenames):
+        src = src_dir / name
+        if src.is_symlink() or not src.exists():
+            bu.get_logger().debug(f"Skipping {src}")
+            continue
+        sources.append(src)
+    names = {src.name for src in sources}
+    for dst in sorted(dst_dir.glob("*.nc")):
+        if dst.name not in names:
+            bu.get_logger().debug(f"Deleting {dst}")
+            dst.unlink()
+    pending = []
+    for src in sources:
+        dst = dst_dir / src.name
+        if not dst.exists() or dst.stat().st_mtime_ns < src.stat().st_mtime_ns:
+            pending.append((src, dst))
+    return pending
+
+
+def slim_output_files(files: list[tuple[Path, Path]]):
+    """Writes slimmed copies of output files serially, see `slim_output_file()`."""
+    for src, dst in files:
+        slim_output_file(src, dst)
+
+
+def slim_output_files_in_parallel(
+    files: list[tuple[Path, Path]],
+    n_processes: int,
+    pool: Optional[Pool] = None,
+):
+    """Writes slimmed copies of output files in parallel across multiple processes.
+
+    An existing `pool` of worker processes is used if specified.
+    """
+    with worker_pool(n_processes, pool) as workers:
+        workers.starmap(slim_output_file, files, chunksize=1)
+
+
+def get_upload_job_mem(upload_workers: int) -> str:
+    """Returns the PBS memory request of an upload job with `upload_workers` uploads."""
+    mem_gb = MEORG_CLIENT["mem_gb"] + MEORG_CLIENT["mem_per_upload_gb"] * upload_workers
+    return f"{mem_gb}GB"
 
 
 def do_meorg(
-    config: dict, upload_dir: str, benchcab_bin: str, benchcab_job_id: str = None
+    config: dict,
+    config_path: str,
+    upload_dir: str,
+    benchcab_bin: str,
+    benchcab_job_id: str = None,
 ):
     """Perform the upload of model outputs to modelevaluation.org.
 
@@ -20,6 +640,8 @@ def do_meorg(
     ----------
     config : dict
         The master config dictionary
+    config_path : str
+        Path to the config file, read by the upload job
     upload_dir : str
         Absolute path to the data dir for upload
     benchcab_bin : str
@@ -31,10 +653,13 @@ def do_meorg(
         True if successful, False otherwise
 
     """
+    from hpcpy import get_client
+    from meorg_client.client import Client as MeorgClient
+
     logger = bu.get_logger()
 
     meorg_output_name = config["meorg_output_name"]
-    num_threads = MEORG_CLIENT["num_threads"]
+    upload_workers = config["meorg_upload_workers"]
 
     # Check if a model output id has been assigned
     if config.get("meorg_output_name") is None:
@@ -73,7 +698,7 @@ def do_meorg(
             "Once initialised, the outputs from this run can be uploaded with the following command:"
         )
         logger.warn(
-            f"meorg file upload {upload_dir}/*.nc -n {num_threads} --attach_to {meorg_output_name}"
+            f"meorg file upload {upload_dir}/*.nc -n {upload_workers} --attach_to {meorg_output_name}"
         )
         logger.warn("Then the analysis can be triggered with:")
         logger.warn(f"meorg analysis start {meorg_output_name}")
@@ -92,7 +717,6 @@ def do_meorg(
             "name": config["meorg_output_name"],
         }
         model_exp_id = MEORG_EXPERIMENT_ID_MAP[experiment]["experiment"]
-        model_benchmark_ids = MEORG_EXPERIMENT_ID_MAP[experiment]["benchmarks"]
 
         # Submit the outputs
         client = get_client()
@@ -105,17 +729,17 @@ def do_meorg(
             mo=mo,
             model_prof_id=MEORG_PROFILE["id"],
             model_exp_ids=[model_exp_id],
-            model_benchmark_ids=model_benchmark_ids,
             data_dir=upload_dir,
-            cache_delay=MEORG_CLIENT["cache_delay"],
-            mem=MEORG_CLIENT["mem"],
-            num_threads=MEORG_CLIENT["num_threads"],
+            config_path=Path(config_path).absolute(),
+            mem=get_upload_job_mem(upload_workers),
+            ncpus=MEORG_CLIENT["ncpus"],
             walltime=MEORG_CLIENT["walltime"],
             storage=MEORG_CLIENT["storage"],
             project=config["project"],
             modules=config["modules"],
             purge_outputs=True,
             meorg_bin=meorg_bin,
+            benchcab_bin=benchcab_bin,
         )
 
         logger.info(f"Upload job submitted: {meorg_jobid}")
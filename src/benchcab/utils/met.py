@@ -0,0 +1,161 @@
+"""Contains functions for cataloguing meteorological forcing files."""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+from benchcab import internal
+from benchcab.utils import get_logger
+from benchcab.utils.cache import get_cache_path, load_cache, save_cache
+
+
+class MetForcingError(Exception):
+    """Exception class for signalling met forcing lookup errors."""
+
+
+def read_time_axis(path: Path) -> tuple[Optional[int], Optional[float]]:
+    """Return the length and timestep (in seconds) of the time axis in `path`.
+
+    `None` is returned for values that cannot be inferred from the file.
+    """
+    import netCDF4
+
+    try:
+        with netCDF4.Dataset(path, "r") as nc:
+            time = nc.variables["time"]
+            n_timesteps = len(time)
+            if n_timesteps < 2:
+                return n_timesteps, None
+            unit = time.units.split()[0].lower()
+            if unit not in internal.TIME_UNITS_IN_SECONDS:
+                return n_timesteps, None
+            timestep = float(time[1] - time[0]) * internal.TIME_UNITS_IN_SECONDS[unit]
+            return n_timesteps, timestep
+    except (OSError, KeyError, AttributeError) as exc:
+        get_logger().debug(f"Failed to read time axis of {path}: {exc}")
+        return None, None
+
+
+def get_met_forcing_catalog(
+    met_dir: Path = internal.MET_DIR,
+    cache_dir: Path = internal.MET_CATALOG_CACHE_DIR,
+) -> dict[str, dict]:
+    """Return a catalog of the met forcing files in `met_dir`.
+
+    The catalog maps each file name to its size, modification time, length of
+    the time axis and timestep in seconds. The directory is scanned once and
+    the catalog is cached in `cache_dir`. The cached catalog is reused while
+    the modification time of `met_dir` is unchanged, i.e. no files have been
+    added, removed or renamed. When the catalog is rebuilt, the metadata of
+    files with an unchanged size and modification time is carried over.
+
+    Parameters
+    ----------
+    met_dir: Path
+        Path to the met forcing directory.
+    cache_dir: Path
+        Path to the directory in which catalogs are cached.
+
+    Returns
+    -------
+    dict[str, dict]
+        Catalog of met forcing files keyed by file name.
+
+    """
+    logger = get_logger()
+    met_dir = Path(met_dir)
+    catalog_path = get_cache_path(cache_dir, str(met_dir.resolve()))
+    mtime = met_dir.stat().st_mtime_ns
+
+    cached = load_cache(catalog_path) or {}
+    if cached.get("mtime") == mtime:
+        return cached["files"]
+
+    logger.debug(f"Building met forcing catalog for {met_dir}")
+    previous = cached.get("files", {})
+    files = {}
+    with os.scandir(met_dir) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            old = previous.get(entry.name, {})
+            if (old.get("size"), old.get("mtime")) == (stat.st_size, stat.st_mtime_ns):
+                files[entry.name] = old
+                continue
+            n_timesteps, timestep = read_time_axis(Path(entry.path))
+            files[entry.name] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "n_timesteps": n_timesteps,
+                "timestep": timestep,
+            }
+
+    save_cache(catalog_path, {"met_dir": str(met_dir), "mtime": mtime, "files": files})
+
+    return files
+
+
+def find_site_file_name(site_id: str, catalog: dict[str, dict]) -> str:
+    """Return the file name in `catalog` of the met forcing for `site_id`.
+
+    Raises
+    ------
+    MetForcingError
+        Raised when `site_id` does not map uniquely to a file in `catalog`.
+
+    """
+    file_names = sorted(name for name in catalog if name.startswith(site_id))
+    if not file_names:
+        msg = f"Failed to infer met file for site id '{site_id}'."
+        raise MetForcingError(msg)
+    if len(file_names) > 1:
+        msg = f"Multiple paths infered for site id: '{site_id}'."
+        raise MetForcingError(msg)
+    return file_names[0]
+
+
+def get_site_ids(experiment: str) -> list[str]:
+    """Return the site ids specified by an experiment.
+
+    The `experiment` argument either specifies a key in `MEORG_EXPERIMENTS` or a
+    site id within the five-site-test experiment.
+    """
+    if experiment in internal.MEORG_EXPERIMENTS["five-site-test"]:
+        # the user is specifying a single met site
+        return [experiment]
+    return list(internal.MEORG_EXPERIMENTS[experiment])
+
+
+def get_met_forcing_file_names(
+    experiment: str,
+    met_dir: Path = internal.MET_DIR,
+    sites: Optional[list[str]] = None,
+    cache_dir: Path = internal.MET_CATALOG_CACHE_DIR,
+) -> list[str]:
+    """Get a list of meteorological forcing file basenames.
+
+    Parameters
+    ----------
+    experiment: str
+        Experiment from which the site ids are taken.
+    met_dir: Path
+        Path to the met forcing directory.
+    sites: list[str], optional
+        Site ids to use instead of the sites of `experiment`.
+    cache_dir: Path
+        Path to the directory in which catalogs are cached.
+
+    Raises
+    ------
+    MetForcingError
+        Raised when a site id does not map uniquely to a met file in `met_dir`.
+
+    """
+    catalog = get_met_forcing_catalog(met_dir, cache_dir)
+    site_ids = sites if sites is not None else get_site_ids(experiment)
+    try:
+        return [find_site_file_name(site_id, catalog) for site_id in site_ids]
+    except MetForcingError as exc:
+        msg = f"{exc} (in {met_dir})"
+        raise MetForcingError(msg) from exc
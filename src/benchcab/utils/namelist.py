@@ -5,8 +5,6 @@
 
 from pathlib import Path
 
-import f90nml
-
 from benchcab.utils.dict import deep_del, deep_update
 
 
@@ -15,6 +13,8 @@ def patch_namelist(nml_path: Path, patch: dict):
 
     The `patch` dictionary must comply with the `f90nml` api.
     """
+    import f90nml
+
     if not nml_path.exists():
         f90nml.write(patch, nml_path)
         return
@@ -28,6 +28,8 @@ def patch_remove_namelist(nml_path: Path, patch_remove: dict):
 
     The `patch_remove` dictionary must comply with the `f90nml` api.
     """
+    import f90nml
+
     nml = f90nml.read(nml_path)
     try:
         f90nml.write(deep_del(nml, patch_remove), nml_path, force=True)
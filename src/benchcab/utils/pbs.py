@@ -1,11 +1,31 @@
 # Copyright 2022 ACCESS-NRI and contributors. See the top-level COPYRIGHT file for details.
 # SPDX-License-Identifier: Apache-2.0
 
-"""Contains helper functions for manipulating PBS job scripts."""
+"""Contains helper functions for manipulating PBS job scripts and tracking PBS jobs."""
 
+import contextlib
+import json
+import re
+import shlex
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from subprocess import CalledProcessError
 from typing import Optional, TypedDict
 
-from benchcab.utils import interpolate_file_template
+from benchcab.utils import get_logger, interpolate_file_template
+from benchcab.utils.cache import get_cache_path, load_cache, save_cache
+from benchcab.utils.subprocess import SubprocessWrapper, SubprocessWrapperInterface
+
+# Job ids printed by `qsub`, e.g. `123456.gadi-pbs`
+JOB_ID_PATTERN = re.compile(r"^\s*(\d+(?:\[\d*\])?\.[\w.-]+)\s*$", re.MULTILINE)
+
+# States of jobs which are no longer queued or running
+FINISHED_JOB_STATES = ["F", "X"]
+
+# Storage required by all jobs (in addition to the configured storage)
+DEFAULT_STORAGE_FLAGS = ["gdata/ks32", "gdata/xp65", "gdata/wd9"]
 
 
 class PBSConfig(TypedDict):
@@ -17,6 +37,12 @@ class PBSConfig(TypedDict):
     storage: str
 
 
+class PackPBSConfig(PBSConfig):
+    """Parameters for PBS jobs running several spatial tasks at once."""
+
+    queue: str
+
+
 def render_job_script(
     project: str,
     config_path: str,
@@ -32,7 +58,7 @@ def render_job_script(
     between model output files.
     """
     verbose_flag = " -v" if verbose else ""
-    storage_flags = ["gdata/ks32", "gdata/xp65", "gdata/wd9", *pbs_config["storage"]]
+    storage_flags = [*DEFAULT_STORAGE_FLAGS, *pbs_config["storage"]]
 
     context = dict(
         verbose_flag=verbose_flag,
@@ -48,3 +74,220 @@ def render_job_script(
     )
 
     return interpolate_file_template("pbs_jobscript.j2", **context)
+
+
+def render_pack_job_script(
+    project: str,
+    pbs_config: PackPBSConfig,
+    modules: list[str],
+    task_dirs: list[Path],
+    payu_path: Path,
+    stdout_fname: str,
+) -> str:
+    """Returns the text for a PBS job script running several payu experiments at once.
+
+    The CPUs of the job are split evenly between the experiments in
+    `task_dirs`. Each experiment runs `payu-run` in the background, restricted
+    to its share of the nodes listed in `$PBS_NODEFILE` through an OpenMPI
+    hostfile. The job fails if any of the experiments fail.
+
+    Parameters
+    ----------
+    project : str
+        NCI project to charge.
+    pbs_config : PackPBSConfig
+        Queue and resources of the job.
+    modules : list[str]
+        Environment modules loaded by the job.
+    task_dirs : list[Path]
+        Absolute paths to the payu control directories.
+    payu_path : Path
+        Directory containing the payu executables.
+    stdout_fname : str
+        File name of the output of `payu-run` in each control directory.
+
+    """
+    ncpus_per_task = pbs_config["ncpus"] // len(task_dirs)
+    tasks = [
+        {
+            "dir": task_dir,
+            "first": i * ncpus_per_task + 1,
+            "last": (i + 1) * ncpus_per_task,
+        }
+        for i, task_dir in enumerate(task_dirs)
+    ]
+    context = dict(
+        ncpus=pbs_config["ncpus"],
+        mem=pbs_config["mem"],
+        walltime=pbs_config["walltime"],
+        queue=pbs_config["queue"],
+        project=project,
+        storage="+".join([*DEFAULT_STORAGE_FLAGS, *pbs_config["storage"]]),
+        modules=modules,
+        payu_path=payu_path,
+        tasks=tasks,
+        stdout=stdout_fname,
+    )
+    return interpolate_file_template("spatial_pack_jobscript.j2", **context)
+
+
+def parse_job_ids(output: str) -> list[str]:
+    """Returns the PBS job ids printed on their own line in `output`."""
+    return JOB_ID_PATTERN.findall(output)
+
+
+def get_job_number(job_id: str) -> int:
+    """Returns the sequence number of a PBS job id, e.g. 123 for `123[4].gadi-pbs`."""
+    return int(re.match(r"\d+", job_id).group())
+
+
+def select_jobs(
+    job_name: str,
+    subprocess_handler: SubprocessWrapperInterface = SubprocessWrapper(),
+) -> list[str]:
+    """Returns the ids of the queued, running and finished jobs named `job_name`."""
+    try:
+        output = subprocess_handler.run_cmd(
+            f"qselect -x -N {shlex.quote(job_name)}", capture_output=True
+        ).stdout
+    except CalledProcessError as exc:
+        output = exc.output or ""
+    return parse_job_ids(output)
+
+
+def get_jobs(
+    job_ids: Iterable[str],
+    subprocess_handler: SubprocessWrapperInterface = SubprocessWrapper(),
+    cache_dir: Optional[Path] = None,
+    ttl: Optional[float] = None,
+) -> dict[str, dict]:
+    """Returns the attributes reported by `qstat` of each job in `job_ids`.
+
+    Parameters
+    ----------
+    job_ids : Iterable[str]
+        PBS job ids.
+    subprocess_handler : SubprocessWrapperInterface, optional
+        Object for handling subprocess calls.
+    cache_dir : Path, optional
+        Directory in which the result of polling `job_ids` is cached, so that
+        repeated polls within `ttl` seconds do not query PBS.
+    ttl : float, optional
+        Time in seconds after which a cached poll expires.
+
+    Returns
+    -------
+    dict[str, dict]
+        Attributes (e.g. `job_state` and `Exit_status`) of each job. Jobs
+        unknown to PBS are omitted.
+
+    """
+    job_ids = sorted(job_ids)
+    if not job_ids:
+        return {}
+    if cache_dir is not None:
+        cache_path = get_cache_path(cache_dir, *job_ids)
+        jobs = load_cache(cache_path, ttl)
+        if jobs is not None:
+            return jobs
+    try:
+        output = subprocess_handler.run_cmd(
+            "qstat -x -f -F json " + " ".join(job_ids), capture_output=True
+        ).stdout
+    except CalledProcessError as exc:
+        # qstat exits with an error if any of the jobs are unknown
+        output = exc.output or ""
+    start = output.find("{")
+    jobs = (
+        json.JSONDecoder().raw_decode(output[start:])[0].get("Jobs", {})
+        if start >= 0
+        else {}
+    )
+    if cache_dir is not None:
+        save_cache(cache_path, jobs)
+    return jobs
+
+
+def get_job_states(
+    job_ids: Iterable[str],
+    subprocess_handler: SubprocessWrapperInterface = SubprocessWrapper(),
+) -> dict[str, str]:
+    """Returns the PBS job state (e.g. `Q`, `R` or `F`) of each job in `job_ids`.
+
+    Jobs unknown to PBS are omitted.
+    """
+    return {
+        job_id: job["job_state"]
+        for job_id, job in get_jobs(job_ids, subprocess_handler).items()
+    }
+
+
+class JobThrottle:
+    """Caps the number of PBS jobs which are queued or running at the same time.
+
+    Jobs are submitted within `reserve()`, which blocks while the number of
+    active jobs (including jobs being submitted) is at the cap.
+    """
+
+    subprocess_handler: SubprocessWrapperInterface = SubprocessWrapper()
+
+    def __init__(
+        self,
+        max_jobs: Optional[int],
+        poll_interval: float,
+    ) -> None:
+        """Constructor.
+
+        Parameters
+        ----------
+        max_jobs : int, optional
+            Maximum number of active jobs. No cap is applied if None.
+        poll_interval : float
+            Seconds to wait between polling the state of active jobs.
+
+        """
+        self.max_jobs = max_jobs
+        self.poll_interval = poll_interval
+        self.job_ids: set[str] = set()
+        self.logger = get_logger()
+        self._n_pending = 0
+        self._lock = threading.Lock()
+
+    def _has_capacity(self) -> bool:
+        if self.max_jobs is None:
+            return True
+        if len(self.job_ids) + self._n_pending >= self.max_jobs:
+            # Only poll PBS once the jobs submitted so far reach the cap
+            states = get_job_states(self.job_ids, self.subprocess_handler)
+            self.job_ids = {
+                job_id
+                for job_id, state in states.items()
+                if state not in FINISHED_JOB_STATES
+            }
+        return len(self.job_ids) + self._n_pending < self.max_jobs
+
+    @contextlib.contextmanager
+    def reserve(self) -> Iterator[list[str]]:
+        """Context manager reserving capacity for the submission of jobs.
+
+        The ids of the submitted jobs should be appended to the yielded list.
+        """
+        waiting = False
+        while True:
+            with self._lock:
+                if self._has_capacity():
+                    self._n_pending += 1
+                    break
+            if not waiting:
+                self.logger.info(
+                    f"Waiting for fewer than {self.max_jobs} active PBS jobs..."
+                )
+                waiting = True
+            time.sleep(self.poll_interval)
+        job_ids: list[str] = []
+        try:
+            yield job_ids
+        finally:
+            with self._lock:
+                self._n_pending -= 1
+                self.job_ids.update(job_ids)
@@ -1,24 +1,46 @@
 """Contains classes for handling and abstracting different version control systems."""
 
+import hashlib
+import shutil
 from abc import ABC as AbstractBaseClass  # noqa: N811
 from abc import abstractmethod
 from pathlib import Path
 from typing import Optional
 
-import git
-
 from benchcab import internal
 from benchcab.utils import get_logger
+from benchcab.utils.fs import file_lock
 from benchcab.utils.subprocess import SubprocessWrapper, SubprocessWrapperInterface
 
 
+def get_mirror_name(source: str) -> str:
+    """Return a unique and human readable directory name for a mirrored `source`.
+
+    Parameters
+    ----------
+    source: str
+        URL or branch path of the repository being mirrored.
+
+    Returns
+    -------
+    str
+        Directory name of the mirror.
+
+    """
+    digest = hashlib.sha1(source.encode()).hexdigest()[:10]
+    return f"{Path(source.rstrip('/')).stem}-{digest}"
+
+
 class Repo(AbstractBaseClass):
     """A general interface for working with code repositories.
 
     The interface has been designed so that it can be implemented with different
-    version control systems like Git or SVN.
+    version control systems like Git or SVN. Implementations check out the
+    source code to `realisation_path`.
     """
 
+    realisation_path: Path
+
     @abstractmethod
     def checkout(self):
         """Checkout the source code."""
@@ -45,6 +67,37 @@ class Repo(AbstractBaseClass):
 
         """
 
+    @abstractmethod
+    def update(self) -> bool:
+        """Update an existing checkout to the requested version of the source code.
+
+        Untracked files (e.g. build directories) are kept so that the source
+        code can be rebuilt incrementally.
+
+        Returns
+        -------
+        bool
+            True if the checked out source code changed, False otherwise.
+
+        """
+
+    def get_provenance(self) -> dict:
+        """Return provenance information describing the checked out source code.
+
+        Returns
+        -------
+        dict
+            Dictionary with the `branch`, `revision`, `url` and `dirty` state of
+            the source code. Unknown values are set to None.
+
+        """
+        return {
+            "branch": self.get_branch_name(),
+            "revision": self.get_revision(),
+            "url": None,
+            "dirty": None,
+        }
+
 
 class LocalRepo(Repo):
     """Concrete implementation of the `Repo` class using local path backend."""
@@ -76,6 +129,21 @@ class LocalRepo(Repo):
             f"Created symlink from to {self.realisation_path} named {self.name}"
         )
 
+    def update(self) -> bool:
+        """Update an existing checkout to the requested version of the source code.
+
+        The realisation is a symlink to the local repository so there is
+        nothing to update.
+
+        Returns
+        -------
+        bool
+            Always False.
+
+        """
+        self.logger.info(f"{self.realisation_path} is a symlink, nothing to update")
+        return False
+
     def get_revision(self) -> str:
         """Return the latest revision of the source code.
 
@@ -98,6 +166,18 @@ class LocalRepo(Repo):
         """
         return Path(self.realisation_path).absolute().as_posix()
 
+    def get_provenance(self) -> dict:
+        """Return provenance information describing the checked out source code.
+
+        Returns
+        -------
+        dict
+            Dictionary with the `branch`, `revision`, `url` and `dirty` state of
+            the source code. Unknown values are set to None.
+
+        """
+        return super().get_provenance() | {"url": str(self.local_path)}
+
 
 class GitRepo(Repo):
     """A concrete implementation of the `Repo` class using a Git backend.
@@ -117,6 +197,8 @@ class GitRepo(Repo):
         branch: str,
         realisation_path: Path,
         commit: Optional[str] = None,
+        mirror_dir: Optional[Path] = None,
+        slim: bool = False,
     ) -> None:
         """Return a `GitRepo` instance.
 
@@ -133,6 +215,14 @@ class GitRepo(Repo):
         commit: str, optional
             Commit hash (long). When specified the repository will reset to this
             commit when cloning.
+        mirror_dir: Path, optional
+            Path to a directory of local reference mirrors. When specified, a
+            bare mirror of `url` is kept up to date in this directory and used
+            as a reference when cloning so that only new objects are fetched.
+        slim: bool, optional
+            When True, make a shallow clone of the branch (or commit) and
+            restrict the working tree to the directories required to build the
+            offline executable, by default False.
 
         """
         self.url = url
@@ -144,24 +234,121 @@ class GitRepo(Repo):
             realisation_path / branch if is_bare_directory else realisation_path
         )
         self.commit = commit
+        self.mirror_dir = mirror_dir
+        self.slim = slim
         self.logger = get_logger()
 
+    def update_mirror(self) -> Path:
+        """Create or update the local reference mirror of `url`.
+
+        Returns
+        -------
+        Path
+            Path to the bare mirror repository.
+
+        """
+        mirror_path = self.mirror_dir / "git" / f"{get_mirror_name(self.url)}.git"
+        if (mirror_path / "HEAD").exists():
+            self.logger.debug(f"Updating reference mirror {mirror_path}")
+            self.subprocess_handler.run_cmd(
+                f"git --git-dir={mirror_path} remote update --prune"
+            )
+        else:
+            self.logger.debug(f"Creating reference mirror {mirror_path}")
+            self.subprocess_handler.run_cmd(
+                f"git clone --mirror -- {self.url} {mirror_path}"
+            )
+        return mirror_path
+
     def checkout(self):
         """Checkout the source code."""
         # TODO(Sean) the gitpython package provides an interface for displaying
         # remote progress. See
         # https://gitpython.readthedocs.io/en/stable/reference.html#git.remote.RemoteProgress
-        self.subprocess_handler.run_cmd(
-            f"git clone --branch {self.branch} -- {self.url} {self.realisation_path}"
-        )
+        cmd = f"git clone --branch {self.branch}"
+        if self.slim:
+            cmd += " --depth 1 --filter=blob:none --sparse"
+        if self.mirror_dir:
+            # Only updating the mirror is exclusive, so that concurrent
+            # checkouts of the same repository clone in parallel
+            lock_path = self.mirror_dir / "git" / f"{get_mirror_name(self.url)}.lock"
+            with file_lock(lock_path):
+                mirror_path = self.update_mirror()
+            with file_lock(lock_path, shared=True):
+                self.subprocess_handler.run_cmd(
+                    f"{cmd} --reference {mirror_path} --dissociate "
+                    f"-- {self.url} {self.realisation_path}"
+                )
+        else:
+            self.subprocess_handler.run_cmd(
+                f"{cmd} -- {self.url} {self.realisation_path}"
+            )
+        if self.slim:
+            self.logger.debug("Restricting working tree to offline build sources")
+            self.subprocess_handler.run_cmd(
+                f"git -C {self.realisation_path} sparse-checkout set --cone "
+                + " ".join(internal.SPARSE_CHECKOUT_DIRS)
+            )
         if self.commit:
+            if self.slim:
+                # A shallow clone only contains the tip of the branch
+                self.subprocess_handler.run_cmd(
+                    f"git -C {self.realisation_path} fetch --depth 1 origin {self.commit}"
+                )
             self.logger.debug(f"Reset to commit {self.commit} (hard reset)")
+            import git
+
             repo = git.Repo(self.realisation_path)
             repo.head.reset(self.commit, working_tree=True)
         self.logger.info(
             f"Successfully checked out {self.branch} - {self.get_revision()}"
         )
 
+    def update(self) -> bool:
+        """Update an existing checkout to the requested version of the source code.
+
+        Untracked files (e.g. build directories) are kept so that the source
+        code can be rebuilt incrementally.
+
+        Returns
+        -------
+        bool
+            True if the checked out commit changed, False otherwise.
+
+        """
+        git_cmd = f"git -C {self.realisation_path}"
+        before = self._rev_parse_head()
+
+        # A shallow clone can only fetch the requested commit directly
+        ref = self.commit if self.slim and self.commit else self.branch
+        depth_flag = " --depth 1" if self.slim else ""
+        if self.mirror_dir and ref == self.branch:
+            lock_path = self.mirror_dir / "git" / f"{get_mirror_name(self.url)}.lock"
+            with file_lock(lock_path):
+                mirror_path = self.update_mirror()
+            with file_lock(lock_path, shared=True):
+                self.subprocess_handler.run_cmd(
+                    f"{git_cmd} fetch{depth_flag} {mirror_path.absolute()} {ref}"
+                )
+        else:
+            self.subprocess_handler.run_cmd(f"{git_cmd} fetch{depth_flag} origin {ref}")
+
+        target = self.commit if self.commit else "FETCH_HEAD"
+        self.subprocess_handler.run_cmd(f"{git_cmd} checkout -B {self.branch} {target}")
+
+        after = self._rev_parse_head()
+        if before == after:
+            self.logger.info(f"{self.branch} is up to date - commit {after}")
+            return False
+        self.logger.info(f"Updated {self.branch} from commit {before} to {after}")
+        return True
+
+    def _rev_parse_head(self) -> str:
+        proc = self.subprocess_handler.run_cmd(
+            f"git -C {self.realisation_path} rev-parse HEAD", capture_output=True
+        )
+        return proc.stdout.strip()
+
     def get_revision(self) -> str:
         """Return the latest revision of the source code.
 
@@ -171,6 +358,8 @@ class GitRepo(Repo):
             Human readable string describing the latest revision.
 
         """
+        import git
+
         repo = git.Repo(self.realisation_path)
         return f"commit {repo.head.commit.hexsha}"
 
@@ -185,6 +374,26 @@ class GitRepo(Repo):
         """
         return self.branch
 
+    def get_provenance(self) -> dict:
+        """Return provenance information describing the checked out source code.
+
+        Returns
+        -------
+        dict
+            Dictionary with the `branch`, `revision`, `url` and `dirty` state of
+            the source code.
+
+        """
+        import git
+
+        repo = git.Repo(self.realisation_path)
+        return {
+            "branch": self.branch,
+            "revision": f"commit {repo.head.commit.hexsha}",
+            "url": self.url,
+            "dirty": repo.is_dirty(),
+        }
+
 
 class SVNRepo(Repo):
     """A concrete implementation of the `Repo` class using an SVN backend.
@@ -204,6 +413,7 @@ class SVNRepo(Repo):
         branch_path: str,
         realisation_path: Path,
         revision: Optional[int] = None,
+        mirror_dir: Optional[Path] = None,
     ) -> None:
         """Return an `SVNRepo` instance.
 
@@ -221,11 +431,16 @@ class SVNRepo(Repo):
         revision: int, optional
             SVN revision number. When specified the branch will be set to this
             revision on checkout.
+        mirror_dir: Path, optional
+            Path to a directory of local mirrors. When specified, a pristine
+            working copy of the branch is kept up to date in this directory
+            and copied on checkout so that only new revisions are fetched.
 
         """
         self.svn_root = svn_root
         self.branch_path = branch_path
         self.revision = revision
+        self.mirror_dir = mirror_dir
         is_bare_directory = realisation_path.is_dir() and (
             not (realisation_path / ".svn").exists()
         )
@@ -236,20 +451,100 @@ class SVNRepo(Repo):
         )
         self.logger = get_logger()
 
+    def update_mirror(self) -> Path:
+        """Create or update the pristine working copy of `branch_path`.
+
+        Each pinned revision has its own working copy, so that a mirror is
+        only ever moved forward to the head of the branch.
+
+        Returns
+        -------
+        Path
+            Path to the mirrored working copy.
+
+        """
+        mirror_path = self.mirror_dir / "svn" / self._get_mirror_name()
+        revision_flag = f" -r {self.revision}" if self.revision else ""
+        if (mirror_path / ".svn").exists():
+            self.logger.debug(f"Updating mirrored working copy {mirror_path}")
+            self.subprocess_handler.run_cmd(f"svn update{revision_flag} {mirror_path}")
+        else:
+            self.logger.debug(f"Creating mirrored working copy {mirror_path}")
+            self.subprocess_handler.run_cmd(
+                f"svn checkout{revision_flag} "
+                f"{internal.CABLE_SVN_ROOT}/{self.branch_path} {mirror_path}"
+            )
+        return mirror_path
+
     def checkout(self):
         """Checkout the source code."""
-        cmd = "svn checkout"
+        if self.mirror_dir:
+            # Only updating the mirror is exclusive, so that concurrent
+            # checkouts of the same branch copy it in parallel
+            lock_path = self.mirror_dir / "svn" / f"{self._get_mirror_name()}.lock"
+            with file_lock(lock_path):
+                mirror_path = self.update_mirror()
+            with file_lock(lock_path, shared=True):
+                self.logger.debug(f"cp -r {mirror_path} {self.realisation_path}")
+                shutil.copytree(mirror_path, self.realisation_path, symlinks=True)
+        else:
+            cmd = "svn checkout"
+
+            if self.revision:
+                cmd += f" -r {self.revision}"
+
+            cmd += (
+                f" {internal.CABLE_SVN_ROOT}/{self.branch_path} {self.realisation_path}"
+            )
+
+            self.subprocess_handler.run_cmd(cmd)
+
+        self.logger.info(
+            f"Successfully checked out {self.realisation_path.name} - {self.get_revision()}"
+        )
+
+    def update(self) -> bool:
+        """Update an existing checkout to the requested version of the source code.
+
+        Unversioned files (e.g. build directories) are kept so that the source
+        code can be rebuilt incrementally.
+
+        Returns
+        -------
+        bool
+            True if the checked out URL or revision changed, False otherwise.
+
+        """
+        before = self._show_items("url", "revision")
 
+        cmd = "svn switch"
         if self.revision:
             cmd += f" -r {self.revision}"
-
         cmd += f" {internal.CABLE_SVN_ROOT}/{self.branch_path} {self.realisation_path}"
-
         self.subprocess_handler.run_cmd(cmd)
 
+        after = self._show_items("url", "revision")
+        if before == after:
+            self.logger.info(f"{self.realisation_path.name} is up to date")
+            return False
         self.logger.info(
-            f"Successfully checked out {self.realisation_path.name} - {self.get_revision()}"
+            f"Updated {self.realisation_path.name} - {self.get_revision()}"
         )
+        return True
+
+    def _get_mirror_name(self) -> str:
+        if self.revision:
+            return get_mirror_name(f"{self.branch_path}@{self.revision}")
+        return get_mirror_name(self.branch_path)
+
+    def _show_items(self, *items: str) -> list[str]:
+        return [
+            self.subprocess_handler.run_cmd(
+                f"svn info --show-item {item} {self.realisation_path}",
+                capture_output=True,
+            ).stdout.strip()
+            for item in items
+        ]
 
     def get_revision(self) -> str:
         """Return the latest revision of the source code.
@@ -277,12 +572,33 @@ class SVNRepo(Repo):
         """
         return Path(self.branch_path).name
 
+    def get_provenance(self) -> dict:
+        """Return provenance information describing the checked out source code.
+
+        Returns
+        -------
+        dict
+            Dictionary with the `branch`, `revision`, `url` and `dirty` state of
+            the source code.
+
+        """
+        proc = self.subprocess_handler.run_cmd(
+            f"svn status --quiet {self.realisation_path}",
+            capture_output=True,
+        )
+        return {
+            "branch": self.get_branch_name(),
+            "revision": self.get_revision(),
+            "url": f"{internal.CABLE_SVN_ROOT}/{self.branch_path}",
+            "dirty": bool(proc.stdout.strip()),
+        }
+
 
 class RepoSpecError(Exception):
     """A custom exception class for repository spec errors."""
 
 
-def create_repo(spec: dict, path: Path) -> Repo:
+def create_repo(spec: dict, path: Path, mirror_dir: Optional[Path] = None) -> Repo:
     """A factory function which returns `Repo` objects.
 
     Parameters
@@ -292,6 +608,8 @@ def create_repo(spec: dict, path: Path) -> Repo:
         configuration file.
     path: Path
         Path to a directory in which the repository is checked out to.
+    mirror_dir: Path, optional
+        Path to a directory of local mirrors used to speed up checkouts.
 
     Returns
     -------
@@ -302,10 +620,13 @@ def create_repo(spec: dict, path: Path) -> Repo:
     if "git" in spec:
         if "url" not in spec["git"]:
             spec["git"]["url"] = internal.CABLE_GIT_URL
-        return GitRepo(realisation_path=path, **spec["git"])
+        return GitRepo(realisation_path=path, mirror_dir=mirror_dir, **spec["git"])
     if "svn" in spec:
         return SVNRepo(
-            svn_root=internal.CABLE_SVN_ROOT, realisation_path=path, **spec["svn"]
+            svn_root=internal.CABLE_SVN_ROOT,
+            realisation_path=path,
+            mirror_dir=mirror_dir,
+            **spec["svn"],
         )
     if "local" in spec:
         return LocalRepo(realisation_path=path, **spec["local"])
@@ -29,6 +29,7 @@ class SubprocessWrapperInterface(AbstractBaseClass):
         capture_output: bool = False,
         output_file: Optional[pathlib.Path] = None,
         env: Optional[dict] = None,
+        cwd: Optional[pathlib.Path] = None,
     ) -> subprocess.CompletedProcess:
         """A wrapper around the `subprocess.run` function for executing system commands."""
 
@@ -42,6 +43,7 @@ class SubprocessWrapper(SubprocessWrapperInterface):
         capture_output: bool = False,
         output_file: Optional[pathlib.Path] = None,
         env: Optional[dict] = None,
+        cwd: Optional[pathlib.Path] = None,
     ) -> subprocess.CompletedProcess:
         """Constructor.
 
@@ -55,6 +57,8 @@ class SubprocessWrapper(SubprocessWrapperInterface):
             Output file, by default None
         env : Optional[dict], optional
             Environment vars to pass, by default None
+        cwd : Optional[pathlib.Path], optional
+            Working directory of the command, by default None
 
         Returns
         -------
@@ -80,6 +84,9 @@ class SubprocessWrapper(SubprocessWrapperInterface):
             if env:
                 kwargs["env"] = env
 
+            if cwd:
+                kwargs["cwd"] = cwd
+
             if verbose:
                 print(cmd)
 
@@ -0,0 +1,65 @@
+"""Contains functions for expanding parameter sweeps of science configurations.
+
+A parameter sweep is specified in `science_configurations` as a dictionary with
+a `sweep` key which maps dot separated namelist paths to lists of values, and an
+optional `base` science configuration on which each combination is applied:
+
+```yaml
+science_configurations:
+  - sweep:
+      cable.cable_user.GS_SWITCH: [medlyn, leuning]
+      cable.cable_user.FWSOIL_SWITCH: [Haverd2013, standard]
+    base:
+      cable:
+        cable_user:
+          litter: True
+```
+
+Sweeps are expanded lazily into the Cartesian product of their values.
+"""
+
+import itertools
+from collections.abc import Iterator
+from typing import Any, Union
+
+from benchcab.utils.dict import deep_update
+
+SciConfId = Union[int, str]
+
+
+def is_sweep(sci_config: dict) -> bool:
+    """Return True if `sci_config` specifies a parameter sweep."""
+    return "sweep" in sci_config
+
+
+def _nest(path: str, value: Any) -> dict:
+    """Return a nested dictionary setting `value` at the dot separated `path`."""
+    nested = value
+    for key in reversed(path.split(".")):
+        nested = {key: nested}
+    return nested
+
+
+def iter_science_configurations(
+    science_configurations: list[dict],
+) -> Iterator[tuple[SciConfId, dict]]:
+    """Yield the science configuration id and science configuration of each entry.
+
+    Entries that are not sweeps keep their list index as id. Each combination of
+    a sweep is identified by the list index of the sweep followed by the index
+    of each value along the axes of the sweep, e.g. `2.0.1`. Ids therefore stay
+    the same when values are appended to an axis or entries are appended to
+    `science_configurations`.
+    """
+    for index, sci_config in enumerate(science_configurations):
+        if not is_sweep(sci_config):
+            yield index, sci_config
+            continue
+        paths = list(sci_config["sweep"])
+        axes = [enumerate(values) for values in sci_config["sweep"].values()]
+        for point in itertools.product(*axes):
+            sci_conf_id = ".".join([str(index), *(str(i) for i, _ in point)])
+            yield sci_conf_id, deep_update(
+                sci_config.get("base", {}),
+                *(_nest(path, value) for path, (_, value) in zip(paths, point)),
+            )
@@ -18,6 +18,9 @@ def clean_realisation_files():
                 realisation.unlink()
         shutil.rmtree(internal.SRC_DIR)
 
+    if internal.PROVENANCE_STATE_DIR.exists():
+        shutil.rmtree(internal.PROVENANCE_STATE_DIR)
+
 
 def clean_submission_files():
     """Remove files/directories related to PBS jobs."""
@@ -42,6 +45,7 @@ def setup_spatial_directory_tree():
     for path in [
         internal.SPATIAL_RUN_DIR,
         internal.SPATIAL_TASKS_DIR,
+        internal.SPATIAL_TEMPLATES_DIR,
         internal.PAYU_LABORATORY_DIR,
     ]:
         mkdir(path, parents=True, exist_ok=True)
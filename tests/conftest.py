@@ -115,6 +115,7 @@ def mock_subprocess_handler():
         """A mock implementation of `SubprocessWrapperInterface` used for testing."""
 
         def __init__(self) -> None:
+            super().__init__()
             self.commands: list[str] = []
             self.stdout = "mock standard output"
             self.error_on_call = False
@@ -126,6 +127,7 @@ def mock_subprocess_handler():
             capture_output: bool = False,
             output_file: Optional[Path] = None,
             env: Optional[dict] = None,
+            cwd: Optional[Path] = None,
         ) -> CompletedProcess:
             self.commands.append(cmd)
             if self.error_on_call:
@@ -147,6 +149,7 @@ def mock_environment_modules_handler():
         """A mock implementation of `EnvironmentModulesInterface` used for testing."""
 
         def __init__(self) -> None:
+            super().__init__()
             self.commands: list[str] = []
 
         def module_is_avail(self, *args: str) -> bool:
@@ -1,12 +1,20 @@
 """`pytest` tests for `benchcab.py`."""
 
+import functools
 import re
 from contextlib import nullcontext as does_not_raise
+from pathlib import Path
 from unittest import mock
 
 import pytest
 
-from benchcab.benchcab import Benchcab
+import benchcab.benchcab
+from benchcab import internal
+from benchcab.benchcab import Benchcab, PreflightError
+from benchcab.model import Model
+from benchcab.utils import get_logger
+from benchcab.utils.met import get_met_forcing_file_names
+from benchcab.utils.repo import Repo
 
 
 @pytest.fixture(scope="module", autouse=True)
@@ -66,3 +74,251 @@ def test_user_project_group(config_project, pytest_error):
     app = Benchcab(benchcab_exe_path=None)
     with pytest_error:
         app._validate_environment(project=config_project, modules=[])
+
+
+@pytest.fixture()
+def mock_repo_factory():
+    """Return a factory for mock implementations of the `Repo` interface."""
+
+    class MockRepo(Repo):
+        """A mock implementation of the `Repo` interface used for testing."""
+
+        def __init__(self, branch: str, fail: bool = False) -> None:
+            self.branch = branch
+            self.fail = fail
+            self.updated = False
+            self.realisation_path = internal.SRC_DIR / branch
+
+        def checkout(self):
+            if self.fail:
+                raise FileExistsError(self.branch)
+
+        def update(self) -> bool:
+            self.updated = True
+            return True
+
+        def get_branch_name(self) -> str:
+            return self.branch
+
+        def get_revision(self) -> str:
+            return f"commit {self.branch}"
+
+    return MockRepo
+
+
+@pytest.fixture()
+def app(config):
+    """Return a `Benchcab` instance that does not validate the environment."""
+    _app = Benchcab(benchcab_exe_path=None, validate_env=False)
+    _app.set_logger(get_logger())
+    _app._config = config
+    return _app
+
+
+class TestCheckout:
+    """Tests for `Benchcab.checkout()`."""
+
+    def test_revision_log_is_ordered_by_realisation(self, app, mock_repo_factory):
+        """Success case: revision log follows the realisation order."""
+        app._models = [
+            Model(repo=mock_repo_factory(f"branch-{i}"), model_id=i) for i in range(6)
+        ]
+        app.checkout("config.yaml")
+        assert Path("rev_number-1.log").read_text() == "".join(
+            f"branch-{i}: commit branch-{i}\n" for i in range(6)
+        )
+
+    def test_failed_checkout_raises(self, app, mock_repo_factory):
+        """Failure case: a failed checkout raises after all checkouts complete."""
+        app._models = [
+            Model(repo=mock_repo_factory("ok"), model_id=0),
+            Model(repo=mock_repo_factory("bad", fail=True), model_id=1),
+        ]
+        with pytest.raises(RuntimeError, match="realisations bad.$") as excinfo:
+            app.checkout("config.yaml")
+        assert isinstance(excinfo.value.__cause__, FileExistsError)
+
+    def test_failed_checkout_of_existing_realisation(self, app, mock_repo_factory):
+        """Failure case: cleaning or updating is suggested for existing realisations."""
+        app._models = [Model(repo=mock_repo_factory("bad", fail=True), model_id=0)]
+        (Path("src") / "bad").mkdir(parents=True)
+        with pytest.raises(FileExistsError, match="benchcab clean realisations"):
+            app.checkout("config.yaml")
+
+    def test_existing_realisation_is_updated(self, app, mock_repo_factory):
+        """Success case: existing realisations are updated in update mode."""
+        repo = mock_repo_factory("existing", fail=True)
+        app._models = [Model(repo=repo, model_id=0)]
+        (Path("src") / "existing").mkdir(parents=True)
+        app.checkout("config.yaml", update=True)
+        assert repo.updated
+
+
+class TestFluxsiteJob:
+    """Tests for `Benchcab.fluxsite_job()`."""
+
+    @pytest.fixture()
+    def stages(self, app, config):
+        """Replace each stage of the job with a stub recording its invocation."""
+        calls = []
+        config["fluxsite"]["multiprocess"] = False
+        config["codecov"] = True
+        for stage in [
+            "fluxsite_run_tasks",
+            "fluxsite_bitwise_cmp",
+            "gen_codecov",
+            "meorg_slim_outputs",
+        ]:
+            setattr(app, stage, lambda config_path, stage=stage: calls.append(stage))
+        return calls
+
+    def test_all_stages_run_in_order(self, app, stages):
+        """Success case: all stages run in a single call."""
+        app.fluxsite_job("config.yaml", skip=[])
+        assert stages == ["fluxsite_run_tasks", "fluxsite_bitwise_cmp", "gen_codecov"]
+
+    def test_skip_optional_stages(self, app, stages):
+        """Success case: optional stages can be skipped."""
+        app.fluxsite_job("config.yaml", skip=["fluxsite-bitwise-cmp", "gen_codecov"])
+        assert stages == ["fluxsite_run_tasks"]
+
+    def test_slim_outputs_for_meorg(self, app, config, stages):
+        """Success case: outputs are slimmed when uploading to modelevaluation.org."""
+        config["meorg_output_name"] = "test-output"
+        app.fluxsite_job("config.yaml", skip=["fluxsite-bitwise-cmp", "gen_codecov"])
+        assert stages == ["fluxsite_run_tasks", "meorg_slim_outputs"]
+
+
+class TestMeorgSlimOutputs:
+    """Tests for `Benchcab.meorg_slim_outputs()`."""
+
+    def test_outputs_of_failed_tasks_and_aliases_are_skipped(
+        self, app, config, monkeypatch
+    ):
+        """Success case: only outputs of completed unique tasks are slimmed."""
+        config["fluxsite"]["multiprocess"] = False
+        done, failed, alias = (mock.Mock(alias_of=None) for _ in range(3))
+        alias.alias_of = done
+        for task, name, is_done in [
+            (done, "done", True),
+            (failed, "failed", False),
+            (alias, "alias", True),
+        ]:
+            task.get_output_filename.return_value = f"{name}_out.nc"
+            task.is_done.return_value = is_done
+        app._fluxsite_tasks = [done, failed, alias]
+        get_slim_output_files = mock.Mock(return_value=[])
+        monkeypatch.setattr(
+            benchcab.benchcab.bm, "get_slim_output_files", get_slim_output_files
+        )
+        app.meorg_slim_outputs("config.yaml")
+        get_slim_output_files.assert_called_once_with(
+            internal.FLUXSITE_DIRS["OUTPUT"],
+            internal.FLUXSITE_DIRS["MEORG"],
+            ["done_out.nc"],
+        )
+
+
+class TestCheckMetForcing:
+    """Tests for `Benchcab._check_met_forcing()`."""
+
+    @pytest.fixture()
+    def met_dir(self, config, monkeypatch) -> Path:
+        """Configure a met directory containing two of the default sites."""
+        monkeypatch.setattr(
+            benchcab.benchcab,
+            "get_met_forcing_file_names",
+            functools.partial(get_met_forcing_file_names, cache_dir=Path("cache")),
+        )
+        path = Path("met")
+        path.mkdir()
+        for name in ["AU-Tum_2002-2017_OzFlux_Met.nc", "AU-How_2003-2017_Met.nc"]:
+            (path / name).touch()
+        config["fluxsite"] |= {
+            "experiment": "five-site-test",
+            "met_dir": str(path),
+            "sites": ["AU-Tum", "AU-How"],
+        }
+        return path
+
+    def test_configured_sites_in_met_dir(self, app, met_dir):
+        """Success case: only the configured sites are checked in `met_dir`."""
+        app._check_met_forcing()
+
+    def test_missing_site(self, app, config, met_dir):
+        """Failure case: a configured site has no met file in `met_dir`."""
+        config["fluxsite"]["sites"] = None
+        with pytest.raises(PreflightError, match="'FI-Hyy'.*\\(in met\\)"):
+            app._check_met_forcing()
+
+    def test_missing_met_dir(self, app, config, met_dir):
+        """Failure case: the met directory does not exist."""
+        config["fluxsite"]["met_dir"] = "missing"
+        with pytest.raises(PreflightError, match="missing does not exist"):
+            app._check_met_forcing()
+
+
+class TestPreflightCache:
+    """Tests for caching the result of `Benchcab._validate_environment()`."""
+
+    @pytest.fixture()
+    def checks(self, app, monkeypatch, mock_environment_modules_handler):
+        """Replace the environment checks with stubs recording their invocation."""
+        calls = []
+        app.modules_handler = mock_environment_modules_handler
+        monkeypatch.setattr(internal, "PREFLIGHT_CACHE_DIR", Path("cache"))
+        monkeypatch.delenv("PBS_JOBID", raising=False)
+        monkeypatch.delenv("PBS_O_HOST", raising=False)
+        app.validate_env = True
+        app._config_hash = "abc123"
+        app._get_preflight_checks = lambda project, modules: {
+            "node": lambda: calls.append("node")
+        }
+        return calls
+
+    def validate(self, app):
+        """Validate the environment with a fresh validation state."""
+        app._env_validated = False
+        app._validate_environment(project="xp65", modules=[])
+
+    def test_cached_result_is_reused(self, app, checks):
+        """Success case: checks that passed are not repeated."""
+        self.validate(app)
+        self.validate(app)
+        assert checks == ["node"]
+
+    def test_cached_result_expires(self, app, checks, monkeypatch):
+        """Success case: checks are repeated once the cached result expires."""
+        monkeypatch.setattr(internal, "PREFLIGHT_CACHE_TTL", -1)
+        self.validate(app)
+        self.validate(app)
+        assert checks == ["node", "node"]
+
+    def test_cached_result_does_not_expire_in_job(self, app, checks, monkeypatch):
+        """Success case: checks that passed on submission are skipped in a job."""
+        monkeypatch.setattr(internal, "PREFLIGHT_CACHE_TTL", -1)
+        self.validate(app)
+        monkeypatch.setenv("PBS_JOBID", "123.gadi-pbs")
+        monkeypatch.setenv("PBS_O_HOST", internal.NODENAME)
+        self.validate(app)
+        assert checks == ["node"]
+
+    def test_doctor_invalidates_cached_result(self, app, checks):
+        """Success case: `doctor` always runs the checks and refreshes the cache."""
+        self.validate(app)
+        app.doctor("config.yaml")
+        self.validate(app)
+        assert checks == ["node", "node"]
+
+    def test_doctor_reports_failures(self, app, checks):
+        """Failure case: `doctor` exits and leaves no cached result on failure."""
+        self.validate(app)
+
+        def fail():
+            msg = "Module (nccmp) is not available."
+            raise PreflightError(msg)
+
+        app._get_preflight_checks = lambda project, modules: {"module nccmp": fail}
+        with pytest.raises(SystemExit):
+            app.doctor("config.yaml")
+        assert not app._get_preflight_cache_path().exists()
@@ -1,5 +1,8 @@
 """`pytest` tests for `cli.py`."""
 
+import subprocess
+import sys
+
 import pytest
 
 from benchcab.benchcab import Benchcab
@@ -17,6 +20,7 @@ def test_cli_parser():
         "config_path": "config.yaml",
         "verbose": False,
         "skip": [],
+        "update": False,
         "func": app.run,
     }
 
@@ -33,6 +37,7 @@ def test_cli_parser():
     assert res == {
         "config_path": "config.yaml",
         "verbose": False,
+        "update": False,
         "func": app.checkout,
     }
 
@@ -52,6 +57,7 @@ def test_cli_parser():
         "no_submit": False,
         "verbose": False,
         "skip": [],
+        "update": False,
         "func": app.fluxsite,
     }
 
@@ -88,12 +94,22 @@ def test_cli_parser():
         "func": app.fluxsite_bitwise_cmp,
     }
 
+    # Success case: default fluxsite-job command
+    res = vars(parser.parse_args(["fluxsite-job"]))
+    assert res == {
+        "config_path": "config.yaml",
+        "verbose": False,
+        "skip": [],
+        "func": app.fluxsite_job,
+    }
+
     # Success case: default spatial command
     res = vars(parser.parse_args(["spatial"]))
     assert res == {
         "config_path": "config.yaml",
         "verbose": False,
         "skip": [],
+        "update": False,
         "func": app.spatial,
     }
 
@@ -110,9 +126,30 @@ def test_cli_parser():
     assert res == {
         "config_path": "config.yaml",
         "verbose": False,
+        "resume": False,
         "func": app.spatial_run_tasks,
     }
 
+    # Success case: spatial-run-tasks command resuming incomplete tasks
+    res = vars(parser.parse_args(["spatial-run-tasks", "--resume"]))
+    assert res["resume"] is True
+
+    # Success case: default spatial-scaling-run command
+    res = vars(parser.parse_args(["spatial-scaling-run"]))
+    assert res == {
+        "config_path": "config.yaml",
+        "verbose": False,
+        "func": app.spatial_scaling_run,
+    }
+
+    # Success case: default spatial-scaling-report command
+    res = vars(parser.parse_args(["spatial-scaling-report"]))
+    assert res == {
+        "config_path": "config.yaml",
+        "verbose": False,
+        "func": app.spatial_scaling_report,
+    }
+
     # Success case: default gen_codecov command
     res = vars(parser.parse_args(["gen_codecov"]))
     assert res == {
@@ -121,6 +158,34 @@ def test_cli_parser():
         "func": app.gen_codecov,
     }
 
+    # Success case: default doctor command
+    res = vars(parser.parse_args(["doctor"]))
+    assert res == {
+        "config_path": "config.yaml",
+        "verbose": False,
+        "func": app.doctor,
+    }
+
+    # Success case: meorg-upload command
+    res = vars(parser.parse_args(["meorg-upload", "abc123", "runs/fluxsite/outputs"]))
+    assert res == {
+        "config_path": "config.yaml",
+        "verbose": False,
+        "model_output_id": "abc123",
+        "data_dir": "runs/fluxsite/outputs",
+        "func": app.meorg_upload,
+    }
+
+    # Success case: meorg-job command
+    res = vars(parser.parse_args(["meorg-job", "abc123", "runs/fluxsite/meorg"]))
+    assert res == {
+        "config_path": "config.yaml",
+        "verbose": False,
+        "model_output_id": "abc123",
+        "data_dir": "runs/fluxsite/meorg",
+        "func": app.meorg_job,
+    }
+
     # Failure case: pass --no-submit to a non 'run' command
     with pytest.raises(SystemExit):
         parser.parse_args(["fluxsite-setup-work-dir", "--no-submit"])
@@ -128,3 +193,44 @@ def test_cli_parser():
     # Failure case: pass non-optional command to --skip
     with pytest.raises(SystemExit):
         parser.parse_args(["run", "--skip", "checkout"])
+
+
+# Third-party packages that should only be imported by the subcommands that use them
+HEAVY_DEPENDENCIES = [
+    "netCDF4",
+    "numpy",
+    "f90nml",
+    "flatdict",
+    "git",
+    "hpcpy",
+    "meorg_client",
+    "cerberus",
+    "yaml",
+    "jinja2",
+    "python",  # environment modules initialization script
+]
+# Generous upper bound of the time taken to import the CLI in microseconds, the
+# CLI imports in about 0.1 sec while importing the heavy dependencies takes
+# several times as long
+CLI_IMPORT_TIME_LIMIT = 1_000_000
+
+
+def test_cli_startup_import_time():
+    """Success case: importing the CLI is fast and skips heavy dependencies."""
+    # `-X importtime` reports the self and cumulative import time in
+    # microseconds of every module imported at start up on stderr
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import benchcab.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_times = {
+        line.split("|")[-1].strip(): int(line.split("|")[-2])
+        for line in proc.stderr.splitlines()
+        if line.startswith("import time:") and line.split("|")[-2].strip().isdigit()
+    }
+    assert not {
+        module for module in import_times if module.split(".")[0] in HEAVY_DEPENDENCIES
+    }
+    assert import_times["benchcab.main"] < CLI_IMPORT_TIME_LIMIT
@@ -74,15 +74,25 @@ def all_optional_default_config(no_optional_config) -> dict:
         "project": OPTIONAL_CONFIG_PROJECT,
         "fluxsite": {
             "experiment": bi.FLUXSITE_DEFAULT_EXPERIMENT,
+            "met_dir": str(bi.MET_DIR),
+            "sites": None,
+            "ensemble": None,
             "multiprocess": bi.FLUXSITE_DEFAULT_MULTIPROCESS,
+            "deduplicate": bi.FLUXSITE_DEFAULT_DEDUPLICATE,
             "pbs": bi.FLUXSITE_DEFAULT_PBS,
         },
         "science_configurations": bi.DEFAULT_SCIENCE_CONFIGURATIONS,
         "spatial": {
             "payu": {"config": {}, "args": None},
+            "dispatch": bi.SPATIAL_DEFAULT_DISPATCH,
+            "scaling": None,
+            "pack": None,
             "met_forcings": internal.SPATIAL_DEFAULT_MET_FORCINGS,
         },
         "codecov": False,
+        "mirror_dir": None,
+        "meorg_max_wait": bi.MEORG_DEFAULT_MAX_WAIT,
+        "meorg_upload_workers": bi.MEORG_DEFAULT_UPLOAD_WORKERS,
     }
     for c_r in config["realisations"]:
         c_r["name"] = None
@@ -100,7 +110,20 @@ def all_optional_custom_config(no_optional_config) -> dict:
         "project": NO_OPTIONAL_CONFIG_PROJECT,
         "fluxsite": {
             "experiment": "AU-Tum",
+            "met_dir": "/scratch/$PROJECT/met",
+            "sites": ["AU-Tum", "AU-How"],
+            "ensemble": {
+                "seed": 0,
+                "sampling": "latin_hypercube",
+                "size": 10,
+                "parameters": {
+                    "pft_params.nml": {
+                        "cable_pftparm.vegin.vcmax": {"scale": [0.8, 1.2]}
+                    }
+                },
+            },
             "multiprocess": False,
+            "deduplicate": False,
             "pbs": {
                 "ncpus": 6,
                 "mem": "10GB",
@@ -113,15 +136,31 @@ def all_optional_custom_config(no_optional_config) -> dict:
                 "cable": {
                     "cable_user": {"FWSOIL_SWITCH": "test_fw", "GS_SWITCH": "test_gs"}
                 }
-            }
+            },
+            {"sweep": {"cable.cable_user.GS_SWITCH": ["test_gs", "test_gs2"]}},
         ],
         "spatial": {
             "payu": {"config": {"walltime": "1:00:00"}, "args": "-n 2"},
+            "dispatch": {"max_workers": 2, "max_queued_jobs": 10},
+            "scaling": {"ncpus": [16, 32, 64], "min_efficiency": 0.8, "apply": True},
+            "pack": {
+                "size": 2,
+                "pbs": {
+                    "queue": "normalsr",
+                    "ncpus": 96,
+                    "mem": "380GB",
+                    "walltime": "2:00:00",
+                    "storage": ["scratch/$PROJECT"],
+                },
+            },
             "met_forcings": {
                 "crujra_access": "https://github.com/CABLE-LSM/cable_example.git"
             },
         },
         "codecov": True,
+        "mirror_dir": "/scratch/$PROJECT/benchcab-mirrors",
+        "meorg_max_wait": 600,
+        "meorg_upload_workers": 4,
     }
     branch_names = ["123-sample-optional", "git_branch"]
 
@@ -211,6 +250,12 @@ def test_add_meorg_output_name(all_optional_custom_config):
     assert output_config == all_optional_custom_config
 
 
+def test_add_meorg_output_name_unset(config, monkeypatch):
+    """Test repositories are not created when no model output name is set."""
+    monkeypatch.setattr(bc, "create_repo", mock.Mock(side_effect=AssertionError))
+    assert bc.add_meorg_output_name(config) == config
+
+
 def test_empty_meorg_output_name():
     """Test validating empty model output name."""
     msg = bc.is_valid_meorg_output_name("")
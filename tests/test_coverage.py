@@ -5,15 +5,36 @@ the working directory used for testing is cleaned up in the `_run_around_tests`
 pytest autouse fixture.
 """
 
+import json
+import os
 from pathlib import Path
+from types import SimpleNamespace
 
 import pytest
 
 from benchcab import internal
-from benchcab.coverage import CoverageTask
+from benchcab.coverage import (
+    CoverageMerger,
+    CoverageTask,
+    get_coverage_delta,
+    parse_function_coverage,
+    save_coverage_delta,
+)
+from benchcab.utils.fs import file_digest
 
 COVERAGE_REALISATION = "R0"
 PROJECT_NAME = "BENCHCAB_TEST"
+FUNCTION_COVERAGE = """<?xml version="1.0" encoding="ISO-8859-1"?>
+<PROJECT name="CABLE">
+  <MODULE name="{src_dir}/cable_canopy.F90">
+    <FUNCTION name="define_canopy" freq="42"></FUNCTION>
+    <FUNCTION name="unused" freq="0"></FUNCTION>
+  </MODULE>
+  <MODULE name="{src_dir}/cable_soil.F90">
+    <FUNCTION name="soil_snow" freq="7"></FUNCTION>
+  </MODULE>
+</PROJECT>
+"""
 DPI_FILE = "test.dpi"
 SPI_FILE = "test.spi"
 
@@ -34,16 +55,40 @@ def coverage_task(
     return _coverage_task
 
 
+@pytest.fixture()
+def coverage_dir() -> Path:
+    """Create and return the fluxsite bitwise coverage directory."""
+    coverage_path = internal.CODECOV_DIR / COVERAGE_REALISATION
+    coverage_path.mkdir(parents=True)
+    return coverage_path
+
+
+def write_dyn_files(coverage_dir: Path, names: list[str], age: float = 60):
+    """Write empty `.dyn` files last modified `age` seconds ago."""
+    for name in names:
+        path = coverage_dir / f"{name}.dyn"
+        path.touch()
+        mtime = path.stat().st_mtime - age
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture()
+def profmerge(mock_subprocess_handler, monkeypatch):
+    """Write the DPI file of each mocked `profmerge -prof-dir` command."""
+    run_cmd = mock_subprocess_handler.run_cmd
+
+    def run_profmerge(cmd: str, **kwargs):
+        proc = run_cmd(cmd, **kwargs)
+        if cmd.startswith("profmerge -prof-dir"):
+            Path(cmd.split("-prof-dpi ")[1]).touch()
+        return proc
+
+    monkeypatch.setattr(mock_subprocess_handler, "run_cmd", run_profmerge)
+
+
 class TestRun:
     """Tests for `CoverageTask.run()`."""
 
-    @pytest.fixture(autouse=True)
-    def coverage_dir(self) -> Path:
-        """Create and return the fluxsite bitwise coverage directory."""
-        coverage_path = internal.CODECOV_DIR / COVERAGE_REALISATION
-        coverage_path.mkdir(parents=True)
-        return coverage_path
-
     def test_profmerge_execution(self, coverage_task, mock_subprocess_handler):
         """Success case: test profmerge is executed."""
         coverage_task.run()
@@ -54,5 +99,219 @@ class TestRun:
         coverage_task.run()
         assert (
             f"codecov -prj {PROJECT_NAME} -dpi {DPI_FILE} -spi {SPI_FILE}"
+            f" -xmlfcvrg {internal.CODECOV_XML_FNAME}"
             in mock_subprocess_handler.commands
         )
+
+    @pytest.mark.usefixtures("profmerge")
+    def test_intermediate_dpi_files_are_merged(
+        self, coverage_task, coverage_dir, mock_subprocess_handler
+    ):
+        """Success case: remaining .dyn files are merged with earlier batches."""
+        write_dyn_files(coverage_dir, ["a"])
+        coverage_task.merge_batch()
+        write_dyn_files(coverage_dir, ["b"], age=0)
+        coverage_task.run()
+        assert (
+            f"profmerge -prof-dpi {DPI_FILE} -a batches/0.dpi batches/1.dpi"
+            in mock_subprocess_handler.commands
+        )
+
+
+class TestMergeBatch:
+    """Tests for `CoverageTask.merge_batch()`."""
+
+    def test_dyn_files_are_merged_once(
+        self, coverage_task, coverage_dir, mock_subprocess_handler
+    ):
+        """Success case: .dyn files are merged into a new intermediate DPI file."""
+        write_dyn_files(coverage_dir, ["a", "b"])
+        batch_dir = (coverage_dir / "batches").absolute()
+        assert coverage_task.merge_batch() == coverage_dir / "batches" / "0.dpi"
+        assert mock_subprocess_handler.commands == [
+            f"profmerge -prof-dir {batch_dir / '0'} -prof-dpi {batch_dir / '0.dpi'}"
+        ]
+        assert not list(coverage_dir.glob("*.dyn"))
+        assert not (batch_dir / "0").exists()
+        assert coverage_task.merge_batch() is None
+
+    def test_recent_dyn_files_are_skipped(
+        self, coverage_task, coverage_dir, mock_subprocess_handler
+    ):
+        """Success case: .dyn files which may still be written are not merged."""
+        write_dyn_files(coverage_dir, ["a"], age=0)
+        assert coverage_task.merge_batch(min_age=10) is None
+        assert mock_subprocess_handler.commands == []
+
+    def test_failed_batch_is_merged_again(
+        self, coverage_task, coverage_dir, mock_subprocess_handler
+    ):
+        """Failure case: .dyn files of a failed merge are merged by the next merge."""
+        write_dyn_files(coverage_dir, ["a"])
+        mock_subprocess_handler.error_on_call = True
+        with pytest.raises(Exception, match="profmerge"):
+            coverage_task.merge_batch()
+        mock_subprocess_handler.error_on_call = False
+        assert coverage_task.merge_batch() == coverage_dir / "batches" / "0.dpi"
+
+
+class TestCoverageMerger:
+    """Tests for `CoverageMerger`."""
+
+    @pytest.mark.usefixtures("profmerge")
+    def test_merge_after_each_batch_of_tasks(
+        self, coverage_task, coverage_dir, mock_subprocess_handler
+    ):
+        """Success case: .dyn files are merged once `batch_size` tasks complete."""
+        task = SimpleNamespace(
+            model=SimpleNamespace(get_coverage_dir=lambda: coverage_dir)
+        )
+        merger = CoverageMerger([coverage_task], batch_size=2, min_age=0)
+        write_dyn_files(coverage_dir, ["a", "b"])
+        for _ in range(3):
+            merger.notify(task)
+        merger.close()
+        assert [path.name for path in coverage_task.get_batch_dpi_files()] == ["0.dpi"]
+        assert not list(coverage_dir.glob("*.dyn"))
+
+
+class TestLoadResults:
+    """Tests for `CoverageTask.load_results()`."""
+
+    @pytest.fixture()
+    def src_dir(self) -> Path:
+        """Create and return a source directory with two source files."""
+        path = Path("src").absolute()
+        path.mkdir()
+        (path / "cable_canopy.F90").write_text("module cable_canopy\n")
+        (path / "cable_soil.F90").write_text("module cable_soil\n")
+        return path
+
+    @pytest.fixture()
+    def coverage_task(self, coverage_task, coverage_dir, src_dir):
+        """Write the DPI file and function coverage of the coverage task."""
+        coverage_task.src_dir = src_dir
+        (coverage_dir / DPI_FILE).write_text("dpi")
+        (coverage_dir / internal.CODECOV_XML_FNAME).write_text(
+            FUNCTION_COVERAGE.format(src_dir=src_dir)
+        )
+        return coverage_task
+
+    def test_results_per_source_file(self, coverage_task, src_dir):
+        """Success case: exercised routines are keyed by relative source path."""
+        results = coverage_task.load_results()
+        assert results == {
+            "cable_canopy.F90": {
+                "hash": file_digest(src_dir / "cable_canopy.F90"),
+                "routines": {"define_canopy": 42},
+            },
+            "cable_soil.F90": {
+                "hash": file_digest(src_dir / "cable_soil.F90"),
+                "routines": {"soil_snow": 7},
+            },
+        }
+
+    def test_results_of_unmodified_files_are_reused(
+        self, coverage_task, coverage_dir, src_dir
+    ):
+        """Success case: only source files whose hash changed are parsed again."""
+        results = coverage_task.load_results()
+        (coverage_dir / internal.CODECOV_XML_FNAME).write_text(
+            FUNCTION_COVERAGE.format(src_dir=src_dir).replace('freq="', 'freq="1')
+        )
+        assert coverage_task.load_results() == results
+        (src_dir / "cable_soil.F90").write_text("module cable_soil ! modified\n")
+        assert coverage_task.load_results() == {
+            "cable_canopy.F90": results["cable_canopy.F90"],
+            "cable_soil.F90": {
+                "hash": file_digest(src_dir / "cable_soil.F90"),
+                "routines": {"soil_snow": 17},
+            },
+        }
+
+    def test_results_of_other_runs_are_not_reused(
+        self, coverage_task, coverage_dir, src_dir
+    ):
+        """Success case: results are parsed again once the DPI file changes."""
+        coverage_task.load_results()
+        (coverage_dir / internal.CODECOV_XML_FNAME).write_text(
+            FUNCTION_COVERAGE.format(src_dir=src_dir).replace('freq="', 'freq="1')
+        )
+        (coverage_dir / DPI_FILE).write_text("dpi of other sites")
+        results = coverage_task.load_results()
+        assert results["cable_canopy.F90"]["routines"] == {
+            "define_canopy": 142,
+            "unused": 10,
+        }
+
+    def test_removed_files_are_dropped(self, coverage_task, coverage_dir):
+        """Success case: source files no longer in the coverage are not reused."""
+        coverage_task.load_results()
+        (coverage_dir / internal.CODECOV_XML_FNAME).write_text("<PROJECT/>")
+        assert coverage_task.load_results() == {}
+
+
+class TestParseFunctionCoverage:
+    """Tests for `parse_function_coverage()`."""
+
+    def test_unexercised_routines_are_omitted(self, tmp_path):
+        """Success case: only routines with a non-zero count are returned."""
+        xml_path = tmp_path / "coverage.xml"
+        xml_path.write_text(FUNCTION_COVERAGE.format(src_dir="/src"))
+        assert parse_function_coverage(xml_path) == {
+            "/src/cable_canopy.F90": {"define_canopy": 42},
+            "/src/cable_soil.F90": {"soil_snow": 7},
+        }
+
+
+class TestGetCoverageDelta:
+    """Tests for `get_coverage_delta()` and `save_coverage_delta()`."""
+
+    @pytest.fixture()
+    def base(self):
+        """Return coverage results of the base realisation."""
+        return {
+            "a.F90": {"hash": "1", "routines": {"foo": 1, "bar": 2}},
+            "b.F90": {"hash": "2", "routines": {"baz": 1}},
+            "c.F90": {"hash": "3", "routines": {"qux": 1}},
+        }
+
+    def test_added_and_removed_routines(self, base):
+        """Success case: routines exercised by one realisation are reported."""
+        other = {
+            "a.F90": {"hash": "4", "routines": {"foo": 3, "new": 1}},
+            "b.F90": {"hash": "2", "routines": {"baz": 5}},
+            "d.F90": {"hash": "5", "routines": {"quux": 1}},
+        }
+        assert get_coverage_delta(base, other) == {
+            "n_added": 2,
+            "n_removed": 2,
+            "files": {
+                "a.F90": {"modified": True, "added": ["new"], "removed": ["bar"]},
+                "c.F90": {"modified": True, "added": [], "removed": ["qux"]},
+                "d.F90": {"modified": True, "added": ["quux"], "removed": []},
+            },
+        }
+
+    def test_identical_results(self, base):
+        """Success case: unchanged source files are skipped."""
+        assert get_coverage_delta(base, base) == {
+            "n_added": 0,
+            "n_removed": 0,
+            "files": {},
+        }
+
+    def test_json_and_html_reports(self, base):
+        """Success case: the delta is written as JSON and HTML."""
+        delta = {
+            "base": "main",
+            "realisation": "feature",
+            **get_coverage_delta(base, {}),
+        }
+        path = Path("delta.json")
+        save_coverage_delta(delta, path)
+        with path.open("r", encoding="utf-8") as file:
+            assert json.load(file) == delta
+        html = path.with_suffix(".html").read_text()
+        assert "feature vs main" in html
+        assert "<td>c.F90</td>" in html
@@ -0,0 +1,125 @@
+"""`pytest` tests for `ensemble.py`.
+
+Note: explicit teardown for generated files and directories are not required as
+the working directory used for testing is cleaned up in the `_run_around_tests`
+pytest autouse fixture.
+"""
+
+import csv
+
+import f90nml
+import numpy as np
+import pytest
+
+from benchcab import internal
+from benchcab.ensemble import (
+    get_member_dir,
+    sample_unit_hypercube,
+    write_member_namelists,
+)
+
+SIZE = 8
+
+
+class TestSampleUnitHypercube:
+    """Tests for `sample_unit_hypercube()`."""
+
+    def test_latin_hypercube_stratification(self):
+        """Success case: each interval of each dimension is sampled once."""
+        samples = sample_unit_hypercube(SIZE, 3, "latin_hypercube", seed=1)
+        assert samples.shape == (SIZE, 3)
+        for column in samples.T:
+            assert sorted(np.floor(column * SIZE)) == list(range(SIZE))
+
+    def test_samples_are_reproducible(self):
+        """Success case: the same seed gives the same samples."""
+        assert np.array_equal(
+            sample_unit_hypercube(SIZE, 2, "random", seed=3),
+            sample_unit_hypercube(SIZE, 2, "random", seed=3),
+        )
+
+
+class TestWriteMemberNamelists:
+    """Tests for `write_member_namelists()`."""
+
+    @pytest.fixture()
+    def ensemble(self):
+        """Return the ensemble settings used for testing."""
+        return {
+            "size": SIZE,
+            "seed": 0,
+            "sampling": "latin_hypercube",
+            "parameters": {
+                internal.CABLE_VEGETATION_NML: {
+                    "cable_pftparm.vegin.hc": {"scale": [0.5, 1.5]},
+                }
+            },
+        }
+
+    @pytest.fixture(autouse=True)
+    def _setup(self):
+        """Write the base namelists."""
+        internal.NAMELIST_DIR.mkdir()
+        f90nml.write(
+            {"cable_pftparm": {"vegin": {"hc": [10.0, 20.0], "xfang": [0.1, 0.0]}}},
+            internal.NAMELIST_DIR / internal.CABLE_VEGETATION_NML,
+        )
+        internal.FLUXSITE_DIRS["ENSEMBLE"].mkdir(parents=True)
+
+    def test_members_are_perturbed(self, ensemble):
+        """Success case: each member scales the base values by its draw."""
+        write_member_namelists(ensemble)
+        with (
+            internal.FLUXSITE_DIRS["ENSEMBLE"] / internal.ENSEMBLE_PARAMETERS_FNAME
+        ).open(encoding="utf-8") as file:
+            rows = list(csv.reader(file))
+        assert rows[0] == [
+            "member",
+            f"{internal.CABLE_VEGETATION_NML}:cable_pftparm.vegin.hc:scale",
+        ]
+        for member, (name, draw) in enumerate(rows[1:]):
+            assert name == f"E{member}"
+            nml = f90nml.read(get_member_dir(member) / internal.CABLE_VEGETATION_NML)
+            vegin = nml["cable_pftparm"]["vegin"]
+            assert vegin["hc"] == pytest.approx(
+                [10.0 * float(draw), 20.0 * float(draw)]
+            )
+            assert vegin["xfang"] == [0.1, 0.0]
+
+    def test_only_perturbed_namelists_are_written(self, ensemble):
+        """Success case: unperturbed namelists are not written for each member."""
+        write_member_namelists(ensemble)
+        assert [path.name for path in get_member_dir(0).iterdir()] == [
+            internal.CABLE_VEGETATION_NML
+        ]
+
+    def test_integer_parameters_are_rounded(self, ensemble):
+        """Success case: perturbed integer parameters are written as integers."""
+        ensemble["parameters"][internal.CABLE_VEGETATION_NML] = {
+            "cable_pftparm.vegin.lai_max": {"offset": [-2.0, 2.0]},
+        }
+        f90nml.write(
+            {"cable_pftparm": {"vegin": {"lai_max": [3, 5]}}},
+            internal.NAMELIST_DIR / internal.CABLE_VEGETATION_NML,
+            force=True,
+        )
+        write_member_namelists(ensemble)
+        for member in range(SIZE):
+            nml = f90nml.read(get_member_dir(member) / internal.CABLE_VEGETATION_NML)
+            values = nml["cable_pftparm"]["vegin"]["lai_max"]
+            assert all(isinstance(value, int) for value in values)
+
+    def test_stale_members_are_deleted(self, ensemble):
+        """Success case: members of a larger ensemble are deleted."""
+        write_member_namelists(ensemble)
+        (get_member_dir(0) / internal.CABLE_SOIL_NML).touch()
+        ensemble["size"] = 2
+        write_member_namelists(ensemble)
+        assert sorted(
+            path.name
+            for path in internal.FLUXSITE_DIRS["ENSEMBLE"].iterdir()
+            if path.is_dir()
+        ) == ["E0", "E1"]
+        assert [path.name for path in get_member_dir(0).iterdir()] == [
+            internal.CABLE_VEGETATION_NML
+        ]
@@ -0,0 +1,90 @@
+"""`pytest` tests for `environment_modules.py`."""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from benchcab.environment_modules import (
+    EnvironmentModulesInterface,
+    apply_environment_diff,
+    get_environment_diff,
+)
+
+
+@pytest.fixture()
+def modules_handler():
+    """Return a mock modules handler which modifies `os.environ` on load."""
+
+    class MockEnvironmentModules(EnvironmentModulesInterface):
+        """A mock implementation of `EnvironmentModulesInterface` used for testing."""
+
+        snapshot_dir = Path("snapshots")
+
+        def __init__(self) -> None:
+            super().__init__()
+            self.commands: list[str] = []
+
+        def module_is_avail(self, *args: str) -> bool:
+            return True
+
+        def module_is_loaded(self, *args: str) -> bool:
+            return False
+
+        def module_load(self, *args: str) -> None:
+            self.commands.append("module load " + " ".join(args))
+            os.environ["PATH"] = "/apps/foo/bin:" + os.environ["PATH"]
+            os.environ["FOO_BASE"] = "/apps/foo"
+
+        def module_unload(self, *args: str) -> None:
+            self.commands.append("module unload " + " ".join(args))
+
+    return MockEnvironmentModules()
+
+
+class TestGetEnvironmentDiff:
+    """Tests for `get_environment_diff()` and `apply_environment_diff()`."""
+
+    def test_diff_is_applied_to_another_environment(self):
+        """Success case: path edits are applied on top of the target environment."""
+        diff = get_environment_diff(
+            {"PATH": "/bin:/usr/bin", "FC": "gfortran", "OLD": "x"},
+            {"PATH": "/apps/foo/bin:/bin:/usr/bin:/apps/foo/lib", "FC": "ifort"},
+        )
+        env = {"PATH": "/usr/local/bin:/bin", "OLD": "y"}
+        apply_environment_diff(diff, env)
+        assert env == {
+            "PATH": "/apps/foo/bin:/usr/local/bin:/bin:/apps/foo/lib",
+            "FC": "ifort",
+        }
+
+
+class TestGetSnapshot:
+    """Tests for `EnvironmentModulesInterface.get_snapshot()`."""
+
+    def test_modules_are_resolved_once(self, modules_handler):
+        """Success case: the modules command is only invoked on first use."""
+        path = os.environ["PATH"]
+        env = modules_handler.get_environment(["foo"])
+        assert env["PATH"] == "/apps/foo/bin:" + path
+        assert env["FOO_BASE"] == "/apps/foo"
+        assert os.environ["PATH"] == path
+        assert "FOO_BASE" not in os.environ
+        with modules_handler.load(["foo"]):
+            assert os.environ["FOO_BASE"] == "/apps/foo"
+        assert "FOO_BASE" not in os.environ
+        assert modules_handler.commands == ["module load foo", "module unload foo"]
+
+    def test_snapshot_is_persisted(self, modules_handler):
+        """Success case: snapshots are reused from the snapshot directory."""
+        modules_handler.get_snapshot(["foo"])
+        modules_handler._snapshots.clear()
+        modules_handler.get_snapshot(["foo"])
+        assert modules_handler.commands == ["module load foo", "module unload foo"]
+
+    def test_snapshots_are_invalidated(self, modules_handler):
+        """Success case: snapshots are resolved again once invalidated."""
+        modules_handler.get_snapshot(["foo"])
+        modules_handler.invalidate_snapshots()
+        modules_handler.get_snapshot(["foo"])
+        assert modules_handler.commands == ["module load foo", "module unload foo"] * 2
@@ -12,12 +12,17 @@ import netCDF4
 import pytest
 
 from benchcab import __version__, internal
+from benchcab.ensemble import get_member_dir
 from benchcab.fluxsite import (
     CableError,
     FluxsiteTask,
+    deduplicate_tasks,
     get_comparison_name,
     get_fluxsite_comparisons,
     get_fluxsite_tasks,
+    load_task_manifest,
+    run_tasks,
+    save_task_manifest,
 )
 from benchcab.model import Model
 from benchcab.utils.repo import Repo
@@ -39,6 +44,9 @@ def mock_repo():  # noqa: D103
         def get_revision(self) -> str:
             return self.revision
 
+        def update(self) -> bool:
+            return False
+
     return MockRepo()
 
 
@@ -120,6 +128,20 @@ class TestFetchFiles:
         assert (task_dir / internal.CABLE_SOIL_NML).exists()
         assert (task_dir / internal.CABLE_EXE).exists()
 
+    def test_perturbed_namelists_are_linked(self, task):
+        """Success case: ensemble members link to their perturbed namelists."""
+        task.ensemble_member = 0
+        member_nml = get_member_dir(0) / internal.CABLE_VEGETATION_NML
+        member_nml.parent.mkdir(parents=True)
+        member_nml.touch()
+        task_dir = internal.FLUXSITE_DIRS["TASKS"] / task.get_task_name()
+        task_dir.mkdir(parents=True)
+        task.fetch_files()
+        assert (task_dir / internal.CABLE_VEGETATION_NML).resolve() == (
+            member_nml.resolve()
+        )
+        assert not (task_dir / internal.CABLE_SOIL_NML).is_symlink()
+
 
 class TestCleanTask:
     """Tests for `FluxsiteTask.clean_task()`."""
@@ -208,6 +230,65 @@ class TestSetupTask:
         }
 
 
+class TestDeduplicateTasks:
+    """Tests for `deduplicate_tasks()`."""
+
+    @pytest.fixture()
+    def tasks(self, mock_repo, mock_subprocess_handler):
+        """Return set up tasks of two realisations sharing an executable."""
+        internal.NAMELIST_DIR.mkdir()
+        (internal.NAMELIST_DIR / internal.CABLE_NML).touch()
+        (internal.NAMELIST_DIR / internal.CABLE_SOIL_NML).touch()
+        (internal.NAMELIST_DIR / internal.CABLE_VEGETATION_NML).touch()
+        internal.FLUXSITE_DIRS["OUTPUT"].mkdir(parents=True)
+        internal.FLUXSITE_DIRS["LOG"].mkdir(parents=True)
+        exe_build_dir = internal.SRC_DIR / "test-branch" / "bin"
+        exe_build_dir.mkdir(parents=True)
+        (exe_build_dir / internal.CABLE_EXE).write_bytes(b"cable")
+
+        _tasks = [
+            FluxsiteTask(
+                model=Model(repo=mock_repo, model_id=model_id),
+                met_forcing_file="forcing-file.nc",
+                sci_conf_id=sci_conf_id,
+                sci_config=sci_config,
+            )
+            for model_id in range(2)
+            for sci_conf_id, sci_config in enumerate(
+                [{"cable": {"some_setting": True}}, {"cable": {"some_setting": False}}]
+            )
+        ]
+        for task in _tasks:
+            task.subprocess_handler = mock_subprocess_handler
+            task.setup_task()
+        return _tasks
+
+    def test_identical_tasks_are_aliased(self, tasks):
+        """Success case: tasks of identical realisations are run once."""
+        assert deduplicate_tasks(tasks) == 2
+        assert [task.alias_of for task in tasks] == [None, None, tasks[0], tasks[1]]
+        output_file = internal.FLUXSITE_DIRS["OUTPUT"] / tasks[2].get_output_filename()
+        assert output_file.readlink().name == tasks[0].get_output_filename()
+
+    def test_aliases_are_not_run(self, tasks, mock_subprocess_handler):
+        """Success case: aliases are done once the task they alias is done."""
+        deduplicate_tasks(tasks)
+        tasks[2].run()
+        assert mock_subprocess_handler.commands == []
+        tasks[0].state.set("done")
+        assert tasks[2].is_done()
+
+    def test_different_executables_are_not_aliased(self, tasks):
+        """Success case: tasks running different executables are all run."""
+        exe_build_dir = internal.SRC_DIR / "other-branch" / "bin"
+        exe_build_dir.mkdir(parents=True)
+        (exe_build_dir / internal.CABLE_EXE).write_bytes(b"other-cable")
+        for task in tasks[2:]:
+            task.model.name = "other-branch"
+            task.setup_task()
+        assert deduplicate_tasks(tasks) == 0
+
+
 class TestRunCable:
     """Tests for `FluxsiteTask.run_cable()`."""
 
@@ -234,6 +315,23 @@ class TestRunCable:
             task.run_cable()
 
 
+class TestRunTasks:
+    """Tests for `run_tasks()`."""
+
+    def test_on_complete_is_called_for_each_task(self, task, model):
+        """Success case: `on_complete` is called once each task has run."""
+        alias = FluxsiteTask(
+            model=model,
+            met_forcing_file="forcing-file.nc",
+            sci_conf_id=1,
+            sci_config={},
+        )
+        alias.alias_of = task
+        completed = []
+        run_tasks([alias, alias], on_complete=completed.append)
+        assert completed == [alias, alias]
+
+
 class TestAddProvenanceInfo:
     """Tests for `FluxsiteTask.add_provenance_info()`."""
 
@@ -321,6 +419,62 @@ class TestGetFluxsiteTasks:
             (models[1], met_forcings[1], science_configurations[1]),
         ]
 
+    def test_tasks_for_each_ensemble_member(
+        self, models, met_forcings, science_configurations
+    ):
+        """Success case: a task is generated for each ensemble member."""
+        tasks = get_fluxsite_tasks(
+            models=models[:1],
+            science_configurations=science_configurations[:1],
+            fluxsite_forcing_file_names=met_forcings[:1],
+            ensemble_size=3,
+        )
+        assert [task.get_task_name() for task in tasks] == [
+            "foo_R0_S0_E0",
+            "foo_R0_S0_E1",
+            "foo_R0_S0_E2",
+        ]
+
+
+class TestTaskManifest:
+    """Tests for `save_task_manifest()` and `load_task_manifest()`."""
+
+    def test_round_trip(self, task, model):
+        """Success case: tasks loaded from the manifest match the saved tasks."""
+        save_task_manifest([task], config_hash="abc")
+        (loaded,) = load_task_manifest([model], config_hash="abc")
+        assert loaded.get_task_name() == task.get_task_name()
+        assert loaded.sci_config == task.sci_config
+        assert loaded.get_fingerprint() == task.get_fingerprint()
+
+    def test_aliases_are_restored(self, task, model):
+        """Success case: aliases refer to the task they alias after loading."""
+        alias = FluxsiteTask(
+            model=model,
+            met_forcing_file="forcing-file.nc",
+            sci_conf_id=1,
+            sci_config=task.sci_config,
+        )
+        alias.alias_of = task
+        save_task_manifest([task, alias], config_hash="abc")
+        loaded, loaded_alias = load_task_manifest([model], config_hash="abc")
+        assert loaded_alias.alias_of is loaded
+
+    def test_stale_manifest_is_ignored(self, task, model):
+        """Failure case: a manifest generated from a different config is ignored."""
+        save_task_manifest([task], config_hash="abc")
+        assert load_task_manifest([model], config_hash="def") is None
+
+    def test_changed_task_inputs(self, task, model):
+        """Failure case: a manifest whose task fingerprints changed is ignored."""
+        save_task_manifest([task], config_hash="abc")
+        model.patch = {"cable": {"cable_user": {"GS_SWITCH": "leuning"}}}
+        assert load_task_manifest([model], config_hash="abc") is None
+
+    def test_missing_manifest(self, model):
+        """Failure case: no manifest has been written."""
+        assert load_task_manifest([model], config_hash="abc") is None
+
 
 class TestGetFluxsiteComparisons:
     """Tests for `get_fluxsite_comparisons()`."""
@@ -381,6 +535,25 @@ class TestGetFluxsiteComparisons:
         assert comparisons[1].task_name == "foo_S0_R0_R2"
         assert comparisons[2].task_name == "foo_S0_R1_R2"
 
+    def test_comparisons_match_ensemble_members(self, mock_repo):
+        """Success case: only tasks of the same ensemble member are compared."""
+        tasks = [
+            FluxsiteTask(
+                model=Model(repo=mock_repo, model_id=model_id),
+                met_forcing_file="foo.nc",
+                sci_config={"foo": "bar"},
+                sci_conf_id=0,
+                ensemble_member=member,
+            )
+            for model_id in range(2)
+            for member in range(2)
+        ]
+        comparisons = get_fluxsite_comparisons(tasks)
+        assert [comparison.task_name for comparison in comparisons] == [
+            "foo_S0_E0_R0_R1",
+            "foo_S0_E1_R0_R1",
+        ]
+
 
 class TestGetComparisonName:
     """Tests for `get_comparison_name()`."""
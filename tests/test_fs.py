@@ -5,13 +5,53 @@ the working directory used for testing is cleaned up in the `_run_around_tests`
 pytest autouse fixture.
 """
 
+import fcntl
+import hashlib
 import logging
 import os
 from pathlib import Path
 
 import pytest
 
-from benchcab.utils.fs import chdir, mkdir, next_path, prepend_path
+from benchcab.utils.fs import (
+    chdir,
+    file_digest,
+    file_lock,
+    mkdir,
+    next_path,
+    prepend_path,
+)
+
+
+class TestFileDigest:
+    """Tests for `file_digest()`."""
+
+    def test_digest_of_file_contents(self):
+        """Success case: digest matches the digest of the file contents."""
+        path = Path("foo.bin")
+        path.write_bytes(b"foo" * 1000)
+        assert (
+            file_digest(path, chunk_size=7) == hashlib.sha1(b"foo" * 1000).hexdigest()
+        )
+
+
+class TestFileLock:
+    """Tests for `file_lock()`."""
+
+    @pytest.mark.parametrize(
+        ("shared", "blocks_shared"), [(False, True), (True, False)]
+    )
+    def test_shared_locks_exclude_exclusive_locks(self, shared, blocks_shared):
+        """Success case: shared locks only exclude exclusive locks."""
+        lock_path = Path("locks") / "foo.lock"
+        with file_lock(lock_path, shared=shared), lock_path.open() as file:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if blocks_shared:
+                with pytest.raises(BlockingIOError):
+                    fcntl.flock(file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            else:
+                fcntl.flock(file, fcntl.LOCK_SH | fcntl.LOCK_NB)
 
 
 class TestNextPath:
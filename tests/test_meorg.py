@@ -0,0 +1,436 @@
+"""`pytest` tests for `utils/meorg.py`.
+
+Uploads are tested against a local stand-in for the modelevaluation.org API.
+
+Note: explicit teardown for generated files and directories are not required as
+the working directory used for testing is cleaned up in the `_run_around_tests`
+pytest autouse fixture.
+"""
+
+import itertools
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import netCDF4
+import numpy as np
+import pytest
+
+from benchcab.utils.meorg import (
+    UploadConcurrency,
+    get_client,
+    get_slim_output_files,
+    get_upload_job_mem,
+    load_upload_manifest,
+    slim_output_file,
+    slim_output_files,
+    start_analyses,
+    sync_files,
+    wait_for_files,
+)
+
+MODEL_OUTPUT_ID = "mo1"
+OUTPUT_NAMES = ["a", "b", "c"]
+
+
+class MeorgServer(ThreadingHTTPServer):
+    """A stand-in for the modelevaluation.org API storing files in memory."""
+
+    def __init__(self):
+        """Listen on a free local port."""
+        super().__init__(("127.0.0.1", 0), MeorgRequestHandler)
+        self.files: dict[str, dict[str, str]] = {MODEL_OUTPUT_ID: {}}
+        self.uploads: list[str] = []
+        self.ids = (f"f{i}" for i in itertools.count())
+        self.lock = threading.Lock()
+        self.drop_uploads = False
+        # Number of uploads rejected with a server error
+        self.fail_uploads = 0
+        # Number of status polls for which each file is still being transferred
+        self.pending_polls: dict[str, int] = {}
+        self.benchmarks: dict[tuple[str, str], list[str]] = {}
+        self.analyses: list[tuple[str, str]] = []
+
+    @property
+    def port(self) -> int:
+        """Port the server listens on."""
+        return self.server_address[1]
+
+
+class MeorgRequestHandler(BaseHTTPRequestHandler):
+    """Handles the login, file, benchmark and analysis endpoints."""
+
+    server: MeorgServer
+
+    def log_message(self, *args):
+        """Silence the request log."""
+
+    def _respond(self, data: dict, status: int = 200):
+        """Send `data` as the JSON response body."""
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _files(self) -> dict[str, str]:
+        """Return the files of the model output in the request path."""
+        return self.server.files[self.path.split("/")[2]]
+
+    def _file_status(self, file_id: str):
+        """Respond with the transfer status of a file."""
+        if not any(file_id in files for files in self.server.files.values()):
+            self._respond({"status": "error"}, status=404)
+            return
+        polls = self.server.pending_polls.get(file_id, 0)
+        self.server.pending_polls[file_id] = max(polls - 1, 0)
+        self._respond({"data": {"status": "pending" if polls else "complete"}})
+
+    def do_GET(self):  # noqa: N802
+        """Handle the file status and file list endpoints."""
+        if self.path.startswith("/files/status/"):
+            self._file_status(self.path.split("/")[-1])
+            return
+        self._respond(
+            {
+                "data": {
+                    "files": [
+                        {"id": file_id, "name": name}
+                        for file_id, name in self._files().items()
+                    ]
+                }
+            }
+        )
+
+    def do_POST(self):  # noqa: N802
+        """Handle the login and file upload endpoints."""
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/login":
+            self._respond({"data": {"userId": "user", "authToken": "token"}})
+            return
+        name = re.search(rb'filename="([^"]+)"', body).group(1).decode()
+        with self.server.lock:
+            if self.server.fail_uploads:
+                self.server.fail_uploads -= 1
+                self._respond({"status": "error"}, status=500)
+                return
+            file_id = next(self.server.ids)
+        self.server.uploads.append(name)
+        if not self.server.drop_uploads:
+            self._files()[file_id] = name
+        self._respond({"data": {"files": [{"id": file_id}]}})
+
+    def do_PATCH(self):  # noqa: N802
+        """Handle the benchmark endpoint."""
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        _, _, model_output_id, experiment_id, _ = self.path.split("/")
+        self.server.benchmarks[(model_output_id, experiment_id)] = body["benchmarks"]
+        self._respond({})
+
+    def do_PUT(self):  # noqa: N802
+        """Handle the analysis start endpoint."""
+        _, _, model_output_id, experiment_id, _ = self.path.split("/")
+        self.server.analyses.append((model_output_id, experiment_id))
+        self._respond({"data": {"analysisId": f"a{len(self.server.analyses)}"}})
+
+    def do_DELETE(self):  # noqa: N802
+        """Handle the file delete endpoint."""
+        del self._files()[self.path.split("/")[-1]]
+        self._respond({})
+
+
+@pytest.fixture()
+def server(monkeypatch, tmp_path):
+    """Run the stand-in server and point the client at it."""
+    _server = MeorgServer()
+    thread = threading.Thread(
+        target=_server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("MEORG_DEV_MODE", "1")
+    monkeypatch.setenv("MEORG_BASE_URL_DEV", f"http://127.0.0.1:{_server.port}")
+    monkeypatch.setenv("MEORG_EMAIL", "user@example.com")
+    monkeypatch.setenv("MEORG_PASSWORD", "password")
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    yield _server
+    _server.shutdown()
+    _server.server_close()
+
+
+@pytest.fixture()
+def data_dir() -> Path:
+    """Create and return a directory of model outputs."""
+    path = Path("outputs")
+    path.mkdir()
+    for name in OUTPUT_NAMES:
+        (path / f"{name}.nc").write_text(name)
+    return path
+
+
+@pytest.fixture()
+def sync(server, data_dir):
+    """Return a function synchronising the model outputs with the server."""
+    manifest_path = Path("manifest.json")
+
+    def _sync(**kwargs):
+        return sync_files(
+            get_client(),
+            MODEL_OUTPUT_ID,
+            sorted(data_dir.glob("*.nc")),
+            manifest_path=manifest_path,
+            **kwargs,
+        )
+
+    return _sync
+
+
+class TestSyncFiles:
+    """Tests for `sync_files()`."""
+
+    def test_only_changes_are_transferred(self, server, data_dir, sync):
+        """Success case: only new and changed files are uploaded."""
+        assert sync() == {"uploaded": 3, "deleted": 0, "unchanged": 0}
+        assert sync() == {"uploaded": 0, "deleted": 0, "unchanged": 3}
+
+        (data_dir / "a.nc").write_text("changed")
+        (data_dir / "c.nc").unlink()
+        (data_dir / "d.nc").write_text("d")
+        server.uploads.clear()
+        assert sync() == {"uploaded": 2, "deleted": 2, "unchanged": 1}
+        assert server.uploads == ["a.nc", "d.nc"]
+        assert sorted(server.files[MODEL_OUTPUT_ID].values()) == [
+            "a.nc",
+            "b.nc",
+            "d.nc",
+        ]
+
+    def test_modification_time_without_content_change(self, data_dir, sync):
+        """Success case: files rewritten with the same contents are not uploaded."""
+        sync()
+        (data_dir / "b.nc").write_text("b")
+        assert sync() == {"uploaded": 0, "deleted": 0, "unchanged": 3}
+
+    def test_untracked_remote_files_are_deleted(self, server, sync):
+        """Success case: remote files missing from the manifest are replaced."""
+        server.files[MODEL_OUTPUT_ID]["old"] = "a.nc"
+        assert sync() == {"uploaded": 3, "deleted": 1, "unchanged": 0}
+        assert "old" not in server.files[MODEL_OUTPUT_ID]
+
+    def test_upload_resumes_after_remote_deletion(self, server, sync):
+        """Success case: files deleted on the server are uploaded again."""
+        sync()
+        server.files[MODEL_OUTPUT_ID].clear()
+        assert sync() == {"uploaded": 3, "deleted": 0, "unchanged": 0}
+
+    def test_unverified_uploads_are_retried(self, server, sync):
+        """Failure case: uploads missing on the server are not recorded."""
+        server.drop_uploads = True
+        with pytest.raises(RuntimeError, match="a.nc, b.nc, c.nc"):
+            sync()
+        assert load_upload_manifest(Path("manifest.json")) == {}
+        server.drop_uploads = False
+        assert sync()["uploaded"] == len(OUTPUT_NAMES)
+
+    def test_concurrent_uploads(self, server, data_dir, sync):
+        """Success case: files are uploaded concurrently."""
+        for i in range(10):
+            (data_dir / f"x{i}.nc").write_text(str(i))
+        n_files = len(list(data_dir.glob("*.nc")))
+        assert sync(max_workers=4) == {
+            "uploaded": n_files,
+            "deleted": 0,
+            "unchanged": 0,
+        }
+        assert len(server.files[MODEL_OUTPUT_ID]) == n_files
+        manifest = load_upload_manifest(Path("manifest.json"))
+        assert {entry["file_id"] for entry in manifest.values()} == set(
+            server.files[MODEL_OUTPUT_ID]
+        )
+
+    def test_failed_uploads_are_retried(self, server, sync):
+        """Success case: uploads rejected by the server are retried."""
+        server.fail_uploads = 2
+        assert sync(max_workers=2, retry_delay=0)["uploaded"] == len(OUTPUT_NAMES)
+        assert server.fail_uploads == 0
+
+    def test_retries_are_bounded(self, server, sync):
+        """Failure case: files failing all retries are reported."""
+        server.fail_uploads = 3
+        with pytest.raises(RuntimeError, match="Failed to upload files a.nc"):
+            sync(retries=2, retry_delay=0)
+        assert sorted(load_upload_manifest(Path("manifest.json"))) == ["b.nc", "c.nc"]
+        assert sync()["uploaded"] == 1
+
+
+class TestUploadConcurrency:
+    """Tests for `UploadConcurrency`."""
+
+    @pytest.fixture()
+    def clock(self):
+        """Return a fake clock advanced by the tests."""
+
+        class Clock:
+            now = 0.0
+
+            def __call__(self):
+                return self.now
+
+        return Clock()
+
+    def test_limit_adapts_to_throughput(self, clock):
+        """Success case: concurrency grows while the throughput holds up."""
+        concurrency = UploadConcurrency(max_workers=3, clock=clock)
+        for limit, elapsed in [(1, 1.0), (2, 1.0), (3, 1.5), (3, 4.0)]:
+            assert concurrency.limit == limit
+            for _ in range(limit):
+                clock.now += elapsed / limit
+                concurrency.record_success(100)
+        # 300 bytes in 4 sec is slower than 200 bytes in 1 sec
+        assert concurrency.limit == limit - 1
+
+    def test_limit_is_halved_on_failure(self, clock):
+        """Failure case: concurrency is halved after a failed upload."""
+        concurrency = UploadConcurrency(max_workers=8, clock=clock)
+        concurrency.limit = limit = 6
+        concurrency.record_failure()
+        assert concurrency.limit == limit // 2
+        concurrency.record_failure()
+        concurrency.record_failure()
+        assert concurrency.limit == 1
+
+
+def test_upload_job_mem():
+    """Success case: the upload job memory grows with the concurrent uploads."""
+    assert get_upload_job_mem(1) == "5GB"
+    assert get_upload_job_mem(8) == "12GB"
+
+
+class TestWaitForFiles:
+    """Tests for `wait_for_files()`."""
+
+    @pytest.fixture()
+    def file_ids(self, server, sync) -> set[str]:
+        """Upload the model outputs and return their ids."""
+        sync()
+        return set(server.files[MODEL_OUTPUT_ID])
+
+    def test_wait_until_files_are_complete(self, server, file_ids):
+        """Success case: files are polled until they are transferred."""
+        server.pending_polls = {file_id: 3 for file_id in file_ids}
+        pending = wait_for_files(
+            get_client(), file_ids, max_wait=10, interval=0.01, max_interval=0.02
+        )
+        assert pending == set()
+        assert all(polls == 0 for polls in server.pending_polls.values())
+
+    def test_wait_is_bounded(self, server, file_ids):
+        """Failure case: files not transferred after `max_wait` are returned."""
+        server.pending_polls = {file_id: 10**6 for file_id in file_ids}
+        server.pending_polls.pop("f0")
+        pending = wait_for_files(
+            get_client(), file_ids | {"unknown"}, max_wait=0.1, interval=0.01
+        )
+        assert pending == {"f1", "f2", "unknown"}
+
+
+class TestStartAnalyses:
+    """Tests for `start_analyses()`."""
+
+    def test_benchmarks_are_set_before_analysis(self, server):
+        """Success case: an analysis is started for each experiment."""
+        analysis_ids = start_analyses(
+            get_client(), MODEL_OUTPUT_ID, ["e1", "e2"], ["b1", "b2"]
+        )
+        assert analysis_ids == ["a1", "a2"]
+        assert server.analyses == [(MODEL_OUTPUT_ID, "e1"), (MODEL_OUTPUT_ID, "e2")]
+        assert server.benchmarks[(MODEL_OUTPUT_ID, "e2")] == ["b1", "b2"]
+
+
+def write_output_file(path: Path):
+    """Write a small fluxsite output file to `path`."""
+    with netCDF4.Dataset(path, "w") as nc:
+        nc.setncattr("Output_averaging", "all timesteps recorded")
+        nc.createDimension("time", None)
+        nc.createDimension("x", 1)
+        nc.createDimension("y", 1)
+        time = nc.createVariable("time", "f8", ("time",))
+        time.units = "seconds since 2000-01-01 00:00:00"
+        time[:] = np.arange(48) * 1800.0
+        nc.createVariable("latitude", "f4", ("y", "x"))[:] = -35.0
+        nc.createVariable("iveg", "i4", ("y", "x"))[:] = 2
+        for name in ["Qle", "Tair"]:
+            var = nc.createVariable(name, "f4", ("time", "y", "x"), fill_value=-1e33)
+            var.units = "W/m^2"
+            var[:] = np.arange(48, dtype="f4").reshape((48, 1, 1))
+        nc.variables["Qle"][0] = np.ma.masked
+
+
+class TestSlimOutputFile:
+    """Tests for `slim_output_file()`."""
+
+    def test_variables_are_slimmed_and_compressed(self):
+        """Success case: only analysed variables and coordinates are kept."""
+        write_output_file(Path("a.nc"))
+        slim_output_file(Path("a.nc"), Path("slim.nc"), time_chunk=16)
+        with netCDF4.Dataset("a.nc") as src, netCDF4.Dataset("slim.nc") as dst:
+            assert list(dst.variables) == ["time", "latitude", "Qle"]
+            assert dst.dimensions["time"].isunlimited()
+            assert dst.getncattr("Output_averaging") == "all timesteps recorded"
+            qle = dst.variables["Qle"]
+            assert qle.filters()["zlib"]
+            assert qle.filters()["shuffle"]
+            assert qle.chunking() == [16, 1, 1]
+            assert qle.units == "W/m^2"
+            assert qle[0].mask.all()
+            np.testing.assert_array_equal(qle[:], src.variables["Qle"][:])
+            np.testing.assert_array_equal(
+                dst.variables["time"][:], src.variables["time"][:]
+            )
+        assert not Path(".slim.nc.tmp").exists()
+
+
+class TestGetSlimOutputFiles:
+    """Tests for `get_slim_output_files()`."""
+
+    def test_only_changed_outputs_are_slimmed(self):
+        """Success case: up to date copies are kept and stale copies deleted."""
+        src_dir, dst_dir = Path("outputs"), Path("meorg")
+        src_dir.mkdir()
+        for name in ["a.nc", "b.nc"]:
+            write_output_file(src_dir / name)
+        files = get_slim_output_files(src_dir, dst_dir, ["a.nc", "b.nc"])
+        assert files == [
+            (src_dir / "a.nc", dst_dir / "a.nc"),
+            (src_dir / "b.nc", dst_dir / "b.nc"),
+        ]
+        slim_output_files(files)
+        assert get_slim_output_files(src_dir, dst_dir, ["a.nc", "b.nc"]) == []
+
+        mtime_ns = (dst_dir / "a.nc").stat().st_mtime_ns
+        os.utime(src_dir / "a.nc", ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+        (src_dir / "b.nc").unlink()
+        assert get_slim_output_files(src_dir, dst_dir, ["a.nc", "b.nc"]) == [
+            (src_dir / "a.nc", dst_dir / "a.nc")
+        ]
+        assert not (dst_dir / "b.nc").exists()
+
+    def test_links_and_unlisted_outputs_are_skipped(self):
+        """Success case: outputs of aliases and failed tasks are not slimmed."""
+        src_dir, dst_dir = Path("outputs"), Path("meorg")
+        src_dir.mkdir()
+        write_output_file(src_dir / "a.nc")
+        write_output_file(src_dir / "failed.nc")
+        (src_dir / "alias.nc").symlink_to("a.nc")
+        (src_dir / "dangling.nc").symlink_to("missing.nc")
+        dst_dir.mkdir()
+        write_output_file(dst_dir / "failed.nc")
+        files = get_slim_output_files(
+            src_dir, dst_dir, ["a.nc", "alias.nc", "dangling.nc", "missing.nc"]
+        )
+        assert files == [(src_dir / "a.nc", dst_dir / "a.nc")]
+        assert not (dst_dir / "failed.nc").exists()
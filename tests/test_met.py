@@ -0,0 +1,105 @@
+"""`pytest` tests for `utils/met.py`.
+
+Note: explicit teardown for generated files and directories are not required as
+the working directory used for testing is cleaned up in the `_run_around_tests`
+pytest autouse fixture.
+"""
+
+import os
+from pathlib import Path
+
+import netCDF4
+import pytest
+
+from benchcab.utils.met import (
+    MetForcingError,
+    find_site_file_name,
+    get_met_forcing_catalog,
+    get_met_forcing_file_names,
+)
+
+CACHE_DIR = Path("cache")
+
+
+@pytest.fixture()
+def met_dir() -> Path:
+    """Return a met forcing directory containing two sites."""
+    _met_dir = Path("met")
+    _met_dir.mkdir()
+    with netCDF4.Dataset(_met_dir / "AU-Tum_2002-2017_OzFlux_Met.nc", "w") as nc:
+        nc.createDimension("time", None)
+        time = nc.createVariable("time", "f8", ("time",))
+        time.units = "seconds since 2002-01-01 00:00:00"
+        time[:] = [0.0, 1800.0, 3600.0]
+    (_met_dir / "AU-How_2003-2017_OzFlux_Met.nc").touch()
+    return _met_dir
+
+
+class TestGetMetForcingCatalog:
+    """Tests for `get_met_forcing_catalog()`."""
+
+    def test_catalog_contents(self, met_dir):
+        """Success case: record the size and time axis of each file."""
+        catalog = get_met_forcing_catalog(met_dir, CACHE_DIR)
+        assert catalog["AU-Tum_2002-2017_OzFlux_Met.nc"]["n_timesteps"] == 3
+        assert catalog["AU-Tum_2002-2017_OzFlux_Met.nc"]["timestep"] == 1800.0
+        assert catalog["AU-How_2003-2017_OzFlux_Met.nc"] == {
+            "size": 0,
+            "mtime": (met_dir / "AU-How_2003-2017_OzFlux_Met.nc").stat().st_mtime_ns,
+            "n_timesteps": None,
+            "timestep": None,
+        }
+
+    def test_cached_catalog_is_reused(self, met_dir):
+        """Success case: reuse the cached catalog if the directory is unchanged."""
+        get_met_forcing_catalog(met_dir, CACHE_DIR)
+        stat = met_dir.stat()
+        (met_dir / "FI-Hyy_1996-2014_FLUXNET2015_Met.nc").touch()
+        os.utime(met_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        catalog = get_met_forcing_catalog(met_dir, CACHE_DIR)
+        assert "FI-Hyy_1996-2014_FLUXNET2015_Met.nc" not in catalog
+
+    def test_catalog_is_invalidated(self, met_dir):
+        """Success case: rebuild the catalog when the directory is modified."""
+        get_met_forcing_catalog(met_dir, CACHE_DIR)
+        stat = met_dir.stat()
+        (met_dir / "FI-Hyy_1996-2014_FLUXNET2015_Met.nc").touch()
+        os.utime(met_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        catalog = get_met_forcing_catalog(met_dir, CACHE_DIR)
+        assert "FI-Hyy_1996-2014_FLUXNET2015_Met.nc" in catalog
+
+
+class TestFindSiteFileName:
+    """Tests for `find_site_file_name()`."""
+
+    @pytest.mark.parametrize(
+        ("site_id", "msg"),
+        [
+            ("US-Var", "Failed to infer met file for site id 'US-Var'."),
+            ("AU", "Multiple paths infered for site id: 'AU'."),
+        ],
+    )
+    def test_site_id_is_not_unique(self, met_dir, site_id, msg):
+        """Failure case: raise an error if a site id does not map to one file."""
+        catalog = get_met_forcing_catalog(met_dir, CACHE_DIR)
+        with pytest.raises(MetForcingError, match=msg):
+            find_site_file_name(site_id, catalog)
+
+
+class TestGetMetForcingFileNames:
+    """Tests for `get_met_forcing_file_names()`."""
+
+    def test_single_site_experiment(self, met_dir):
+        """Success case: a site id experiment maps to a single file."""
+        assert get_met_forcing_file_names(
+            "AU-Tum", met_dir=met_dir, cache_dir=CACHE_DIR
+        ) == ["AU-Tum_2002-2017_OzFlux_Met.nc"]
+
+    def test_user_defined_sites(self, met_dir):
+        """Success case: user defined sites override the experiment sites."""
+        assert get_met_forcing_file_names(
+            "forty-two-site-test",
+            met_dir=met_dir,
+            sites=["AU-How", "AU-Tum"],
+            cache_dir=CACHE_DIR,
+        ) == ["AU-How_2003-2017_OzFlux_Met.nc", "AU-Tum_2002-2017_OzFlux_Met.nc"]
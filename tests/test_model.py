@@ -5,6 +5,7 @@ the working directory used for testing is cleaned up in the `_run_around_tests`
 pytest autouse fixture.
 """
 
+import json
 import re
 from pathlib import Path
 
@@ -36,6 +37,9 @@ def mock_repo():
         def get_revision(self, path: Path) -> str:
             pass
 
+        def update(self) -> bool:
+            return False
+
     return MockRepo()
 
 
@@ -87,6 +91,39 @@ class TestGetExePath:
         )
 
 
+class TestProvenance:
+    """Tests for `Model.save_provenance()` and `Model.get_provenance()`."""
+
+    @pytest.fixture()
+    def provenance(self):
+        """Return provenance information for the mock repository."""
+        return {"branch": "trunk", "revision": "1234", "url": None, "dirty": None}
+
+    @pytest.fixture()
+    def model(self, mock_repo, provenance):
+        """Return a `Model` whose repository records provenance queries."""
+        mock_repo.n_queries = 0
+
+        def get_provenance():
+            mock_repo.n_queries += 1
+            return provenance
+
+        mock_repo.get_provenance = get_provenance
+        return Model(repo=mock_repo, model_id=TEST_MODEL_ID)
+
+    def test_snapshot_is_persisted(self, model, provenance):
+        """Success case: the provenance snapshot is written to the state directory."""
+        model.save_provenance()
+        assert json.loads(model.get_provenance_path().read_text()) == provenance
+
+    def test_snapshot_is_reused(self, model, mock_repo, provenance):
+        """Success case: the repository is only queried once across instances."""
+        model.save_provenance()
+        other = Model(repo=mock_repo, model_id=TEST_MODEL_ID)
+        assert other.get_provenance() == provenance
+        assert mock_repo.n_queries == 1
+
+
 class TestGetBuildFlags:
     """Tests for `Model.get_build_flags()`."""
 
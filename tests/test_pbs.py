@@ -1,8 +1,17 @@
 """`pytest` tests for `utils/pbs.py`."""
 
+import json
+from pathlib import Path
+
 from benchcab import internal
 from benchcab.utils import load_package_data
-from benchcab.utils.pbs import render_job_script
+from benchcab.utils.pbs import (
+    JobThrottle,
+    get_job_states,
+    parse_job_ids,
+    render_job_script,
+    render_pack_job_script,
+)
 
 
 class TestRenderJobScript:
@@ -46,3 +55,78 @@ class TestRenderJobScript:
             skip_codecov=False,
             benchcab_path="/absolute/path/to/benchcab",
         ) == load_package_data("test/pbs_jobscript_no_skip_codecov.sh")
+
+
+class TestRenderPackJobScript:
+    """Tests for `render_pack_job_script()`."""
+
+    def test_cpus_are_split_between_tasks(self):
+        """Success case: each task runs payu-run on its share of the nodes."""
+        assert render_pack_job_script(
+            project="tm70",
+            pbs_config=internal.SPATIAL_DEFAULT_PACK_PBS
+            | {"ncpus": 96, "queue": "normalsr"},
+            modules=["intel-compiler/2021.1.1", "openmpi/4.1.0"],
+            task_dirs=[Path("/path/to/tasks/task_a"), Path("/path/to/tasks/task_b")],
+            payu_path=Path("/path/to/bin"),
+            stdout_fname="payu-run.out",
+        ) == load_package_data("test/spatial_pack_jobscript.sh")
+
+
+class TestParseJobIds:
+    """Tests for `parse_job_ids()`."""
+
+    def test_job_ids_printed_by_qsub(self):
+        """Success case: only lines consisting of a job id are parsed."""
+        output = "Loading input manifest\nqsub -q normal run.sh\n123456.gadi-pbs\n"
+        assert parse_job_ids(output) == ["123456.gadi-pbs"]
+
+
+class TestGetJobStates:
+    """Tests for `get_job_states()`."""
+
+    def test_job_states(self, mock_subprocess_handler):
+        """Success case: job states are read from the qstat JSON output."""
+        mock_subprocess_handler.stdout = json.dumps(
+            {"Jobs": {"1.gadi-pbs": {"job_state": "R"}}}
+        )
+        assert get_job_states(["1.gadi-pbs"], mock_subprocess_handler) == {
+            "1.gadi-pbs": "R"
+        }
+        assert mock_subprocess_handler.commands == ["qstat -x -f -F json 1.gadi-pbs"]
+
+    def test_no_jobs(self, mock_subprocess_handler):
+        """Success case: PBS is not queried without jobs."""
+        assert get_job_states([], mock_subprocess_handler) == {}
+        assert mock_subprocess_handler.commands == []
+
+
+class TestJobThrottle:
+    """Tests for `JobThrottle`."""
+
+    def test_finished_jobs_release_capacity(self, mock_subprocess_handler):
+        """Success case: PBS is polled once the cap is reached."""
+        throttle = JobThrottle(max_jobs=2, poll_interval=0)
+        throttle.subprocess_handler = mock_subprocess_handler
+        mock_subprocess_handler.stdout = json.dumps(
+            {
+                "Jobs": {
+                    "1.gadi-pbs": {"job_state": "F"},
+                    "2.gadi-pbs": {"job_state": "Q"},
+                }
+            }
+        )
+        for job_id in ["1.gadi-pbs", "2.gadi-pbs", "3.gadi-pbs"]:
+            with throttle.reserve() as job_ids:
+                job_ids.append(job_id)
+        assert throttle.job_ids == {"2.gadi-pbs", "3.gadi-pbs"}
+        assert len(mock_subprocess_handler.commands) == 1
+
+    def test_no_cap(self, mock_subprocess_handler):
+        """Success case: PBS is never polled without a cap."""
+        throttle = JobThrottle(max_jobs=None, poll_interval=0)
+        throttle.subprocess_handler = mock_subprocess_handler
+        for job_id in ["1.gadi-pbs", "2.gadi-pbs"]:
+            with throttle.reserve() as job_ids:
+                job_ids.append(job_id)
+        assert mock_subprocess_handler.commands == []
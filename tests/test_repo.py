@@ -0,0 +1,192 @@
+"""`pytest` tests for `utils/repo.py`.
+
+Note: explicit teardown for generated files and directories are not required as
+the working directory used for testing is cleaned up in the `_run_around_tests`
+pytest autouse fixture.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from benchcab import internal
+from benchcab.utils.repo import GitRepo, SVNRepo, get_mirror_name
+
+MIRROR_DIR = Path("mirrors")
+
+
+@pytest.fixture()
+def git_repo(mock_subprocess_handler):
+    """Return a `GitRepo` instance that uses a reference mirror."""
+    _repo = GitRepo(
+        url="https://github.com/CABLE-LSM/CABLE.git",
+        branch="main",
+        realisation_path=Path("src", "main"),
+        mirror_dir=MIRROR_DIR,
+    )
+    _repo.subprocess_handler = mock_subprocess_handler
+    return _repo
+
+
+@pytest.fixture()
+def svn_repo(mock_subprocess_handler):
+    """Return an `SVNRepo` instance that uses a mirrored working copy."""
+    _repo = SVNRepo(
+        svn_root=internal.CABLE_SVN_ROOT,
+        branch_path="trunk",
+        realisation_path=Path("src", "trunk"),
+        revision=9000,
+        mirror_dir=MIRROR_DIR,
+    )
+    _repo.subprocess_handler = mock_subprocess_handler
+    return _repo
+
+
+class TestGetMirrorName:
+    """Tests for `get_mirror_name()`."""
+
+    def test_mirror_name_is_readable_and_unique(self):
+        """Success case: mirror names keep the basename and differ per source."""
+        name_a = get_mirror_name("https://github.com/CABLE-LSM/CABLE.git")
+        name_b = get_mirror_name("https://github.com/foo/CABLE.git")
+        assert name_a.startswith("CABLE-")
+        assert name_a != name_b
+
+
+class TestGitRepoMirror:
+    """Tests for `GitRepo.checkout()` with a reference mirror."""
+
+    def test_mirror_is_created(self, git_repo, mock_subprocess_handler):
+        """Success case: create the mirror and clone with it as a reference."""
+        mirror_path = git_repo.update_mirror()
+        assert mock_subprocess_handler.commands == [
+            f"git clone --mirror -- {git_repo.url} {mirror_path}"
+        ]
+
+    def test_mirror_is_updated(self, git_repo, mock_subprocess_handler):
+        """Success case: fetch into an existing mirror."""
+        mirror_path = MIRROR_DIR / "git" / f"{get_mirror_name(git_repo.url)}.git"
+        mirror_path.mkdir(parents=True)
+        (mirror_path / "HEAD").touch()
+        git_repo.update_mirror()
+        assert mock_subprocess_handler.commands == [
+            f"git --git-dir={mirror_path} remote update --prune"
+        ]
+
+    def test_clone_uses_reference(self, git_repo, mock_subprocess_handler):
+        """Success case: clone with `--reference` and `--dissociate`."""
+        git_repo.get_revision = lambda: "commit abc"
+        git_repo.checkout()
+        mirror_path = MIRROR_DIR / "git" / f"{get_mirror_name(git_repo.url)}.git"
+        assert mock_subprocess_handler.commands[-1] == (
+            f"git clone --branch main --reference {mirror_path} --dissociate "
+            f"-- {git_repo.url} {git_repo.realisation_path}"
+        )
+
+
+class TestSVNRepoMirror:
+    """Tests for `SVNRepo.checkout()` with a mirrored working copy."""
+
+    def test_mirror_is_created(self, svn_repo, mock_subprocess_handler):
+        """Success case: check out the mirrored working copy at the revision."""
+        mirror_path = svn_repo.update_mirror()
+        assert mock_subprocess_handler.commands == [
+            f"svn checkout -r 9000 {internal.CABLE_SVN_ROOT}/trunk {mirror_path}"
+        ]
+
+    def test_mirror_is_copied(self, svn_repo, mock_subprocess_handler):
+        """Success case: update the mirrored working copy and copy it."""
+        mirror_path = MIRROR_DIR / "svn" / get_mirror_name("trunk@9000")
+        (mirror_path / ".svn").mkdir(parents=True)
+        svn_repo.checkout()
+        assert (
+            mock_subprocess_handler.commands[0] == f"svn update -r 9000 {mirror_path}"
+        )
+        assert (svn_repo.realisation_path / ".svn").is_dir()
+
+
+class TestGitRepoSlim:
+    """Tests for `GitRepo.checkout()` with a slim checkout."""
+
+    @pytest.fixture()
+    def slim_repo(self, mock_subprocess_handler):
+        """Return a `GitRepo` instance that uses a slim checkout."""
+        _repo = GitRepo(
+            url="https://github.com/CABLE-LSM/CABLE.git",
+            branch="main",
+            realisation_path=Path("src", "main"),
+            slim=True,
+        )
+        _repo.subprocess_handler = mock_subprocess_handler
+        _repo.get_revision = lambda: "commit abc"
+        return _repo
+
+    def test_shallow_sparse_clone(self, slim_repo, mock_subprocess_handler):
+        """Success case: shallow clone restricted to the offline build sources."""
+        slim_repo.checkout()
+        path = slim_repo.realisation_path
+        assert mock_subprocess_handler.commands == [
+            "git clone --branch main --depth 1 --filter=blob:none --sparse "
+            f"-- {slim_repo.url} {path}",
+            f"git -C {path} sparse-checkout set --cone "
+            + " ".join(internal.SPARSE_CHECKOUT_DIRS),
+        ]
+
+
+class TestGitRepoUpdate:
+    """Tests for `GitRepo.update()`."""
+
+    @pytest.fixture()
+    def repo(self, mock_subprocess_handler):
+        """Return a `GitRepo` instance pinned to a commit."""
+        _repo = GitRepo(
+            url="https://github.com/CABLE-LSM/CABLE.git",
+            branch="main",
+            realisation_path=Path("src", "main"),
+            commit="abc123",
+        )
+        _repo.subprocess_handler = mock_subprocess_handler
+        return _repo
+
+    def test_fetch_and_checkout_commit(self, repo, mock_subprocess_handler):
+        """Success case: fetch the branch and move it to the requested commit."""
+        path = repo.realisation_path
+        assert not repo.update()
+        assert mock_subprocess_handler.commands == [
+            f"git -C {path} rev-parse HEAD",
+            f"git -C {path} fetch origin main",
+            f"git -C {path} checkout -B main abc123",
+            f"git -C {path} rev-parse HEAD",
+        ]
+
+    def test_detects_change(self, repo, mock_subprocess_handler):
+        """Success case: report a change when HEAD moves."""
+        heads = iter(["abc000", "abc123"])
+        run_cmd = mock_subprocess_handler.run_cmd
+
+        def mock_run_cmd(cmd, **kwargs):
+            if cmd.endswith("rev-parse HEAD"):
+                mock_subprocess_handler.stdout = next(heads)
+            return run_cmd(cmd, **kwargs)
+
+        mock_subprocess_handler.run_cmd = mock_run_cmd
+        assert repo.update()
+
+
+class TestSVNRepoUpdate:
+    """Tests for `SVNRepo.update()`."""
+
+    def test_switch_to_revision(self, mock_subprocess_handler):
+        """Success case: switch the working copy to the requested revision."""
+        repo = SVNRepo(
+            svn_root=internal.CABLE_SVN_ROOT,
+            branch_path="trunk",
+            realisation_path=Path("src", "trunk"),
+            revision=9000,
+        )
+        repo.subprocess_handler = mock_subprocess_handler
+        assert not repo.update()
+        assert (
+            f"svn switch -r 9000 {internal.CABLE_SVN_ROOT}/trunk src/trunk"
+            in mock_subprocess_handler.commands
+        )
@@ -0,0 +1,162 @@
+"""`pytest` tests for `scaling.py`.
+
+Note: explicit teardown for generated files and directories are not required as
+the working directory used for testing is cleaned up in the `_run_around_tests`
+pytest autouse fixture.
+"""
+
+import pytest
+import yaml
+
+from benchcab import internal
+from benchcab.model import Model
+from benchcab.scaling import (
+    get_efficient_ncpus,
+    get_scaling_results,
+    get_scaling_tasks,
+    load_recommended_ncpus,
+    parse_walltime,
+    save_scaling_report,
+)
+from benchcab.utils.repo import Repo
+
+
+@pytest.fixture()
+def mock_repo():  # noqa: D103
+    class MockRepo(Repo):
+        def checkout(self):
+            pass
+
+        def get_branch_name(self) -> str:
+            return "test-branch"
+
+        def get_revision(self) -> str:
+            return "1234"
+
+        def update(self) -> bool:
+            return False
+
+    return MockRepo()
+
+
+@pytest.fixture()
+def tasks(mock_repo, config):
+    """Return scaling tasks for 16, 32 and 64 CPUs."""
+    return get_scaling_tasks(
+        models=[Model(repo=mock_repo, model_id=id) for id in range(2)],
+        met_forcings=config["spatial"]["met_forcings"],
+        science_configurations=config["science_configurations"],
+        ncpus=[64, 16, 32],
+    )
+
+
+class TestGetScalingTasks:
+    """Tests for `get_scaling_tasks()`."""
+
+    def test_task_for_each_rank_count(self, tasks):
+        """Success case: the first task is run with each rank count."""
+        assert [task.get_task_name() for task in tasks] == [
+            "crujra_access_R0_S0_N16",
+            "crujra_access_R0_S0_N32",
+            "crujra_access_R0_S0_N64",
+        ]
+
+    def test_rank_count_is_patched_into_payu_config(self, tasks):
+        """Success case: the rank count overrides the payu config."""
+        task_dir = internal.SPATIAL_TASKS_DIR / tasks[0].get_task_name()
+        task_dir.mkdir(parents=True)
+        tasks[0].configure_experiment(
+            payu_config={"ncpus": 4, "walltime": "1:00:00"}, base_config={}
+        )
+        with (task_dir / "config.yaml").open("r", encoding="utf-8") as file:
+            config = yaml.safe_load(file)
+        assert config["ncpus"] == 16
+        assert config["walltime"] == "1:00:00"
+
+
+class TestParseWalltime:
+    """Tests for `parse_walltime()`."""
+
+    @pytest.mark.parametrize(
+        ("walltime", "seconds"), [("01:02:03", 3723), ("10:00", 600), ("5", 5)]
+    )
+    def test_walltime_in_seconds(self, walltime, seconds):
+        """Success case: walltime strings are converted to seconds."""
+        assert parse_walltime(walltime) == seconds
+
+
+class TestGetScalingResults:
+    """Tests for `get_scaling_results()` and `get_efficient_ncpus()`."""
+
+    def test_efficient_rank_count(self, tasks):
+        """Success case: recommend the largest rank count above the threshold."""
+        jobs = {}
+        for task, walltime in zip(tasks, ["01:00:00", "00:32:00", "00:25:00"]):
+            job_id = f"{task.ncpus}.gadi-pbs"
+            task.add_jobs([job_id])
+            jobs[job_id] = {
+                "queue": "normal",
+                "Resource_List": {"ncpus": task.ncpus},
+                "resources_used": {"walltime": walltime},
+            }
+        results = get_scaling_results(tasks, jobs)
+        assert [result["su"] for result in results] == pytest.approx(
+            [32.0, 34.13, 53.33], abs=0.01
+        )
+        assert get_efficient_ncpus(results, min_efficiency=0.75) == 32
+        assert [result["efficiency"] for result in results] == pytest.approx(
+            [1.0, 0.9375, 0.6]
+        )
+
+    def test_unknown_jobs_are_skipped(self, tasks):
+        """Success case: tasks without known PBS jobs have no results."""
+        results = get_scaling_results(tasks, {})
+        assert results == []
+        assert get_efficient_ncpus(results, min_efficiency=0.75) is None
+
+    def test_zero_walltime_is_skipped(self, tasks):
+        """Failure case: tasks whose jobs report no wall time have no results."""
+        jobs = {}
+        for task, walltime in zip(tasks, ["00:00:00", "00:32:00", "00:25:00"]):
+            job_id = f"{task.ncpus}.gadi-pbs"
+            task.add_jobs([job_id])
+            jobs[job_id] = {
+                "queue": "normal",
+                "Resource_List": {"ncpus": task.ncpus},
+                "resources_used": {"walltime": walltime},
+            }
+        results = get_scaling_results(tasks, jobs)
+        assert [result["ncpus"] for result in results] == [
+            task.ncpus for task in tasks[1:]
+        ]
+        assert get_efficient_ncpus(results, min_efficiency=0.75) == tasks[1].ncpus
+        with pytest.raises(ValueError, match="must be positive"):
+            get_efficient_ncpus(
+                [{"ncpus": 1, "walltime": 0.0, "su": None}], min_efficiency=0.75
+            )
+
+    def test_jobs_without_resources_used_are_skipped(self, tasks):
+        """Failure case: jobs which never started are ignored."""
+        task = tasks[0]
+        task.add_jobs(["1.gadi-pbs", "2.gadi-pbs"])
+        jobs = {
+            "1.gadi-pbs": {"queue": "normal", "Resource_List": {"ncpus": task.ncpus}},
+            "2.gadi-pbs": {
+                "queue": "normal",
+                "resources_used": {"walltime": "01:00:00"},
+            },
+        }
+        results = get_scaling_results([task], jobs)
+        assert results == [{"ncpus": task.ncpus, "walltime": 3600.0, "su": None}]
+        del jobs["2.gadi-pbs"]
+        assert get_scaling_results([task], jobs) == []
+
+
+class TestLoadRecommendedNcpus:
+    """Tests for `load_recommended_ncpus()`."""
+
+    def test_report_round_trip(self):
+        """Success case: the recommended rank count is read from the report."""
+        assert load_recommended_ncpus() is None
+        save_scaling_report({"recommended_ncpus": 32, "results": []})
+        assert load_recommended_ncpus() == 32
@@ -5,16 +5,29 @@ the working directory used for testing is cleaned up in the `_run_around_tests`
 pytest autouse fixture.
 """
 
+import json
 import logging
+import os
+from pathlib import Path
 
 import f90nml
+import git
 import pytest
 import yaml
 
 from benchcab import internal
 from benchcab.model import Model
-from benchcab.spatial import SpatialTask, get_spatial_tasks
+from benchcab.spatial import (
+    SpatialTask,
+    get_spatial_tasks,
+    get_template_dir,
+    run_packed_tasks,
+    run_tasks,
+    setup_tasks,
+    update_states,
+)
 from benchcab.utils.repo import Repo
+from benchcab.utils.subprocess import SubprocessWrapper
 
 
 @pytest.fixture()
@@ -33,6 +46,9 @@ def mock_repo():
         def get_revision(self) -> str:
             return self.revision
 
+        def update(self) -> bool:
+            return False
+
     return MockRepo()
 
 
@@ -70,6 +86,72 @@ class TestGetTaskName:
         assert task.get_task_name() == "crujra_access_R1_S0"
 
 
+class TestSetupTasks:
+    """Tests for `setup_tasks()`."""
+
+    @pytest.fixture()
+    def experiment(self, tmp_path):
+        """Return a local payu experiment repository."""
+        path = tmp_path / "experiment"
+        repo = git.Repo.init(path)
+        (path / "config.yaml").write_text("walltime: '1:00:00'\n")
+        (path / "cable.nml").touch()
+        repo.index.add(["config.yaml", "cable.nml"])
+        actor = git.Actor("benchcab", "benchcab@example.com")
+        repo.index.commit("Initial commit", author=actor, committer=actor)
+        return repo
+
+    @pytest.fixture()
+    def tasks(self, model, experiment):
+        """Return spatial tasks which run the same payu experiment."""
+        return [
+            SpatialTask(
+                model=model,
+                met_forcing_name="crujra_access",
+                met_forcing_payu_experiment=experiment.working_dir,
+                sci_conf_id=sci_conf_id,
+                sci_config={"cable": {"some_setting": sci_conf_id}},
+            )
+            for sci_conf_id in range(2)
+        ]
+
+    def test_experiment_is_cloned_once(self, tasks, experiment):
+        """Success case: task directories are copied from the template."""
+        setup_tasks(tasks, payu_config={"some_parameter": "foo"})
+        template_dir = get_template_dir(experiment.working_dir)
+        assert git.Repo(template_dir).head.commit == experiment.head.commit
+        for task in tasks:
+            task_dir = internal.SPATIAL_TASKS_DIR / task.get_task_name()
+            with (task_dir / "config.yaml").open("r", encoding="utf-8") as file:
+                config = yaml.safe_load(file)
+            assert config["walltime"] == "1:00:00"
+            assert config["some_parameter"] == "foo"
+            assert git.Repo(task_dir).head.commit == experiment.head.commit
+
+    def test_template_is_updated(self, tasks, experiment):
+        """Success case: the template fetches new commits of the experiment."""
+        setup_tasks(tasks)
+        config_path = Path(experiment.working_dir) / "config.yaml"
+        with config_path.open("w", encoding="utf-8") as file:
+            file.write("walltime: '2:00:00'\n")
+        experiment.index.add(["config.yaml"])
+        actor = git.Actor("benchcab", "benchcab@example.com")
+        experiment.index.commit("Update walltime", author=actor, committer=actor)
+        setup_tasks(tasks)
+        task_dir = internal.SPATIAL_TASKS_DIR / tasks[0].get_task_name()
+        with (task_dir / "config.yaml").open("r", encoding="utf-8") as file:
+            assert yaml.safe_load(file)["walltime"] == "2:00:00"
+
+    def test_stale_files_are_removed(self, tasks):
+        """Success case: files of a previous setup are removed."""
+        setup_tasks(tasks)
+        task_dir = internal.SPATIAL_TASKS_DIR / tasks[0].get_task_name()
+        (task_dir / "stale.nml").touch()
+        setup_tasks(tasks)
+        assert not (task_dir / "stale.nml").exists()
+        assert (task_dir / "cable.nml").exists()
+
+
 class TestConfigureExperiment:
     """Tests for `SpatialTask.configure_experiment()`."""
 
@@ -174,6 +256,216 @@ class TestRun:
         task.run()
         assert "payu run --some-flag" in mock_subprocess_handler.commands
 
+    def test_submitted_jobs_are_recorded(self, task, mock_subprocess_handler):
+        """Success case: job ids printed by payu are recorded for the task."""
+        mock_subprocess_handler.stdout = "qsub -q normal run.sh\n123456.gadi-pbs\n"
+        assert task.run() == ["123456.gadi-pbs"]
+        task.run()
+        assert [job["job_id"] for job in task.get_jobs()] == ["123456.gadi-pbs"] * 2
+
+
+class TestRunTasks:
+    """Tests for `run_tasks()`."""
+
+    def test_tasks_are_dispatched_concurrently(self, model, mock_subprocess_handler):
+        """Success case: every task is submitted once."""
+        tasks = [
+            SpatialTask(
+                model=model,
+                met_forcing_name="crujra_access",
+                met_forcing_payu_experiment="foo",
+                sci_conf_id=sci_conf_id,
+                sci_config={},
+            )
+            for sci_conf_id in range(4)
+        ]
+        for task in tasks:
+            task.subprocess_handler = mock_subprocess_handler
+            (internal.SPATIAL_TASKS_DIR / task.get_task_name()).mkdir(parents=True)
+        run_tasks(tasks, max_workers=2)
+        assert mock_subprocess_handler.commands == ["payu run"] * 4
+        assert all(task.get_jobs() == [] for task in tasks)
+
+
+class TestRunPackedTasks:
+    """Tests for `run_packed_tasks()`."""
+
+    @pytest.fixture()
+    def tasks(self, model, tmp_path, monkeypatch, mock_subprocess_handler):
+        """Return 3 spatial tasks and install a `payu-run` stand-in."""
+        bin_dir = tmp_path / "bin"
+        bin_dir.mkdir()
+        (bin_dir / "payu-run").touch(mode=0o755)
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+        monkeypatch.setattr(SpatialTask, "subprocess_handler", mock_subprocess_handler)
+        return [
+            SpatialTask(
+                model=model,
+                met_forcing_name="crujra_access",
+                met_forcing_payu_experiment="foo",
+                sci_conf_id=sci_conf_id,
+                sci_config={},
+            )
+            for sci_conf_id in range(3)
+        ]
+
+    def test_tasks_are_submitted_in_batches(self, tasks, mock_subprocess_handler):
+        """Success case: one PBS job is submitted for each batch of tasks."""
+        mock_subprocess_handler.stdout = "1234.gadi-pbs\n"
+        run_packed_tasks(
+            tasks,
+            project="tm70",
+            size=2,
+            pbs_config=internal.SPATIAL_DEFAULT_PACK_PBS,
+            modules=["openmpi/4.1.0"],
+        )
+        assert mock_subprocess_handler.commands == [
+            f"qsub {internal.SPATIAL_PACK_DIR / 'pack_0.sh'}",
+            f"qsub {internal.SPATIAL_PACK_DIR / 'pack_1.sh'}",
+        ]
+        job_script = (internal.SPATIAL_PACK_DIR / "pack_0.sh").read_text()
+        assert "crujra_access_R1_S0/hostfile" in job_script
+        assert "crujra_access_R1_S1/hostfile" in job_script
+        assert "crujra_access_R1_S2" not in job_script
+        assert "#PBS -q normal\n" in job_script
+        assert "module load openmpi/4.1.0\n" in job_script
+        for task in tasks:
+            assert [job["job_id"] for job in task.get_jobs()] == ["1234.gadi-pbs"]
+            assert task.get_state() == "submitted"
+
+    def test_payu_run_not_found(self, tasks, monkeypatch):
+        """Failure case: payu must be installed."""
+        monkeypatch.setenv("PATH", "")
+        with pytest.raises(RuntimeError, match="payu-run"):
+            run_packed_tasks(
+                tasks,
+                project="tm70",
+                size=2,
+                pbs_config=internal.SPATIAL_DEFAULT_PACK_PBS,
+                modules=[],
+            )
+
+
+class TestUpdateStates:
+    """Tests for `update_states()`."""
+
+    @pytest.fixture()
+    def qstat(self, tmp_path, monkeypatch):
+        """Install a local `qstat` stand-in which reports the jobs in `jobs.json`.
+
+        Return a function which sets the reported jobs. A `qselect` stand-in
+        reports the job ids in `qselect.txt`.
+        """
+        bin_dir = tmp_path / "bin"
+        bin_dir.mkdir()
+        script = bin_dir / "qstat"
+        script.write_text(
+            "#!/bin/sh\n"
+            f"echo called >> {tmp_path / 'calls.txt'}\n"
+            f"cat {tmp_path / 'jobs.json'}\n"
+        )
+        script.chmod(0o755)
+        qselect = bin_dir / "qselect"
+        qselect.write_text(f"#!/bin/sh\ncat {tmp_path / 'qselect.txt'}\n")
+        qselect.chmod(0o755)
+        (tmp_path / "qselect.txt").write_text("")
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+        monkeypatch.setattr(SpatialTask, "subprocess_handler", SubprocessWrapper())
+
+        def set_jobs(jobs: dict):
+            (tmp_path / "jobs.json").write_text(json.dumps({"Jobs": jobs}))
+
+        set_jobs({})
+        return set_jobs
+
+    @pytest.fixture()
+    def tasks(self, model):
+        """Return submitted spatial tasks."""
+        _tasks = [
+            SpatialTask(
+                model=model,
+                met_forcing_name="crujra_access",
+                met_forcing_payu_experiment="foo",
+                sci_conf_id=sci_conf_id,
+                sci_config={},
+            )
+            for sci_conf_id in range(4)
+        ]
+        for job_id, task in enumerate(_tasks):
+            task.add_jobs([f"{job_id}.gadi-pbs"])
+            task.set_state("submitted")
+        return _tasks
+
+    def test_states_from_jobs_and_archive(self, tasks, qstat):
+        """Success case: states are derived from PBS jobs and the payu archive."""
+        qstat(
+            {
+                "0.gadi-pbs": {"job_state": "Q"},
+                "1.gadi-pbs": {"job_state": "R"},
+                "2.gadi-pbs": {"job_state": "F", "Exit_status": 0},
+                "3.gadi-pbs": {"job_state": "F", "Exit_status": 1},
+            }
+        )
+        (tasks[2].get_archive_dir() / "output000").mkdir(parents=True)
+        assert update_states(tasks) == ["submitted", "running", "completed", "failed"]
+        assert [task.get_state() for task in tasks] == [
+            "submitted",
+            "running",
+            "completed",
+            "failed",
+        ]
+
+    def test_follow_up_jobs_are_recorded(self, tasks, qstat, tmp_path):
+        """Success case: jobs submitted by payu for subsequent runs are tracked."""
+        job = {"job_state": "F", "Exit_status": 0, "Job_Name": "crujra_acc"}
+        qstat({"0.gadi-pbs": job})
+        (tmp_path / "qselect.txt").write_text("0.gadi-pbs\n5.gadi-pbs\n")
+        assert update_states(tasks[:1]) == ["submitted"]
+        assert [record["job_id"] for record in tasks[0].get_jobs()] == [
+            "0.gadi-pbs",
+            "5.gadi-pbs",
+        ]
+        qstat({"5.gadi-pbs": {"job_state": "R"}})
+        assert update_states(tasks[:1]) == ["running"]
+
+    def test_unlisted_jobs_keep_their_state(self, tasks, qstat):
+        """Success case: jobs no longer reported by `qstat` are not failures."""
+        tasks[0].set_state("running")
+        assert update_states(tasks[:2]) == ["running", "submitted"]
+
+    def test_failed_state_is_updated(self, tasks, qstat):
+        """Success case: failed tasks whose experiment is still running recover."""
+        tasks[0].set_state("failed")
+        qstat({"0.gadi-pbs": {"job_state": "R"}})
+        assert update_states(tasks[:1]) == ["running"]
+
+    def test_stale_archives_are_ignored(self, tasks, qstat):
+        """Failure case: archives older than the first submission are not counted."""
+        qstat({"0.gadi-pbs": {"job_state": "F", "Exit_status": 1}})
+        archive = tasks[0].get_archive_dir() / "output000"
+        archive.mkdir(parents=True)
+        os.utime(archive, (0, 0))
+        assert update_states(tasks[:1]) == ["failed"]
+
+    def test_poll_is_cached(self, tasks, qstat, tmp_path):
+        """Success case: PBS is queried once within the poll interval."""
+        qstat({f"{i}.gadi-pbs": {"job_state": "Q"} for i in range(4)})
+        update_states(tasks)
+        update_states(tasks)
+        assert (tmp_path / "calls.txt").read_text().splitlines() == ["called"]
+
+    def test_pending_tasks_are_not_polled(self, model, qstat, tmp_path):
+        """Success case: tasks which have not been submitted are pending."""
+        task = SpatialTask(
+            model=model,
+            met_forcing_name="crujra_access",
+            met_forcing_payu_experiment="foo",
+            sci_conf_id=0,
+            sci_config={},
+        )
+        assert update_states([task]) == ["pending"]
+        assert not (tmp_path / "calls.txt").exists()
+
 
 class TestGetSpatialTasks:
     """Tests for `get_spatial_tasks()`."""
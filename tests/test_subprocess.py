@@ -135,6 +135,12 @@ class TestRunCmd:
         )
         assert proc.stdout == "bar\n"
 
+    def test_command_is_run_in_working_directory(self, subprocess_handler):
+        """Success case: test command is run in the specified working directory."""
+        Path("foo").mkdir()
+        proc = subprocess_handler.run_cmd("pwd", capture_output=True, cwd=Path("foo"))
+        assert proc.stdout == f"{Path('foo').absolute()}\n"
+
     def test_check_non_zero_return_code_throws_an_exception(self, subprocess_handler):
         """Failure case: check non-zero return code throws an exception."""
         with pytest.raises(subprocess.CalledProcessError):
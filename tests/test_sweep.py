@@ -0,0 +1,50 @@
+"""`pytest` tests for `utils/sweep.py`."""
+
+from benchcab.utils.sweep import iter_science_configurations
+
+SWEEP = {
+    "sweep": {
+        "cable.cable_user.GS_SWITCH": ["medlyn", "leuning"],
+        "cable.cable_user.FWSOIL_SWITCH": ["Haverd2013", "standard"],
+    },
+    "base": {"cable": {"cable_user": {"litter": True}}},
+}
+
+
+class TestIterScienceConfigurations:
+    """Tests for `iter_science_configurations()`."""
+
+    def test_sweep_is_expanded(self):
+        """Success case: a sweep expands into the product of its values."""
+        sci_configs = dict(
+            iter_science_configurations([{"cable": {"cable_user": {}}}, SWEEP])
+        )
+        assert list(sci_configs) == [0, "1.0.0", "1.0.1", "1.1.0", "1.1.1"]
+        assert sci_configs["1.1.0"] == {
+            "cable": {
+                "cable_user": {
+                    "litter": True,
+                    "GS_SWITCH": "leuning",
+                    "FWSOIL_SWITCH": "Haverd2013",
+                }
+            }
+        }
+
+    def test_ids_are_stable_when_sweep_grows(self):
+        """Success case: appending values to an axis keeps existing ids."""
+        grown = {
+            "sweep": {
+                "cable.cable_user.GS_SWITCH": ["medlyn", "leuning", "tuzet"],
+                "cable.cable_user.FWSOIL_SWITCH": ["Haverd2013", "standard"],
+            },
+            "base": SWEEP["base"],
+        }
+        before = dict(iter_science_configurations([SWEEP]))
+        after = dict(iter_science_configurations([grown]))
+        assert before.items() <= after.items()
+        assert len(after) == 6  # noqa: PLR2004
+
+    def test_base_is_not_modified(self):
+        """Success case: expanding a sweep does not modify the base configuration."""
+        _ = list(iter_science_configurations([SWEEP]))
+        assert SWEEP["base"] == {"cable": {"cable_user": {"litter": True}}}